@@ -0,0 +1,257 @@
+"""
+Columnar analytics snapshot of sales history.
+
+Sale items are extracted into fixed-width column files (one raw NumPy array
+per column) and appended incrementally by sale item id, so a refresh only
+reads sales made since the last one. Report metrics are computed with
+vectorized group-bys over memory-mapped columns instead of ORM loops.
+
+Costs are captured at extraction time; run `flask analytics refresh --rebuild`
+after correcting batch purchase prices. A rebuild also reads sales that were
+moved to the archive database. Requires NumPy.
+"""
+import heapq
+import json
+import os
+import threading
+from datetime import date
+from itertools import islice
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app.main import db
+from app.archive import archive_ready
+from app.models import ArchivedSale, ArchivedSaleItem, Batch, Category, Medicine, Sale, SaleItem, Store
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process refresh only
+    fcntl = None
+
+
+COLUMNS = {
+    'item_id': np.int64,
+    'sale_id': np.int64,
+    'day': np.int32,          # Days since 1970-01-01
+    'medicine_id': np.int32,  # -1 for unlisted items
+    'category_id': np.int32,  # -1 for unlisted items
+    'quantity': np.int32,     # Base units
+    'price': np.float64,      # price_at_sale per unit
+    'unit_cost': np.float64,  # NaN when purchase price is unknown
+}
+
+EPOCH = date(1970, 1, 1).toordinal()
+EXTRACT_CHUNK = 50000
+
+_snapshots = {}
+
+
+def to_day(value):
+    """Date/datetime to day number used in the 'day' column."""
+    if hasattr(value, 'date'):
+        value = value.date()
+    return value.toordinal() - EPOCH
+
+
+def from_day(day):
+    """Day number back to a date."""
+    return date.fromordinal(int(day) + EPOCH)
+
+
+class SalesSnapshot:
+    """Append-only columnar copy of sale items stored under one directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.last_item_id = 0
+        self.columns = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _load(self):
+        """
+        Map column files, trusting only the row count recorded in meta. The
+        columns are swapped in as a new dict, so aggregate() running alongside
+        a refresh sees either the old or the new columns, never a mix.
+        """
+        meta = {}
+        if os.path.exists(self._meta_path()):
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+        rows = meta.get('rows', 0)
+
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            if rows:
+                columns[name] = np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        self.rows = rows
+        self.last_item_id = meta.get('last_item_id', 0)
+        self.columns = columns
+
+    def _extract(self, after_id):
+        """Yield column chunks for sale items with id > after_id."""
+        primary = db.session.execute(select(
+            SaleItem.id, SaleItem.sale_id, Sale.sale_date,
+            Batch.medicine_id, Medicine.category_id,
+            SaleItem.quantity, SaleItem.price_at_sale,
+            Batch.purchase_price, Medicine.units_per_pack
+        ).select_from(SaleItem).join(Sale, SaleItem.sale_id == Sale.id) \
+         .outerjoin(Batch, SaleItem.batch_id == Batch.id) \
+         .outerjoin(Medicine, Batch.medicine_id == Medicine.id) \
+         .where(SaleItem.id > after_id).order_by(SaleItem.id))
+        # Same rule as calculate_item_profit: no price or pack size -> unknown cost
+        rows = (r[:7] + (r[7] / r[8] if r[7] and r[8] and r[8] > 0 else None,) for r in primary)
+
+        if archive_ready():
+            # Archived items keep their original ids and the unit cost captured at archiving
+            archived = db.session.execute(select(
+                ArchivedSaleItem.id, ArchivedSaleItem.sale_id, ArchivedSale.sale_date,
+                ArchivedSaleItem.medicine_id, ArchivedSaleItem.category_id,
+                ArchivedSaleItem.quantity, ArchivedSaleItem.price_at_sale, ArchivedSaleItem.unit_cost
+            ).join(ArchivedSale).where(ArchivedSaleItem.id > after_id).order_by(ArchivedSaleItem.id))
+            rows = heapq.merge(rows, (tuple(r) for r in archived), key=lambda r: r[0])
+
+        while True:
+            chunk = list(islice(rows, EXTRACT_CHUNK))
+            if not chunk:
+                break
+            yield {
+                'item_id': [r[0] for r in chunk],
+                'sale_id': [r[1] for r in chunk],
+                'day': [to_day(r[2]) for r in chunk],
+                'medicine_id': [r[3] if r[3] is not None else -1 for r in chunk],
+                'category_id': [r[4] if r[4] is not None else -1 for r in chunk],
+                'quantity': [r[5] for r in chunk],
+                'price': [r[6] for r in chunk],
+                'unit_cost': [r[7] if r[7] is not None else np.nan for r in chunk],
+            }
+
+    def refresh(self):
+        """Append sale items added since the last refresh. Returns rows added."""
+        with self._lock:
+            lock_file = open(os.path.join(self.path, '.lock'), 'w')
+            try:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._load()  # Another process may have appended
+                # Drop bytes left by an interrupted refresh (beyond the recorded rows)
+                for name, dtype in COLUMNS.items():
+                    if os.path.exists(self._column_path(name)):
+                        os.truncate(self._column_path(name), self.rows * np.dtype(dtype).itemsize)
+                added = 0
+                last_item_id = self.last_item_id
+                for chunk in self._extract(self.last_item_id):
+                    for name, dtype in COLUMNS.items():
+                        with open(self._column_path(name), 'ab') as f:
+                            f.write(np.asarray(chunk[name], dtype=dtype).tobytes())
+                    added += len(chunk['item_id'])
+                    last_item_id = chunk['item_id'][-1]
+
+                if added:
+                    # Meta is written last so readers never map a partial chunk
+                    with open(self._meta_path(), 'w') as f:
+                        json.dump({'rows': self.rows + added, 'last_item_id': last_item_id}, f)
+                    self._load()
+                return added
+            finally:
+                lock_file.close()
+
+    def rebuild(self):
+        """Drop all column files and extract the full history again."""
+        with self._lock:
+            for name in COLUMNS:
+                if os.path.exists(self._column_path(name)):
+                    os.remove(self._column_path(name))
+            if os.path.exists(self._meta_path()):
+                os.remove(self._meta_path())
+            self._load()
+        return self.refresh()
+
+    def aggregate(self, start_date, end_date, group_by='day'):
+        """
+        Vectorized equivalent of reports.aggregate_sales.
+        Returns the same row dicts, sorted by key.
+        """
+        c = self.columns  # One consistent set of columns for the whole call
+        lo, hi = to_day(start_date), to_day(end_date)
+        mask = (c['day'] >= lo) & (c['day'] <= hi)
+        if group_by != 'day':
+            mask &= c['medicine_id'] >= 0  # Listed items only
+        idx = np.flatnonzero(mask)
+
+        if group_by == 'day':
+            keys = c['day'][idx] - lo
+        elif group_by == 'medicine':
+            keys = c['medicine_id'][idx]
+        elif group_by == 'category':
+            keys = c['category_id'][idx]
+        else:
+            raise ValueError(f'Unknown grouping: {group_by}')
+
+        quantity = c['quantity'][idx].astype(np.float64)
+        revenue = quantity * c['price'][idx]
+        unit_cost = c['unit_cost'][idx]
+        known = ~np.isnan(unit_cost)
+        cost = np.where(known, unit_cost * quantity, 0.0)
+        profit = np.where(known, revenue - cost, 0.0)
+
+        size = int(keys.max()) + 1 if len(keys) else 0
+        totals = {
+            'revenue': np.bincount(keys, weights=revenue, minlength=size),
+            'cost': np.bincount(keys, weights=cost, minlength=size),
+            'profit': np.bincount(keys, weights=profit, minlength=size),
+            'quantity': np.bincount(keys, weights=quantity, minlength=size),
+            'transactions': np.bincount(keys, minlength=size),
+        }
+
+        # Distinct bills per group: count unique (sale, group) pairs. Rows are
+        # stored in sale item order, so sale-major pairs are nearly sorted and
+        # a stable (run-detecting) sort is far cheaper than np.unique.
+        pairs = np.sort(c['sale_id'][idx] * max(size, 1) + keys, kind='stable')
+        first = np.ones(len(pairs), dtype=bool)
+        np.not_equal(pairs[1:], pairs[:-1], out=first[1:])
+        totals['sales'] = np.bincount(pairs[first] % max(size, 1), minlength=size)
+
+        groups = np.flatnonzero(totals['transactions'])
+        names = self._names(group_by, groups)
+
+        rows = []
+        for g in groups.tolist():
+            row = {
+                'key': from_day(g + lo).isoformat() if group_by == 'day' else g,
+                'revenue': float(totals['revenue'][g]),
+                'cost': float(totals['cost'][g]),
+                'profit': float(totals['profit'][g]),
+                'quantity': int(totals['quantity'][g]),
+                'transactions': int(totals['transactions'][g]),
+                'sales': int(totals['sales'][g]),
+            }
+            if names is not None:
+                row['name'] = names.get(g, 'Uncategorized' if group_by == 'category' else '')
+            rows.append(row)
+        return rows
+
+    def _names(self, group_by, groups):
+        """Display names for medicine/category groups."""
+        if group_by == 'day' or not len(groups):
+            return None if group_by == 'day' else {}
+        model = Medicine if group_by == 'medicine' else Category
+        return dict(db.session.execute(select(model.id, model.name)).all())
+
+
+def get_snapshot():
+    """Snapshot of the current store under ANALYTICS_SNAPSHOT_DIR (one per process)."""
+    path = os.path.join(current_app.config['ANALYTICS_SNAPSHOT_DIR'], f'store-{Store.current_id()}')
+    if path not in _snapshots:
+        _snapshots[path] = SalesSnapshot(path)
+    return _snapshots[path]
@@ -0,0 +1,153 @@
+"""
+Archival of old sales into a separate database (the 'archive' bind,
+ARCHIVE_DATABASE_URL).
+
+Sales older than ARCHIVE_AFTER_DAYS are copied to the archive in chunks,
+checked against the originals, and only then deleted from the primary
+database. Each chunk commits on its own, so an interrupted run can simply be
+started again: sales already in the archive are not copied twice.
+    flask archive sales [--older-than DAYS] [--chunk-size N] [--vacuum]
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, inspect, select, text
+from sqlalchemy.orm import selectinload
+from app.main import db
+from app.models import ArchivedSale, ArchivedSaleItem, Batch, IdempotencyKey, Medicine, Sale, SaleItem
+
+_archive_ready = False
+
+
+def archive_enabled():
+    """True when an archive database is configured."""
+    return 'archive' in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def archive_ready():
+    """True when the archive is configured and its tables exist."""
+    global _archive_ready
+    if not archive_enabled():
+        return False
+    if not _archive_ready:
+        # Tables are created by the first archive run
+        _archive_ready = inspect(db.engines['archive']).has_table(ArchivedSale.__tablename__)
+    return _archive_ready
+
+
+def archive_reaches(start_date):
+    """True when the archive holds sales on or after start_date."""
+    if not archive_ready():
+        return False
+    newest = db.session.execute(select(func.max(ArchivedSale.sale_date))).scalar()
+    return newest is not None and newest.date() >= start_date
+
+
+def _copy(sale):
+    """Build the archive copy of a sale (with denormalized items)."""
+    archived = ArchivedSale(
+        id=sale.id,
+        store_id=sale.store_id,
+        sale_date=sale.sale_date,
+        total_amount=sale.total_amount,
+        customer_name=sale.customer_name,
+        customer_phone=sale.customer_phone
+    )
+    for item in sale.items:
+        batch = item.batch
+        medicine = batch.medicine if batch else None
+        unit_cost = None
+        if batch and batch.purchase_price and medicine and medicine.units_per_pack > 0:
+            unit_cost = batch.purchase_price / medicine.units_per_pack
+        archived.items.append(ArchivedSaleItem(
+            id=item.id,
+            batch_id=item.batch_id,
+            medicine_id=medicine.id if medicine else None,
+            category_id=medicine.category_id if medicine else None,
+            medicine_name=item.medicine_name,
+            category_name=medicine.category.name if medicine and medicine.category else None,
+            batch_number=item.batch_number,
+            item_name=item.item_name,
+            quantity=item.quantity,
+            price_at_sale=item.price_at_sale,
+            unit_cost=unit_cost
+        ))
+    return archived
+
+
+def _totals(sale_model, item_model, ids):
+    """(sale count, sum of totals, item count, sum of line totals) for verification."""
+    sales = db.session.execute(
+        select(func.count(sale_model.id), func.sum(sale_model.total_amount)).where(sale_model.id.in_(ids))
+    ).one()
+    items = db.session.execute(
+        select(func.count(item_model.id), func.sum(item_model.quantity * item_model.price_at_sale))
+        .where(item_model.sale_id.in_(ids))
+    ).one()
+    return sales[0], round(sales[1] or 0, 2), items[0], round(items[1] or 0, 2)
+
+
+def archive_sales(older_than_days=None, chunk_size=500, progress=None):
+    """
+    Move sales older than the horizon to the archive database.
+    Returns the number of sales moved.
+    """
+    if not archive_enabled():
+        raise RuntimeError('No archive database configured')
+
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.combine(datetime.now().date() - timedelta(days=older_than_days), datetime.min.time())
+    db.create_all(bind_key='archive')
+
+    # Store summaries first, so a sale is never counted from both databases
+    from app.stores import refresh_store_summaries
+    refresh_store_summaries()
+
+    # Never archive the newest sale, so SQLite cannot hand out its id again
+    newest_id = db.session.execute(select(func.max(Sale.id))).scalar() or 0
+    moved = 0
+
+    while True:
+        sales = Sale.query.options(
+            selectinload(Sale.items).joinedload(SaleItem.batch)
+            .joinedload(Batch.medicine).joinedload(Medicine.category)
+        ).filter(
+            Sale.sale_date < cutoff,
+            Sale.id < newest_id
+        ).order_by(Sale.id).limit(chunk_size).all()
+        if not sales:
+            break
+        ids = [s.id for s in sales]
+
+        # 1. Copy (skipping sales a previous, interrupted run already copied)
+        existing = set(db.session.execute(select(ArchivedSale.id).where(ArchivedSale.id.in_(ids))).scalars())
+        for sale in sales:
+            if sale.id not in existing:
+                db.session.add(_copy(sale))
+        db.session.commit()
+
+        # 2. Verify the copy before deleting anything
+        if _totals(Sale, SaleItem, ids) != _totals(ArchivedSale, ArchivedSaleItem, ids):
+            raise RuntimeError(f'Archive totals do not match for sales {ids[0]}..{ids[-1]}')
+
+        # 3. Delete from the primary database
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.sale_id.in_(ids)))
+        db.session.execute(delete(SaleItem).where(SaleItem.sale_id.in_(ids)))
+        db.session.execute(delete(Sale).where(Sale.id.in_(ids)))
+        db.session.commit()
+        db.session.expunge_all()
+
+        moved += len(ids)
+        if progress:
+            progress(moved)
+
+    return moved
+
+
+def vacuum_primary():
+    """Reclaim space in a SQLite primary database after archiving."""
+    if db.engine.url.get_backend_name() != 'sqlite':
+        return False
+    with db.engine.connect() as conn:
+        conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+    return True
@@ -0,0 +1,136 @@
+"""
+Self-hosted frontend assets.
+
+Bootstrap, Bootstrap Icons and Chart.js are downloaded once into
+app/static/vendor (pinned versions, with precompressed .gz/.br copies):
+    flask assets vendor
+
+Templates link them with asset_url(), which serves vendored files under a
+content-hashed URL with far-future immutable caching, so pages work without
+internet access. The files are not committed: until they are vendored,
+asset_url() falls back to the CDN and the app logs a warning at startup.
+Restart the app after re-vendoring so the hashes are recomputed; URLs with
+an outdated hash are answered with 404 rather than cached for good.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import urllib.request
+from flask import Blueprint, abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+VENDOR_DIR = os.path.join(os.path.dirname(__file__), 'static', 'vendor')
+CDN = 'https://cdn.jsdelivr.net/npm/'
+
+# Name used in templates -> (path under VENDOR_DIR, CDN path)
+ASSETS = {
+    'bootstrap.css': ('bootstrap/bootstrap.min.css', 'bootstrap@5.3.0/dist/css/bootstrap.min.css'),
+    'bootstrap.js': ('bootstrap/bootstrap.bundle.min.js', 'bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'),
+    'bootstrap-icons.css': ('bootstrap-icons/bootstrap-icons.css', 'bootstrap-icons@1.10.0/font/bootstrap-icons.css'),
+    'chart.js': ('chart.js/chart.umd.min.js', 'chart.js@4.4.0/dist/chart.umd.min.js'),
+}
+
+# Files loaded by the assets above (relative URLs, so kept next to them)
+DEPENDENCIES = {
+    'bootstrap-icons/fonts/bootstrap-icons.woff2': 'bootstrap-icons@1.10.0/font/fonts/bootstrap-icons.woff2',
+    'bootstrap-icons/fonts/bootstrap-icons.woff': 'bootstrap-icons@1.10.0/font/fonts/bootstrap-icons.woff',
+}
+
+# Text files worth storing precompressed
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js')
+
+MAX_AGE = 365 * 24 * 3600
+
+assets = Blueprint('assets', __name__)
+
+_digests = {}
+
+
+def _digest(path):
+    """Short content hash of a vendored file (cached per process)."""
+    if path not in _digests:
+        with open(os.path.join(VENDOR_DIR, path), 'rb') as f:
+            _digests[path] = hashlib.sha256(f.read()).hexdigest()[:12]
+    return _digests[path]
+
+
+def missing_assets():
+    """Names of the assets not vendored yet (served from the CDN)."""
+    return [name for name, (path, _) in ASSETS.items() if not os.path.exists(os.path.join(VENDOR_DIR, path))]
+
+
+def _valid_digests(filename):
+    """
+    Digests a vendored file may be requested under: an asset's own, and for
+    the files it loads (fonts), that of the asset in the directory above.
+    """
+    paths = [path for path, _ in ASSETS.values()]
+    if filename in paths:
+        return {_digest(filename)}
+    return {_digest(path) for path in paths
+            if filename.startswith(os.path.dirname(path) + '/') and os.path.exists(os.path.join(VENDOR_DIR, path))}
+
+
+def asset_url(name):
+    """URL of a frontend asset: vendored copy when present, CDN otherwise."""
+    path, cdn_path = ASSETS[name]
+    if not os.path.exists(os.path.join(VENDOR_DIR, path)):
+        return CDN + cdn_path
+    # Files the asset loads by relative URL resolve under the same digest
+    return url_for('assets.vendored', digest=_digest(path), filename=path)
+
+
+@assets.route('/assets/<digest>/<path:filename>')
+def vendored(digest, filename):
+    """Vendored file; its URL changes with its content, so it is cached for good."""
+    path = safe_join(VENDOR_DIR, filename)
+    if path is None or not os.path.isfile(path) or digest not in _valid_digests(filename):
+        abort(404)
+    
+    # Precompressed copy when the client takes it
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in request.accept_encodings and os.path.isfile(path + suffix):
+            response = send_from_directory(VENDOR_DIR, filename + suffix, max_age=MAX_AGE)
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(VENDOR_DIR, filename, max_age=MAX_AGE)
+    
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def vendor_assets(force=False, progress=None):
+    """Download pinned assets into VENDOR_DIR with precompressed copies. Returns files fetched."""
+    files = {path: cdn_path for path, cdn_path in ASSETS.values()}
+    files.update(DEPENDENCIES)
+    fetched = 0
+    for path, cdn_path in files.items():
+        target = os.path.join(VENDOR_DIR, path)
+        if os.path.exists(target) and not force:
+            continue
+        with urllib.request.urlopen(CDN + cdn_path, timeout=60) as response:
+            data = response.read()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9))
+            if brotli:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+        fetched += 1
+        if progress:
+            progress(path, len(data))
+    _digests.clear()
+    return fetched
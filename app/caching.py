@@ -0,0 +1,105 @@
+"""
+HTTP caching by data version.
+
+Views that only depend on catalogue/sales data get a strong ETag built from
+the versions of their data scopes (DataVersion), today's date and the
+request URL. A request whose If-None-Match matches is answered
+304 Not Modified before the view runs, so nothing is queried or rendered;
+Cache-Control: no-cache makes clients revalidate on every use.
+
+Templates cache expensive, rarely changing blocks the same way, keyed by
+data versions (plus today's date) so a change anywhere renders them anew:
+    {% cache 'medicine-table', data_versions('inventory'), search %}...{% endcache %}
+Fragments are kept per process, least recently used dropped first.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from app.main import db
+from app.models import DataVersion
+from app.compression import ENCODINGS
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def data_versions(*scopes):
+    """Versions of the given data scopes (read once per request)."""
+    versions = g.setdefault('data_versions', {})
+    if scopes not in versions:
+        versions[scopes] = DataVersion.current(db.session, scopes)
+    return versions[scopes]
+
+
+def version_etag(versions, url, today=None):
+    """ETag of a response determined by data versions, the date and the URL."""
+    today = today or datetime.now().date()
+    return hashlib.sha1(f'{versions}|{today}|{url}'.encode()).hexdigest()
+
+
+def matching_etag(if_none_match, etag):
+    """ETag (or compressed variant, see compression) the client already has, or None."""
+    for tag in (etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS)):
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def conditional(*scopes):
+    """Decorator: ETag / 304 handling for a GET view that depends only on the given scopes."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = version_etag(data_versions(*scopes), request.full_path)
+            # Pages with pending flash messages must be rendered
+            cached = matching_etag(request.if_none_match, etag)
+            if cached and '_flashes' not in session:
+                response = current_app.response_class(status=304)
+                etag = cached
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            return response
+        return wrapper
+    return decorator
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache key, ... %}...{% endcache %}: render the block once per key and date."""
+    
+    tags = {'cache'}
+    
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.fragments = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.Tuple(key, 'load')])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+    
+    def _render(self, key, caller):
+        key = (*key, datetime.now().date())
+        with self.lock:
+            if key in self.fragments:
+                self.fragments.move_to_end(key)
+                return self.fragments[key]
+        
+        fragment = caller()
+        with self.lock:
+            self.fragments[key] = fragment
+            while len(self.fragments) > current_app.config['FRAGMENT_CACHE_SIZE']:
+                self.fragments.popitem(last=False)
+        return fragment
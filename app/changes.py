@@ -0,0 +1,173 @@
+"""
+Change feed for external systems (accounting, head-office dashboards).
+
+Every write to sales, batches, medicines and categories appends a
+ChangeEvent in the same transaction, holding the row as of the change, so
+consumers sync incrementally instead of re-reading whole tables:
+    GET /api/changes?since=<id of the last event received>&wait=<seconds>
+
+Waiting readers (long-polls, the live dashboard) are woken when a
+transaction that recorded events commits in this process; events written
+by other processes (the POS server, other workers) are picked up by a
+check every POLL_SECONDS.
+
+Events are recorded after DataVersion.bump(session, 'inventory'), whose row
+lock serializes the writers, so event ids commit in order and a cursor never
+skips an event. A store sees its own sales and stock plus the shared
+catalogue; head office reads every store's events with all_stores. Old events are removed with:
+    flask changes prune --older-than DAYS
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session
+from app.models import Batch, Category, ChangeEvent, Medicine, Sale, Store
+
+MAX_LIMIT = 1000  # Events per request
+MAX_WAIT = 30  # Seconds a long-poll may wait
+POLL_SECONDS = 5  # Between checks while waiting, for events of other processes
+
+# Commits that recorded events in this process; readers wait for it to change
+_committed = threading.Condition()
+_generation = 0
+
+
+def _sale_data(sale):
+    return {
+        'sale_date': sale.sale_date.isoformat(timespec='seconds'),
+        'total_amount': sale.total_amount,
+        'customer_name': sale.customer_name,
+        'items': [{'batch_id': item.batch_id, 'item_name': item.item_name,
+                   'quantity': item.quantity, 'price_at_sale': item.price_at_sale} for item in sale.items],
+    }
+
+
+def _batch_data(batch):
+    return {
+        'medicine_id': batch.medicine_id,
+        'batch_number': batch.batch_number,
+        'expiry_date': batch.expiry_date.isoformat(),
+        'purchase_price': batch.purchase_price,
+        'mrp': batch.mrp,
+        'stock_quantity': batch.stock_quantity,
+        'is_active': batch.is_active,
+    }
+
+
+def _medicine_data(medicine):
+    return {
+        'name': medicine.name,
+        'generic_name': medicine.generic_name,
+        'category_id': medicine.category_id,
+        'manufacturer': medicine.manufacturer,
+        'packing_type': medicine.packing_type,
+        'units_per_pack': medicine.units_per_pack,
+        'min_stock_level': medicine.min_stock_level,
+        'is_active': medicine.is_active,
+    }
+
+
+def _category_data(category):
+    return {'name': category.name, 'description': category.description}
+
+
+# Model -> (entity name, row serializer)
+ENTITIES = {
+    Sale: ('sale', _sale_data),
+    Batch: ('batch', _batch_data),
+    Medicine: ('medicine', _medicine_data),
+    Category: ('category', _category_data),
+}
+
+
+def record_change(session, action, *objects):
+    """
+    Append a change event per object ('created', 'updated' or 'deleted');
+    the caller commits. New objects are flushed first to get their ids.
+    """
+    if any(obj.id is None for obj in objects):
+        session.flush()
+    for obj in objects:
+        entity, serialize = ENTITIES[type(obj)]
+        session.add(ChangeEvent(entity=entity, entity_id=obj.id, action=action,
+                                store_id=getattr(obj, 'store_id', None), data=serialize(obj)))
+    session.info['recorded_changes'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_readers(session):
+    global _generation
+    if session.info.pop('recorded_changes', False):
+        with _committed:
+            _generation += 1
+            _committed.notify_all()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('recorded_changes', None)
+
+
+def record_sales(session, sales):
+    """Events for new (flushed) sales and the stock left in the batches they sold from."""
+    batches = {item.batch_id for sale in sales for item in sale.items if item.batch_id is not None}
+    record_change(session, 'created', *sales)
+    # Batches were loaded by the checkout, so these come from the identity map
+    record_change(session, 'updated', *(session.get(Batch, batch_id) for batch_id in sorted(batches)))
+
+
+def _events_after(session, since, limit, all_stores=False):
+    store_id = None if all_stores else Store.current_id(session)
+    query = select(
+        ChangeEvent.id, ChangeEvent.entity, ChangeEvent.entity_id, ChangeEvent.action,
+        ChangeEvent.store_id, ChangeEvent.data, ChangeEvent.created_at
+    ).where(ChangeEvent.id > since)
+    if store_id is not None:
+        query = query.where((ChangeEvent.store_id == store_id) | ChangeEvent.store_id.is_(None))
+    return session.execute(query.order_by(ChangeEvent.id).limit(limit)).all()
+
+
+def read_changes(session, since=0, limit=500, wait=0, all_stores=False):
+    """
+    Events after the cursor `since`, oldest first, at most `limit`. When
+    there are none yet, waits up to `wait` seconds for new ones (long-poll).
+    Only this store's events and the catalogue's, unless all_stores is set.
+    Returns {'events', 'next' (cursor for the next call), 'more'}.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        # Read before querying: a commit in between ends the wait at once
+        generation = _generation
+        rows = _events_after(session, since, limit + 1, all_stores)
+        remaining = deadline - time.monotonic()
+        if rows or remaining <= 0:
+            break
+        # End the read transaction: the next check sees new commits, and no
+        # connection is held while waiting
+        session.rollback()
+        with _committed:
+            _committed.wait_for(lambda: _generation != generation, min(remaining, POLL_SECONDS))
+    
+    events = [{
+        'id': event_id,
+        'entity': entity,
+        'entity_id': entity_id,
+        'action': action,
+        'store_id': store_id,
+        'data': data,
+        'at': created_at.isoformat(timespec='seconds'),
+    } for event_id, entity, entity_id, action, store_id, data, created_at in rows[:limit]]
+    return {
+        'events': events,
+        'next': events[-1]['id'] if events else since,
+        'more': len(rows) > limit,
+    }
+
+
+def prune_changes(session, older_than_days):
+    """Delete events older than the given number of days; returns how many."""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    deleted = session.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff)).rowcount
+    session.commit()
+    return deleted
@@ -0,0 +1,394 @@
+"""
+Point-of-sale operations: medicine search, batch lookup, substitutes and checkout.
+
+Each function takes the SQLAlchemy session to work with, so the same code
+serves the Flask views (db.session) and the async POS server (app.pos),
+which runs it through AsyncSession.run_sync.
+"""
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.models import Category, Medicine, Batch, Sale, SaleItem, IdempotencyKey, StockMovement, DataVersion, Store
+from app.serializers import BATCH_COLUMNS, batch_row
+from app.changes import record_sales
+
+SYNC_MAX_SALES = 500  # Per sync request
+
+
+def _available_batches(session, medicine_ids, today):
+    """
+    Active batches of the given medicines, soonest expiry first:
+    {medicine_id: [(medicine_id, *BATCH_COLUMNS)]}.
+    """
+    batches = {}
+    rows = session.execute(
+        select(Batch.medicine_id, *BATCH_COLUMNS).where(
+            Batch.medicine_id.in_(medicine_ids),
+            Batch.is_active == True
+        ).order_by(Batch.expiry_date, Batch.id)
+    ).all()
+    for row in rows:
+        batches.setdefault(row[0], []).append(row)
+    return batches
+
+
+def _active_medicines():
+    """SELECT of active medicines with the columns _medicine_results needs."""
+    return select(
+        Medicine.id, Medicine.name, Medicine.generic_name, Category.name,
+        Medicine.packing_type, Medicine.units_per_pack
+    ).outerjoin(Category, Medicine.category_id == Category.id).where(Medicine.is_active == True)
+
+
+def _medicine_results(session, medicines):
+    """Search result dicts of _active_medicines() rows, with their sellable batches."""
+    if not medicines:
+        return []
+    
+    today = datetime.now().date()
+    batches = _available_batches(session, [m[0] for m in medicines], today)
+    
+    results = []
+    for medicine_id, name, generic_name, category, packing_type, units_per_pack in medicines:
+        active = batches.get(medicine_id, [])
+        results.append({
+            'id': medicine_id,
+            'name': name,
+            'generic_name': generic_name or '',
+            'category': category or 'Uncategorized',
+            'packing_type': packing_type,
+            'units_per_pack': units_per_pack,
+            'total_stock': sum(row[4] for row in active),
+            # Available batches: in stock, not expired
+            'batches': [batch_row(row[1:], units_per_pack, today) for row in active
+                        if row[4] > 0 and row[3] >= today]
+        })
+    return results
+
+
+def search_medicines(session, query, limit=10):
+    """Active medicines whose name contains query, with their sellable batches."""
+    # Escape LIKE special characters to prevent unexpected matching
+    escaped_query = query.replace('%', r'\%').replace('_', r'\_')
+    
+    # Search medicines by name (case-insensitive)
+    medicines = session.execute(
+        _active_medicines().where(
+            Medicine.name.ilike(f'%{escaped_query}%', escape='\\')
+        ).order_by(Medicine.name).limit(limit)
+    ).all()
+    return _medicine_results(session, medicines)
+
+
+def find_substitutes(session, medicine_id, limit=10):
+    """
+    Active medicines with the same composition as a medicine (the indexed
+    Medicine.composition_key) that have sellable stock, best first: the
+    cheapest unit price of the batch sold first (FEFO), then the soonest
+    expiry, then the most stock. None if the medicine is not found.
+    """
+    medicine = session.execute(
+        select(Medicine.id, Medicine.name, Medicine.generic_name, Medicine.composition_key)
+        .where(Medicine.id == medicine_id)
+    ).first()
+    if medicine is None:
+        return None
+    
+    substitutes = []
+    if medicine.composition_key:
+        medicines = session.execute(
+            _active_medicines().where(
+                Medicine.composition_key == medicine.composition_key,
+                Medicine.id != medicine_id
+            )
+        ).all()
+        for result in _medicine_results(session, medicines):
+            if result['batches']:
+                result['available'] = sum(b['stock_quantity'] for b in result['batches'])
+                substitutes.append(result)
+        substitutes.sort(key=lambda r: (r['batches'][0]['unit_price'], r['batches'][0]['expiry_date'],
+                                        -r['available'], r['name']))
+    
+    return {
+        'medicine': {'id': medicine.id, 'name': medicine.name, 'generic_name': medicine.generic_name or ''},
+        'substitutes': substitutes[:limit]
+    }
+
+
+def medicine_batches(session, medicine_id):
+    """Medicine summary with its sellable batches, or None if not found."""
+    medicine = session.execute(
+        select(Medicine.id, Medicine.name, Medicine.units_per_pack, Medicine.packing_type)
+        .where(Medicine.id == medicine_id)
+    ).first()
+    if medicine is None:
+        return None
+    
+    # Get available batches (in stock, not expired)
+    today = datetime.now().date()
+    available_batches = session.execute(
+        select(*BATCH_COLUMNS).where(
+            Batch.medicine_id == medicine_id,
+            Batch.is_active == True,
+            Batch.stock_quantity > 0,
+            Batch.expiry_date >= today
+        ).order_by(Batch.expiry_date)
+    ).all()
+    
+    return {
+        'medicine': {
+            'id': medicine.id,
+            'name': medicine.name,
+            'units_per_pack': medicine.units_per_pack,
+            'packing_type': medicine.packing_type
+        },
+        'batches': [batch_row(row, medicine.units_per_pack, today) for row in available_batches]
+    }
+
+
+class CheckoutError(Exception):
+    """Cart rejected (empty, invalid quantity/price, unknown batch or not enough stock)."""
+
+
+def _deduct(session, batch, quantity):
+    """
+    Take units from a batch if it still holds them (negative to give back).
+    Returns False when it does not; the batch's stock is reloaded on next use.
+    """
+    deducted = session.execute(
+        update(Batch).where(Batch.id == batch.id, Batch.stock_quantity >= quantity)
+        .values(stock_quantity=Batch.stock_quantity - quantity)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.expire(batch, ['stock_quantity'])
+    return bool(deducted)
+
+
+def _is_id(value):
+    """True for an integer row id (JSON true/false are not ids)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def add_sale(session, data, sale_date=None):
+    """
+    Validate a cart and add the sale, its items and the stock deductions to
+    the session without committing. Nothing is changed when the cart is
+    rejected (CheckoutError), so other sales in the same transaction are safe.
+    """
+    if not isinstance(data, dict) or not data.get('items'):
+        raise CheckoutError('No items in cart')
+    if not isinstance(data['items'], list):
+        raise CheckoutError('Invalid cart items. Must be a list.')
+    
+    sale = Sale(
+        customer_name=data.get('customer_name', ''),
+        customer_phone=data.get('customer_phone', '')
+    )
+    store_id = Store.current_id(session)
+    if store_id is not None:
+        sale.store_id = store_id
+    if sale_date:
+        sale.sale_date = sale_date
+    
+    deductions = {}  # batch -> units taken by this cart
+    for item in data['items']:
+        if not isinstance(item, dict):
+            raise CheckoutError('Invalid cart item. Must be an object.')
+        
+        # Validate quantity and price
+        quantity = item.get('quantity', 0)
+        unit_price = item.get('unit_price', 0)
+        
+        if not isinstance(quantity, (int, float)) or quantity <= 0:
+            raise CheckoutError('Invalid quantity. Must be a positive number.')
+        
+        if not isinstance(unit_price, (int, float)) or unit_price < 0:
+            raise CheckoutError('Invalid price. Must be a non-negative number.')
+        
+        quantity = int(quantity)
+        unit_price = float(unit_price)
+        
+        if item.get('is_unlisted'):
+            # Unlisted item
+            sale.items.append(SaleItem(
+                batch_id=None,
+                item_name=str(item.get('name', 'Unlisted Item'))[:100],
+                quantity=quantity,
+                price_at_sale=unit_price
+            ))
+            continue
+        
+        # Listed item with batch
+        batch = session.get(Batch, item['batch_id']) if _is_id(item.get('batch_id')) else None
+        if not batch or (store_id is not None and batch.store_id != store_id):
+            raise CheckoutError(f'Batch not found: {item.get("batch_id")}')
+        
+        available = batch.stock_quantity - deductions.get(batch, 0)
+        if available < quantity:
+            raise CheckoutError(f'Insufficient stock for {batch.medicine.name}. Available: {available}')
+        deductions[batch] = deductions.get(batch, 0) + quantity
+        
+        sale.items.append(SaleItem(
+            batch_id=batch.id,
+            quantity=quantity,
+            price_at_sale=unit_price
+        ))
+    
+    # Deduct stock only once the whole cart is valid. Each batch is only
+    # decremented if it still holds the units, so a concurrent checkout on
+    # another terminal or process cannot sell them twice.
+    taken = []
+    for batch, quantity in deductions.items():
+        if not _deduct(session, batch, quantity):
+            # Give back what this cart already took
+            for other, units in taken:
+                _deduct(session, other, -units)
+            raise CheckoutError(f'Insufficient stock for {batch.medicine.name}. Available: {batch.stock_quantity}')
+        taken.append((batch, quantity))
+    for batch, quantity in taken:
+        session.add(StockMovement(batch_id=batch.id, kind='sale', quantity=-quantity, sale=sale))
+    
+    sale.total_amount = sum(item.subtotal for item in sale.items)
+    session.add(sale)
+    return sale
+
+
+def sale_created(sale_id, replayed=False):
+    """Success response of a checkout."""
+    response = {
+        'success': True,
+        'sale_id': sale_id,
+        'message': f'Sale #{sale_id} created successfully!'
+    }
+    if replayed:
+        response['replayed'] = True
+    return response
+
+
+def find_idempotent_sale(session, key):
+    """Sale id recorded for an idempotency key, or None."""
+    return session.execute(select(IdempotencyKey.sale_id).where(IdempotencyKey.key == key)).scalar()
+
+
+def checkout(session, data, idempotency_key=None):
+    """
+    Create a sale from cart data and deduct stock.
+    With an idempotency key (Idempotency-Key header), a retry of a request
+    that already succeeded returns the original sale instead of creating
+    another one. Returns (response dict, HTTP status); the session is
+    committed on success and rolled back on any error.
+    """
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > 64:
+            return {'success': False, 'error': 'Invalid Idempotency-Key'}, 400
+        sale_id = find_idempotent_sale(session, idempotency_key)
+        if sale_id is not None:
+            return sale_created(sale_id, replayed=True), 200
+    
+    try:
+        sale = add_sale(session, data)
+        if idempotency_key is not None:
+            session.add(IdempotencyKey(key=idempotency_key, sale=sale))
+        DataVersion.bump(session, 'inventory', 'sales')
+        session.flush()  # Get the sale ID
+        sale_id = sale.id
+        record_sales(session, [sale])
+        session.commit()
+    except CheckoutError as e:
+        session.rollback()
+        return {'success': False, 'error': str(e)}, 400
+    except IntegrityError as e:
+        session.rollback()
+        # A concurrent retry with the same key may have won the race
+        sale_id = find_idempotent_sale(session, idempotency_key) if idempotency_key else None
+        if sale_id is None:
+            return {'success': False, 'error': str(e)}, 500
+        return sale_created(sale_id, replayed=True), 200
+    except Exception as e:
+        session.rollback()
+        return {'success': False, 'error': str(e)}, 500
+    
+    return sale_created(sale_id), 200
+
+
+def parse_sale_date(value):
+    """Original timestamp of an offline sale (ISO 8601) as local naive time."""
+    sale_date = datetime.fromisoformat(value)
+    if sale_date.tzinfo is not None:
+        sale_date = sale_date.astimezone().replace(tzinfo=None)
+    return sale_date
+
+
+def _sync_one(session, data, seen):
+    """Apply one offline sale for sync_sales; returns its result dict."""
+    key = data.get('idempotency_key') if isinstance(data, dict) else None
+    if not key or not isinstance(key, str) or len(key) > 64:
+        return {'idempotency_key': key, 'status': 'error', 'error': 'Missing or invalid idempotency_key'}
+    if key in seen:
+        return {'idempotency_key': key, 'status': 'duplicate', 'sale_id': seen[key]}
+    
+    try:
+        sale_date = parse_sale_date(data['sale_date']) if data.get('sale_date') else None
+    except (TypeError, ValueError):
+        return {'idempotency_key': key, 'status': 'error', 'error': 'Invalid sale_date'}
+    
+    try:
+        sale = add_sale(session, data, sale_date)
+    except CheckoutError as e:
+        return {'idempotency_key': key, 'status': 'error', 'error': str(e)}
+    
+    session.add(IdempotencyKey(key=key, sale=sale))
+    seen[key] = sale
+    return {'idempotency_key': key, 'status': 'created', 'sale_id': sale}
+
+
+def sync_sales(session, sales):
+    """
+    Apply a batch of sales queued offline by a terminal, in one transaction.
+    Each sale carries a client-generated idempotency_key and its original
+    sale_date. Keys seen before (in earlier syncs or earlier in this batch)
+    are reported as duplicates with the original sale id, so a terminal can
+    resend its whole queue after a failed sync.
+    Returns (response dict, HTTP status) with one result per sale, in order.
+    """
+    if not isinstance(sales, list) or not sales:
+        return {'success': False, 'error': 'No sales to sync'}, 400
+    if len(sales) > SYNC_MAX_SALES:
+        return {'success': False, 'error': f'At most {SYNC_MAX_SALES} sales per sync'}, 400
+    
+    try:
+        keys = [data.get('idempotency_key') for data in sales if isinstance(data, dict)]
+        seen = dict(session.execute(
+            select(IdempotencyKey.key, IdempotencyKey.sale_id)
+            .where(IdempotencyKey.key.in_([k for k in keys if isinstance(k, str)]))
+        ).all())
+        
+        # Load every referenced batch in one query (kept referenced so later
+        # lookups hit the identity map); malformed sales are rejected by add_sale
+        batch_ids = {item['batch_id'] for data in sales
+                     if isinstance(data, dict) and isinstance(data.get('items'), list)
+                     for item in data['items']
+                     if isinstance(item, dict) and not item.get('is_unlisted') and _is_id(item.get('batch_id'))}
+        batches = session.execute(select(Batch).where(Batch.id.in_(batch_ids))).scalars().all()
+        
+        results = []
+        for data in sales:
+            with session.no_autoflush:  # Flush all sales together at the end
+                results.append(_sync_one(session, data, seen))
+        
+        # New sales get their ids on flush
+        if any(result['status'] == 'created' for result in results):
+            DataVersion.bump(session, 'inventory', 'sales')
+        session.flush()
+        created = [result['sale_id'] for result in results if result['status'] == 'created']
+        if created:
+            record_sales(session, created)
+        for result in results:
+            if isinstance(result.get('sale_id'), Sale):
+                result['sale_id'] = result['sale_id'].id
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        return {'success': False, 'error': str(e)}, 500
+    
+    return {'success': True, 'results': results}, 200
@@ -0,0 +1,188 @@
+"""CLI commands (run with `flask <command>`)."""
+import click
+from flask.cli import AppGroup
+
+analytics_cli = AppGroup('analytics', help='Columnar sales snapshot and demand forecasts.')
+batches_cli = AppGroup('batches', help='Batch maintenance.')
+archive_cli = AppGroup('archive', help='Move old sales to the archive database.')
+stock_cli = AppGroup('stock', help='Stock movement ledger.')
+assets_cli = AppGroup('assets', help='Self-hosted frontend assets.')
+replica_cli = AppGroup('replica', help='Read replica for reports.')
+stores_cli = AppGroup('stores', help='Stores sharing this database.')
+changes_cli = AppGroup('changes', help='Change feed for external systems.')
+medicines_cli = AppGroup('medicines', help='Medicine catalogue.')
+
+
+@analytics_cli.command('refresh')
+@click.option('--rebuild', is_flag=True, help='Drop the snapshot and extract all sales again.')
+def analytics_refresh(rebuild):
+    """Append new sale items to the analytics snapshot."""
+    from flask import current_app
+    if not current_app.config.get('ANALYTICS_SNAPSHOT_DIR'):
+        raise click.ClickException('ANALYTICS_SNAPSHOT_DIR is not set')
+    
+    from app.analytics import get_snapshot
+    snapshot = get_snapshot()
+    added = snapshot.rebuild() if rebuild else snapshot.refresh()
+    click.echo(f'Added {added} sale items ({snapshot.rows} total)')
+
+
+@analytics_cli.command('forecast')
+@click.option('--history-days', type=int, default=None, help='Days of history to fit (default FORECAST_HISTORY_DAYS).')
+def analytics_forecast(history_days):
+    """Fit daily demand forecasts for every active medicine."""
+    import time
+    from app.forecast import run_forecast
+    started = time.perf_counter()
+    count = run_forecast(history_days=history_days)
+    click.echo(f'Forecast {count} medicines in {time.perf_counter() - started:.1f}s')
+
+
+@batches_cli.command('sweep')
+@click.option('--dry-run', is_flag=True, help='Only report what would be swept.')
+def batches_sweep(dry_run):
+    """Deactivate expired/empty batches and write off expired stock."""
+    from app.sweeper import sweep_batches
+    result = sweep_batches(dry_run=dry_run)
+    prefix = 'Would sweep' if dry_run else 'Swept'
+    click.echo(f"{prefix} {result['expired']} expired and {result['empty']} empty batches; "
+               f"{result['units']} units written off (value {result['value']:.2f})")
+
+
+@archive_cli.command('sales')
+@click.option('--older-than', type=int, default=None, help='Age in days (default ARCHIVE_AFTER_DAYS).')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Sales per transaction.')
+@click.option('--vacuum', is_flag=True, help='VACUUM the primary SQLite database afterwards.')
+def archive_sales_command(older_than, chunk_size, vacuum):
+    """Move old sales to the archive database (safe to re-run)."""
+    from app.archive import archive_enabled, archive_sales, vacuum_primary
+    if not archive_enabled():
+        raise click.ClickException('No archive database configured')
+    
+    moved = archive_sales(older_than, chunk_size, progress=lambda n: click.echo(f'  {n} sales archived...'))
+    click.echo(f'Archived {moved} sales')
+    if vacuum and vacuum_primary():
+        click.echo('Primary database vacuumed')
+
+
+@stock_cli.command('checkpoint')
+def stock_checkpoint():
+    """Snapshot current stock so historical queries stay fast."""
+    from app.stock import take_checkpoint
+    checkpoint = take_checkpoint()
+    click.echo(f'Checkpoint #{checkpoint.id}: {len(checkpoint.snapshots)} batches in stock')
+
+
+@stock_cli.command('valuation')
+@click.option('--date', 'on_date', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Value stock at the end of this day (default: now).')
+def stock_valuation_command(on_date):
+    """Print stock value at cost and at MRP."""
+    from datetime import datetime
+    from app.stock import stock_valuation
+    at = datetime.combine(on_date.date(), datetime.max.time()) if on_date else datetime.now()
+    rows, _ = stock_valuation(at)
+    click.echo(f"Stock at {at:%Y-%m-%d %H:%M}: {sum(r['units'] for r in rows)} units, "
+               f"cost {sum(r['cost_value'] for r in rows):.2f}, MRP {sum(r['retail_value'] for r in rows):.2f}")
+
+
+@assets_cli.command('vendor')
+@click.option('--force', is_flag=True, help='Download again even if already vendored.')
+def assets_vendor(force):
+    """Download Bootstrap, Bootstrap Icons and Chart.js into app/static/vendor."""
+    from app.assets import vendor_assets
+    try:
+        fetched = vendor_assets(force=force, progress=lambda path, size: click.echo(f'  {path} ({size:,} bytes)'))
+    except OSError as e:
+        raise click.ClickException(f'Download failed: {e}')
+    click.echo(f'Vendored {fetched} files')
+
+
+@replica_cli.command('sync')
+@click.option('--every', type=float, default=None, help='Keep syncing every SECONDS (default: once).')
+def replica_sync(every):
+    """Copy the primary SQLite database to the replica."""
+    import time
+    from app.replica import replica_enabled, sync_sqlite_replica
+    if not replica_enabled():
+        raise click.ClickException('REPLICA_DATABASE_URL is not set')
+    
+    while True:
+        try:
+            took = sync_sqlite_replica()
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Replica synced in {took:.2f}s')
+        if every is None:
+            break
+        time.sleep(every)
+
+
+@stores_cli.command('add')
+@click.argument('code')
+@click.argument('name')
+def stores_add(code, name):
+    """Add a store. Run its deployment with STORE_ID set to the id printed."""
+    from sqlalchemy.exc import IntegrityError
+    from app.stores import add_store
+    try:
+        store = add_store(code, name)
+    except IntegrityError:
+        raise click.ClickException(f'Store {code} already exists')
+    click.echo(f'Store {store.code} added with STORE_ID={store.id}')
+
+
+@stores_cli.command('list')
+def stores_list():
+    """List stores and their ids."""
+    from app.models import Store
+    for store in Store.query.order_by(Store.id):
+        click.echo(f'{store.id:>4}  {store.code:<10} {store.name}')
+
+
+@stores_cli.command('summarize')
+def stores_summarize():
+    """Fold new sales into the per-store daily summaries."""
+    from app.stores import refresh_store_summaries
+    click.echo(f'Summarized {refresh_store_summaries()} sales')
+
+
+@changes_cli.command('prune')
+@click.option('--older-than', type=int, default=90, show_default=True, help='Age in days.')
+def changes_prune(older_than):
+    """Delete old change feed events (consumers must have read them)."""
+    from app.main import db
+    from app.changes import prune_changes
+    click.echo(f'Deleted {prune_changes(db.session, older_than)} events')
+
+
+@medicines_cli.command('index-compositions')
+def medicines_index_compositions():
+    """Recompute the composition keys used to find substitutes (after upgrading)."""
+    from app.main import db
+    from app.models import DataVersion, Medicine
+    from app.models.medicine import composition_key
+    changed = 0
+    for medicine in Medicine.query:
+        key = composition_key(medicine.generic_name)
+        if medicine.composition_key != key:
+            medicine.composition_key = key
+            changed += 1
+    if changed:
+        # Cached substitute lists (ETags) are stale
+        DataVersion.bump(db.session, 'inventory')
+    db.session.commit()
+    click.echo(f'Updated {changed} medicines')
+
+
+def register_commands(app):
+    """Attach CLI command groups to the app."""
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(batches_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(stores_cli)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(medicines_cli)
@@ -0,0 +1,51 @@
+"""
+Response compression.
+
+HTML, JSON, CSS and JavaScript responses larger than COMPRESS_MIN_SIZE are
+compressed with brotli (when installed) or gzip, whichever the client
+prefers. Strong ETags get the encoding appended, since the compressed body
+is a different representation. Streamed responses and files are left alone.
+"""
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = {'text/html', 'application/json', 'text/css', 'application/javascript', 'text/javascript'}
+
+# Preferred first
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)  # Fast enough for per-request use
+    return gzip.compress(data, 6)
+
+
+def compress_response(response):
+    """after_request hook: compress the body when worthwhile."""
+    if (response.mimetype not in COMPRESSIBLE_TYPES or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None or response.content_length is None \
+            or response.content_length < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
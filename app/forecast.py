@@ -0,0 +1,179 @@
+"""
+Daily demand forecasts per medicine.
+
+Sales history is laid out as a dense medicine x day matrix and all series
+are fitted together: additive exponential smoothing (level plus weekly
+seasonality) steps through the days once for every medicine and every
+pair of smoothing weights in the grid, and each medicine keeps the pair
+with the smallest one-day-ahead error. Run nightly from cron:
+    flask analytics forecast
+
+Uses the columnar snapshot when ANALYTICS_SNAPSHOT_DIR is set, otherwise
+one grouped query (plus the archive when it reaches back far enough).
+Requires NumPy.
+"""
+import json
+from datetime import date, datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, func, select
+from app.main import db
+from app.analytics import get_snapshot, to_day
+from app.archive import archive_reaches
+from app.models import ArchivedSale, ArchivedSaleItem, Batch, DataVersion, DemandForecast, Medicine, Sale, SaleItem, Store
+from app.stores import store_filter
+
+# Smoothing weight grid for the level (alpha) and the weekly pattern (gamma)
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+GAMMAS = (0.05, 0.1, 0.2, 0.3)
+
+HORIZON_DAYS = 28
+INSERT_CHUNK = 5000
+
+
+def _grouped_sales(start, end):
+    """(medicine_id, day number, units) arrays of listed sales from the database."""
+    bounds = (datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.max.time()))
+    day = func.date(Sale.sale_date)
+    queries = [
+        select(Batch.medicine_id, day, func.sum(SaleItem.quantity))
+        .select_from(SaleItem)
+        .join(Sale, SaleItem.sale_id == Sale.id)
+        .join(Batch, SaleItem.batch_id == Batch.id)
+        .where(Sale.sale_date.between(*bounds))
+        .group_by(Batch.medicine_id, day)
+    ]
+    if archive_reaches(start):
+        archived_day = func.date(ArchivedSale.sale_date)
+        queries.append(
+            select(ArchivedSaleItem.medicine_id, archived_day, func.sum(ArchivedSaleItem.quantity))
+            .join(ArchivedSale)
+            .where(ArchivedSaleItem.medicine_id.isnot(None), ArchivedSale.sale_date.between(*bounds))
+            .group_by(ArchivedSaleItem.medicine_id, archived_day)
+        )
+    
+    day_numbers = {}  # func.date() result -> day number (few distinct values)
+    medicines, days, units = [], [], []
+    for query in queries:
+        for medicine_id, sale_day, quantity in db.session.execute(query):
+            if sale_day not in day_numbers:
+                value = sale_day if isinstance(sale_day, date) else date.fromisoformat(str(sale_day)[:10])
+                day_numbers[sale_day] = to_day(value)
+            medicines.append(medicine_id)
+            days.append(day_numbers[sale_day])
+            units.append(quantity)
+    return np.array(medicines, dtype=np.int64), np.array(days, dtype=np.int64), np.array(units, dtype=np.float64)
+
+
+def _snapshot_sales(start, end):
+    """(medicine_id, day number, units) arrays of listed sales from the columnar snapshot."""
+    snapshot = get_snapshot()
+    snapshot.refresh()
+    c = snapshot.columns
+    mask = (c['day'] >= to_day(start)) & (c['day'] <= to_day(end)) & (c['medicine_id'] >= 0)
+    return c['medicine_id'][mask].astype(np.int64), c['day'][mask].astype(np.int64), c['quantity'][mask].astype(np.float64)
+
+
+def demand_matrix(start, end):
+    """
+    Units sold per active medicine per day from start to end (inclusive).
+    Returns (medicine ids, matrix of shape medicines x days).
+    """
+    medicine_ids = np.array(db.session.execute(
+        select(Medicine.id).where(Medicine.is_active == True).order_by(Medicine.id)
+    ).scalars().all(), dtype=np.int64)
+    days = (end - start).days + 1
+    
+    if current_app.config.get('ANALYTICS_SNAPSHOT_DIR'):
+        medicines, day_numbers, units = _snapshot_sales(start, end)
+    else:
+        medicines, day_numbers, units = _grouped_sales(start, end)
+    
+    # Row of each sale in the matrix (sales of inactive medicines are dropped)
+    rows = np.searchsorted(medicine_ids, medicines)
+    known = rows < len(medicine_ids)
+    known[known] = medicine_ids[rows[known]] == medicines[known]
+    cells = rows[known] * days + (day_numbers[known] - to_day(start))
+    matrix = np.bincount(cells, weights=units[known], minlength=len(medicine_ids) * days)
+    return medicine_ids, matrix.reshape(len(medicine_ids), days)
+
+
+def fit(history, first_weekday):
+    """
+    Fit level + weekly seasonality to every row of `history` (series x days,
+    first day falling on `first_weekday`), for the whole weight grid at once.
+    Returns (level, seasonal offsets by weekday, alpha, gamma, mean absolute error),
+    one entry per series.
+    """
+    series, days = history.shape
+    if days < 14:
+        raise ValueError('At least 14 days of history are needed')
+    
+    alpha = np.repeat(ALPHAS, len(GAMMAS))[:, None]  # grid x 1
+    gamma = np.tile(GAMMAS, len(ALPHAS))[:, None]
+    grid = len(alpha)
+    
+    # Start from the first week: its mean as level, its deviations as the pattern
+    level = np.tile(history[:, :7].mean(axis=1), (grid, 1))  # grid x series
+    seasonal = np.zeros((7, grid, series))  # weekday x grid x series
+    for t in range(7):
+        seasonal[(first_weekday + t) % 7] = history[:, t] - level
+    
+    abs_error = np.zeros((grid, series))
+    for t in range(7, days):
+        weekday = (first_weekday + t) % 7
+        observed = history[:, t]
+        pattern = seasonal[weekday]
+        abs_error += np.abs(observed - level - pattern)
+        new_level = alpha * (observed - pattern) + (1 - alpha) * level
+        seasonal[weekday] = gamma * (observed - new_level) + (1 - gamma) * pattern
+        level = new_level
+    
+    best = abs_error.argmin(axis=0)
+    picked = np.arange(series)
+    return (level[best, picked], seasonal[:, best, picked].T,
+            alpha[best, 0], gamma[best, 0], abs_error[best, picked] / (days - 7))
+
+
+def run_forecast(today=None, history_days=None):
+    """
+    Fit every active medicine on the store's history up to yesterday and
+    replace its stored forecasts. Returns the number of medicines forecast.
+    """
+    today = today or datetime.now().date()
+    history_days = history_days or current_app.config['FORECAST_HISTORY_DAYS']
+    end = today - timedelta(days=1)  # Last complete day
+    start = end - timedelta(days=history_days - 1)
+    
+    medicine_ids, history = demand_matrix(start, end)
+    level, seasonal, alpha, gamma, mae = fit(history, start.weekday())
+    
+    # Totals over the horizon, by the weekday of each coming day
+    weekdays = [(end + timedelta(days=i)).weekday() for i in range(1, HORIZON_DAYS + 1)]
+    ahead = np.clip(level[:, None] + seasonal[:, weekdays], 0, None)
+    next_7, next_28 = ahead[:, :7].sum(axis=1), ahead.sum(axis=1)
+    
+    store_id = Store.current_id()
+    rows = [{
+        'store_id': store_id,
+        'medicine_id': int(medicine_ids[i]),
+        'level': float(level[i]),
+        'seasonal': json.dumps([round(float(s), 4) for s in seasonal[i]]),
+        'alpha': float(alpha[i]),
+        'gamma': float(gamma[i]),
+        'mae': float(mae[i]),
+        'next_7_days': float(next_7[i]),
+        'next_28_days': float(next_28[i]),
+        'fitted_on': end,
+    } for i in range(len(medicine_ids))]
+    
+    try:
+        db.session.execute(delete(DemandForecast).where(store_filter(DemandForecast)))
+        for i in range(0, len(rows), INSERT_CHUNK):
+            db.session.execute(DemandForecast.__table__.insert(), rows[i:i + INSERT_CHUNK])
+        DataVersion.bump(db.session, 'forecasts')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
@@ -0,0 +1,220 @@
+"""
+Live dashboard updates (server-sent events).
+
+The dashboard keeps GET /live open and receives small updates instead of
+being reloaded: each new sale with today's revenue, medicines going below
+(or back above) their min_stock_level and batches entering or leaving the
+Expiring Soon window. Updates are derived from the change feed
+(app.changes), so sales made by the POS server or other workers show up too.
+
+Each update carries absolute values (today's total, counts, stock) read
+with indexed lookups of the rows an event touched, so nothing drifts when
+a stream reconnects. A stream sleeps until a change is committed (see
+app.changes), ends after STREAM_SECONDS and the browser reconnects. While
+open it holds a worker thread, so at most LIVE_MAX_STREAMS are served per
+process; beyond that /live answers 503 and the page falls back to reloading.
+"""
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+from app.changes import read_changes
+from app.models import Batch, Category, ChangeEvent, Medicine, Sale
+
+EXPIRY_DAYS = 30  # The dashboard's Expiring Soon window
+STREAM_SECONDS = 300  # Then the browser reconnects
+KEEPALIVE_SECONDS = 15  # Also how soon a closed page frees its worker
+RETRY_MS = 3000  # Browser reconnect delay
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+def open_stream(limit):
+    """Take one of `limit` stream slots of this process; False if all are taken."""
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= limit:
+            return False
+        _open_streams += 1
+        return True
+
+
+def close_stream():
+    """Give back the slot of a finished stream."""
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+
+def today_sales(session, today):
+    """Revenue of the day's sales (a range on the sale date index)."""
+    start = datetime.combine(today, datetime.min.time())
+    return session.execute(
+        select(func.coalesce(func.sum(Sale.total_amount), 0))
+        .where(Sale.sale_date >= start, Sale.sale_date < start + timedelta(days=1))
+    ).scalar()
+
+
+def stock_levels(session, medicine_ids=None, low_only=False):
+    """
+    Active medicines with their stock in active batches, in one grouped
+    query: dicts with id, name, category, total_stock, min_stock_level, low.
+    """
+    units = func.coalesce(func.sum(Batch.stock_quantity), 0)
+    query = select(
+        Medicine.id, Medicine.name, Category.name, units, Medicine.min_stock_level
+    ).outerjoin(Category, Medicine.category_id == Category.id).outerjoin(
+        Batch, (Batch.medicine_id == Medicine.id) & (Batch.is_active == True)
+    ).where(Medicine.is_active == True).group_by(
+        Medicine.id, Medicine.name, Category.name, Medicine.min_stock_level
+    ).order_by(Medicine.id)
+    if medicine_ids is not None:
+        query = query.where(Medicine.id.in_(medicine_ids))
+    if low_only:
+        query = query.having(units <= Medicine.min_stock_level)
+    
+    return [{
+        'id': medicine_id,
+        'name': name,
+        'category': category,
+        'total_stock': total_stock,
+        'min_stock_level': min_stock_level,
+        'low': total_stock <= min_stock_level,
+    } for medicine_id, name, category, total_stock, min_stock_level in session.execute(query).all()]
+
+
+def _expiring(batch, today):
+    """True if a batch (change feed data) counts as Expiring Soon."""
+    expiry_date = date.fromisoformat(batch['expiry_date'])
+    return (batch['is_active'] and batch['stock_quantity'] > 0
+            and today <= expiry_date <= today + timedelta(days=EXPIRY_DAYS))
+
+
+class LiveDashboard:
+    """Dashboard figures of one stream, updated from change feed events."""
+    
+    def __init__(self, session):
+        self.session = session
+        self.reset()
+    
+    def reset(self):
+        """Read the figures from scratch (on connect and when the day changes)."""
+        self.today = datetime.now().date()
+        self.revenue = today_sales(self.session, self.today)
+        self.low = {m['id']: m['total_stock'] for m in stock_levels(self.session, low_only=True)}
+        self.expiring = dict(self.session.execute(
+            select(Batch.id, Batch.stock_quantity).where(
+                Batch.is_active == True,
+                Batch.stock_quantity > 0,
+                Batch.expiry_date >= self.today,
+                Batch.expiry_date <= self.today + timedelta(days=EXPIRY_DAYS)
+            )
+        ).all())
+    
+    def stats(self):
+        return {
+            'today_sales': self.revenue,
+            'low_stock_count': len(self.low),
+            'expiring_soon_count': len(self.expiring),
+        }
+    
+    def apply(self, events):
+        """Updates for a batch of change feed events: [(event name, data)]."""
+        updates = []
+        
+        sales = [e for e in events if e['entity'] == 'sale' and e['action'] == 'created'
+                 and e['data']['sale_date'][:10] == self.today.isoformat()]
+        if sales:
+            self.revenue = today_sales(self.session, self.today)
+            for event in sales:
+                updates.append(('sale', {
+                    'id': event['entity_id'],
+                    'sale_date': event['data']['sale_date'],
+                    'customer_name': event['data']['customer_name'],
+                    'total_amount': event['data']['total_amount'],
+                    'today_sales': self.revenue,
+                }))
+        
+        # Latest state of each batch touched; medicines whose stock may have changed
+        batches = {e['entity_id']: e['data'] for e in events if e['entity'] == 'batch'}
+        batch_medicines = {data['medicine_id'] for data in batches.values()}
+        medicine_ids = batch_medicines | {e['entity_id'] for e in events if e['entity'] == 'medicine'}
+        names = dict(self.session.execute(
+            select(Medicine.id, Medicine.name).where(Medicine.id.in_(batch_medicines))
+        ).all()) if batch_medicines else {}
+        
+        for batch_id, data in batches.items():
+            expiring = _expiring(data, self.today)
+            if expiring:
+                if self.expiring.get(batch_id) == data['stock_quantity']:
+                    continue
+                self.expiring[batch_id] = data['stock_quantity']
+            elif self.expiring.pop(batch_id, None) is None:
+                continue
+            expiry_date = date.fromisoformat(data['expiry_date'])
+            updates.append(('expiry', {
+                'batch_id': batch_id,
+                'medicine_name': names.get(data['medicine_id'], ''),
+                'batch_number': data['batch_number'],
+                'expiry_date': data['expiry_date'],
+                'days_left': (expiry_date - self.today).days,
+                'stock_quantity': data['stock_quantity'],
+                'expiring': expiring,
+                'expiring_soon_count': len(self.expiring),
+            }))
+        
+        if medicine_ids:
+            levels = {m['id']: m for m in stock_levels(self.session, medicine_ids)}
+            for medicine_id in sorted(medicine_ids):
+                medicine = levels.get(medicine_id)
+                low = medicine is not None and medicine['low']
+                if low:
+                    if self.low.get(medicine_id) == medicine['total_stock']:
+                        continue
+                    self.low[medicine_id] = medicine['total_stock']
+                elif self.low.pop(medicine_id, None) is None:
+                    continue
+                updates.append(('low_stock', {
+                    'medicine_id': medicine_id,
+                    'name': medicine['name'] if medicine else '',
+                    'category': medicine['category'] if medicine else None,
+                    'total_stock': medicine['total_stock'] if medicine else 0,
+                    'low': low,
+                    'low_stock_count': len(self.low),
+                }))
+        return updates
+
+
+def sse_message(event, data):
+    """One server-sent event."""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def dashboard_stream(session):
+    """
+    Generator of server-sent events for the dashboard: the current figures,
+    then updates as changes arrive, with a comment line as keepalive.
+    """
+    # Cursor first: changes made while the figures are read are applied
+    # again, which is harmless since updates are absolute
+    cursor = session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+    live = LiveDashboard(session)
+    yield f'retry: {RETRY_MS}\n' + sse_message('stats', live.stats())
+    
+    deadline = time.monotonic() + STREAM_SECONDS
+    while time.monotonic() < deadline:
+        feed = read_changes(session, cursor, wait=KEEPALIVE_SECONDS)
+        cursor = feed['next']
+        
+        if datetime.now().date() != live.today:
+            live.reset()
+            yield sse_message('stats', live.stats())
+        updates = live.apply(feed['events'])
+        if updates:
+            yield ''.join(sse_message(event, data) for event, data in updates)
+        elif not feed['events']:
+            yield ': keepalive\n\n'
+        # No connection is held between polls
+        session.rollback()
@@ -1,49 +1,162 @@
 import os
+import threading
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from werkzeug.local import LocalProxy
+from werkzeug.utils import import_string
 from datetime import datetime
+from app.replica import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-def create_app():
+# Rarely used blueprints, imported on the first request when LAZY_BLUEPRINTS is set
+LAZY_BLUEPRINTS = ('app.routes.categories:categories', 'app.routes.reports:reports')
+
+
+class LazyBlueprints:
+    """WSGI middleware that registers deferred blueprints just before the first request."""
+    
+    def __init__(self, app, blueprints):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.pending = list(blueprints)
+        self.lock = threading.Lock()
+    
+    def __call__(self, environ, start_response):
+        if self.pending:
+            with self.lock:  # Concurrent first requests wait for the registration
+                for name in self.pending:
+                    self.app.register_blueprint(import_string(name))
+                self.pending = []
+            self.app.wsgi_app = self.wsgi_app
+        return self.wsgi_app(environ, start_response)
+
+def create_app(config=None):
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'  
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # Report aggregation: worker processes (1 = in-process) and days per chunk
+    app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 1))
+    app.config['REPORT_CHUNK_DAYS'] = int(os.environ.get('REPORT_CHUNK_DAYS', 90))
+    
+    # Archive database for old sales (tables are created by `flask archive sales`)
+    app.config['SQLALCHEMY_BINDS'] = {
+        'archive': os.environ.get('ARCHIVE_DATABASE_URL', 'sqlite:///archive.db')
+    }
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 730))
+    
+    # WAL mode for a SQLite primary, so reports and replica syncs never hold up a sale
+    app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+    
+    # Read replica for reports and read-only API (unset = primary only) and how stale it may be (seconds)
+    app.config['REPLICA_DATABASE_URL'] = os.environ.get('REPLICA_DATABASE_URL')
+    app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 60))
+    
+    # Reorder suggestions: supplier lead time and days of stock to order for
+    app.config['REORDER_LEAD_DAYS'] = int(os.environ.get('REORDER_LEAD_DAYS', 7))
+    app.config['REORDER_REVIEW_DAYS'] = int(os.environ.get('REORDER_REVIEW_DAYS', 30))
+    
+    # Days of sales history used by `flask analytics forecast`
+    app.config['FORECAST_HISTORY_DAYS'] = int(os.environ.get('FORECAST_HISTORY_DAYS', 364))
+    
+    # Smallest HTML/JSON response worth compressing (bytes)
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    
+    # Compiled templates on disk ('' = off) and rendered {% cache %} fragments kept per process
+    app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 500))
+    
+    # Live dashboard streams served at once per process (each holds a thread)
+    app.config['LIVE_MAX_STREAMS'] = int(os.environ.get('LIVE_MAX_STREAMS', 4))
+    
+    # Import reports/categories on the first request instead of at startup (not under the CLI)
+    app.config['LAZY_BLUEPRINTS'] = os.environ.get('LAZY_BLUEPRINTS', '') == '1'
+    
+    # Store this deployment serves (see app.stores)
+    app.config['STORE_ID'] = int(os.environ.get('STORE_ID', 1))
+    
+    # Columnar sales snapshot for reports (requires NumPy; unset = query SQL)
+    app.config['ANALYTICS_SNAPSHOT_DIR'] = os.environ.get('ANALYTICS_SNAPSHOT_DIR')
+    
+    # Overrides (used by scripts and benchmarks)
+    if config:
+        app.config.update(config)
+    
+    if app.config['REPLICA_DATABASE_URL']:
+        from app.replica import REPLICA_BIND, replica_bind
+        app.config['SQLALCHEMY_BINDS'] = {
+            **app.config['SQLALCHEMY_BINDS'], REPLICA_BIND: replica_bind(app.config['REPLICA_DATABASE_URL'])
+        }
     
     # Initialize extensions
     db.init_app(app)
-    
-    # Context processor to make 'now' available in all templates
-    @app.context_processor
-    def inject_now():
-        return {'now': datetime.now()}
+    if app.config['SQLITE_WAL']:
+        from app.replica import enable_wal
+        with app.app_context():
+            enable_wal(db.engine)
     
     # Import models (important for migrations)
-    from app.models import Category, Medicine, Batch, Sale, SaleItem
+    from app.models import Category, Medicine, Batch, Sale, SaleItem, WriteOff, ArchivedSale, ArchivedSaleItem, IdempotencyKey
+    from app.models import StockMovement, StockCheckpoint, StockSnapshot, DemandForecast, DataVersion, Store, StoreDailySales, ChangeEvent
+    
+    # JSON responses (orjson when installed)
+    from app.serializers import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
+    # Template bytecode cache and fragment caching (before the Jinja environment is created)
+    from jinja2 import FileSystemBytecodeCache
+    from app.caching import FragmentCacheExtension, data_versions
+    app.jinja_options = {**app.jinja_options, 'extensions': [FragmentCacheExtension]}
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_options['bytecode_cache'] = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+    app.jinja_env.globals['data_versions'] = data_versions
+    
+    # 'now' in templates, evaluated only where a template uses it
+    app.jinja_env.globals['now'] = LocalProxy(datetime.now)
     
     # Import Routes
     from app.routes.home import home
     from app.routes.medicines import medicines
     from app.routes.api import api
     from app.routes.sales import bp as sales
-    from app.routes.categories import categories
-    from app.routes.reports import reports
-
+    
     # Register Routes
     app.register_blueprint(home, url_prefix='/')
     app.register_blueprint(medicines, url_prefix='/medicines')
     app.register_blueprint(api, url_prefix='/api')
     app.register_blueprint(sales)
-    app.register_blueprint(categories)
-    app.register_blueprint(reports)
-
-
-
-
-    migrate = Migrate(app, db)
+    
+    # The CLI (flask routes, scripts) always gets every route
+    cli = click.get_current_context(silent=True) is not None
+    if app.config['LAZY_BLUEPRINTS'] and not cli:
+        app.wsgi_app = LazyBlueprints(app, LAZY_BLUEPRINTS)
+    else:
+        for name in LAZY_BLUEPRINTS:
+            app.register_blueprint(import_string(name))
+    
+    # Self-hosted frontend assets and response compression
+    from app.assets import assets, asset_url, missing_assets
+    from app.compression import init_compression
+    app.register_blueprint(assets)
+    app.jinja_env.globals['asset_url'] = asset_url
+    init_compression(app)
+    missing = missing_assets()
+    if missing and not cli:
+        app.logger.warning('Frontend assets not vendored, pages load them from the CDN: %s '
+                           '(run `flask assets vendor`)', ', '.join(missing))
+    
+    # CLI commands (flask analytics ...)
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Migrations are only needed by `flask db` (Alembic is slow to import)
+    if cli:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
     return app
\ No newline at end of file
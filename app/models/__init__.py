@@ -1,5 +1,18 @@
 from app.main import db
+from app.models.store import Store, StoreDailySales, StoreScoped
 from app.models.category import Category
 from app.models.medicine import Medicine
 from app.models.batch import Batch
 from app.models.sale import Sale, SaleItem
+from app.models.write_off import WriteOff
+from app.models.archive import ArchivedSale, ArchivedSaleItem
+from app.models.idempotency import IdempotencyKey
+from app.models.stock import StockMovement, StockCheckpoint, StockSnapshot
+from app.models.forecast import DemandForecast
+from app.models.version import DataVersion
+from app.models.change import ChangeEvent
+
+# Set up backrefs (Medicine.batches, Medicine.category, ...) now, so they can
+# be used in query options before the first query runs
+from sqlalchemy.orm import configure_mappers
+configure_mappers()
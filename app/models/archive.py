@@ -0,0 +1,80 @@
+from datetime import datetime
+from sqlalchemy.orm import joinedload
+from app.main import db
+from app.models.store import StoreScoped
+
+
+class ArchivedSale(StoreScoped, db.Model):
+    """Sale moved to the archive database. Keeps the original sale id and store."""
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_sales'
+    __table_args__ = (
+        db.Index('ix_archived_sales_store_date', 'store_id', 'sale_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sale_date = db.Column(db.DateTime, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    
+    customer_name = db.Column(db.String(100))
+    customer_phone = db.Column(db.String(20))
+    
+    archived_at = db.Column(db.DateTime, default=datetime.now)
+    
+    # Relationship
+    items = db.relationship('ArchivedSaleItem', backref='sale', lazy=True, cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<ArchivedSale #{self.id} - ₹{self.total_amount}>'
+    
+    @property
+    def is_archived(self):
+        return True
+    
+    def calculate_total(self):
+        """Calculate total from sale items."""
+        return sum(item.quantity * item.price_at_sale for item in self.items)
+    
+    @classmethod
+    def get_with_items(cls, sale_id):
+        """Load an archived sale with its items in one query."""
+        return cls.query.options(joinedload(cls.items)).filter(cls.id == sale_id).first()
+
+
+class ArchivedSaleItem(db.Model):
+    """
+    Archived sale item. Medicine, category and cost are copied in at
+    archive time since batches live in the primary database.
+    """
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_sale_items'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey('archived_sales.id'), nullable=False, index=True)
+    
+    # Original references (no foreign keys across databases)
+    batch_id = db.Column(db.Integer)
+    medicine_id = db.Column(db.Integer, index=True)
+    category_id = db.Column(db.Integer)
+    
+    # Denormalized display data
+    medicine_name = db.Column(db.String(100))
+    category_name = db.Column(db.String(50))
+    batch_number = db.Column(db.String(50))
+    item_name = db.Column(db.String(100))
+    
+    quantity = db.Column(db.Integer, nullable=False)
+    price_at_sale = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float)  # NULL when cost was unknown
+    
+    def __repr__(self):
+        return f'<ArchivedSaleItem Sale:{self.sale_id} x{self.quantity}>'
+    
+    @property
+    def is_listed_item(self):
+        return self.batch_id is not None
+    
+    @property
+    def subtotal(self):
+        """Calculate subtotal for this item."""
+        return self.quantity * self.price_at_sale
@@ -1,12 +1,20 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
 from app.main import db
+from app.models.medicine import Medicine
+from app.models.store import StoreScoped
 
 
-class Batch(db.Model):
-    """Specific batch of a medicine with expiry and stock."""
+class Batch(StoreScoped, db.Model):
+    """Specific batch of a medicine with expiry and stock, held by one store."""
     __tablename__ = 'batches'
     __table_args__ = (
-        db.UniqueConstraint('medicine_id', 'batch_number', name='unique_batch_per_medicine'),
+        # Store first: every query is scoped to one store
+        db.UniqueConstraint('store_id', 'medicine_id', 'batch_number', name='unique_batch_per_store_medicine'),
+        db.Index('ix_batches_store_active_expiry', 'store_id', 'is_active', 'expiry_date'),
+        # Stock of one medicine across all stores (app.stores.stock_by_store)
+        db.Index('ix_batches_medicine_active_expiry', 'medicine_id', 'is_active', 'expiry_date', 'stock_quantity'),
     )
     
     id = db.Column(db.Integer, primary_key=True)
@@ -70,3 +78,64 @@ class Batch(db.Model):
             'days_until_expiry': self.days_until_expiry,
             'is_expiring_soon': self.is_expiring_soon
         }
+
+    @classmethod
+    def unit_cost_expr(cls):
+        """
+        Per-unit stock value as a SQL expression: purchase cost when known,
+        otherwise MRP. Needs Medicine joined in.
+        """
+        price = case(
+            (cls.purchase_price > 0, cls.purchase_price),
+            else_=cls.mrp
+        )
+        return case(
+            (Medicine.units_per_pack > 0, price / Medicine.units_per_pack),
+            else_=price
+        )
+
+    @classmethod
+    def at_risk_query(cls, today, within_days):
+        """Active in-stock batches expiring within N days (incl. expired), medicine eager-loaded."""
+        return cls.query.options(joinedload(cls.medicine)).filter(
+            cls.is_active == True,
+            cls.stock_quantity > 0,
+            cls.expiry_date <= today + timedelta(days=within_days)
+        ).order_by(cls.expiry_date)
+
+    @classmethod
+    def expiry_summary(cls, today, boundaries=(30, 90)):
+        """
+        Bucket active in-stock batches by expiry in one grouped query.
+        Buckets: expired, then 0..boundaries[0] days, boundaries[0]+1..boundaries[1], ...
+        Returns a list of dicts with days (bucket upper bound, None for expired),
+        count and value (stock at unit price).
+        """
+        boundaries = sorted(set(boundaries))
+        bucket = case(
+            (cls.expiry_date < today, -1),
+            *[(cls.expiry_date <= today + timedelta(days=d), d) for d in boundaries],
+        )
+        unit_price = case(
+            (Medicine.units_per_pack > 0, cls.mrp / Medicine.units_per_pack),
+            else_=func.coalesce(cls.mrp, 0)
+        )
+        rows = db.session.query(
+            bucket.label('bucket'),
+            func.count(cls.id),
+            func.sum(cls.stock_quantity * unit_price)
+        ).join(Medicine, cls.medicine_id == Medicine.id).filter(
+            cls.is_active == True,
+            cls.stock_quantity > 0,
+            cls.expiry_date <= today + timedelta(days=boundaries[-1])
+        ).group_by(bucket).all()
+        
+        totals = {key: (count, value or 0) for key, count, value in rows}
+        return [
+            {
+                'days': None if key == -1 else key,
+                'count': totals.get(key, (0, 0))[0],
+                'value': totals.get(key, (0, 0))[1]
+            }
+            for key in [-1] + boundaries
+        ]
@@ -1,5 +1,8 @@
 from datetime import datetime
+from sqlalchemy import and_, case, exists, func, select
 from app.main import db
+from app.models.medicine import Medicine
+from app.models.batch import Batch
 
 
 class Category(db.Model):
@@ -22,7 +25,48 @@ class Category(db.Model):
     @property
     def medicine_count(self):
         """Count of medicines in this category."""
-        return len(self.medicines)
+        return db.session.query(func.count(Medicine.id)).filter(Medicine.category_id == self.id).scalar()
+    
+    @property
+    def has_medicines(self):
+        """True if any medicine uses this category (EXISTS, no rows loaded)."""
+        return db.session.query(exists().where(Medicine.category_id == self.id)).scalar()
+    
+    @classmethod
+    def list_with_counts(cls):
+        """
+        All categories by name with medicine counts in one grouped query.
+        Returns dicts with category, medicines, active, low_stock (active
+        medicines at or below min_stock_level) and stock_value (at cost,
+        MRP when unknown).
+        """
+        # Stock per medicine across active batches
+        stock = select(
+            Batch.medicine_id,
+            func.sum(Batch.stock_quantity).label('units'),
+            func.sum(Batch.stock_quantity * Batch.unit_cost_expr()).label('value')
+        ).join(Medicine, Batch.medicine_id == Medicine.id).where(
+            Batch.is_active == True
+        ).group_by(Batch.medicine_id).subquery()
+        units = func.coalesce(stock.c.units, 0)
+        
+        rows = db.session.query(
+            cls,
+            func.count(Medicine.id),
+            func.sum(case((Medicine.is_active == True, 1), else_=0)),
+            func.sum(case((and_(Medicine.is_active == True, units <= Medicine.min_stock_level), 1), else_=0)),
+            func.sum(func.coalesce(stock.c.value, 0))
+        ).outerjoin(Medicine, Medicine.category_id == cls.id).outerjoin(
+            stock, stock.c.medicine_id == Medicine.id
+        ).group_by(cls.id).order_by(cls.name).all()
+        
+        return [{
+            'category': category,
+            'medicines': medicines,
+            'active': active or 0,
+            'low_stock': low_stock or 0,
+            'stock_value': stock_value or 0,
+        } for category, medicines, active, low_stock, stock_value in rows]
     
     def to_dict(self):
         """Convert to dictionary for JSON responses."""
@@ -0,0 +1,27 @@
+from datetime import datetime
+from app.main import db
+
+
+class ChangeEvent(db.Model):
+    """
+    Append-only feed of changes to sales, stock and the catalogue, written in
+    the same transaction as the change (see app.changes). The id is the
+    consumers' cursor.
+    """
+    __tablename__ = 'change_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    entity = db.Column(db.String(20), nullable=False)  # 'sale', 'batch', 'medicine', 'category'
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # 'created', 'updated', 'deleted'
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))  # None for the shared catalogue
+    data = db.Column(db.JSON, nullable=False)  # Row as of the change
+    
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    ENTITIES = ('sale', 'batch', 'medicine', 'category')
+    ACTIONS = ('created', 'updated', 'deleted')
+    
+    def __repr__(self):
+        return f'<ChangeEvent #{self.id} {self.entity}:{self.entity_id} {self.action}>'
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timedelta
+from app.main import db
+from app.models.store import StoreScoped
+
+
+class DemandForecast(StoreScoped, db.Model):
+    """
+    Fitted daily demand model of one medicine at a store (level plus weekly
+    seasonality), replaced on every forecasting run.
+    """
+    __tablename__ = 'demand_forecasts'
+    __table_args__ = (
+        db.UniqueConstraint('store_id', 'medicine_id', name='unique_forecast_per_store_medicine'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.id'), nullable=False)
+    
+    level = db.Column(db.Float, nullable=False)  # Deseasonalized units per day
+    seasonal = db.Column(db.Text, nullable=False)  # JSON list of 7 offsets, Monday first
+    alpha = db.Column(db.Float, nullable=False)  # Smoothing weights chosen by the fit
+    gamma = db.Column(db.Float, nullable=False)
+    mae = db.Column(db.Float, nullable=False)  # Mean absolute one-day-ahead error
+    
+    # Totals over the next 7 / 28 days from fitted_on, for sorting
+    next_7_days = db.Column(db.Float, nullable=False, default=0)
+    next_28_days = db.Column(db.Float, nullable=False, default=0)
+    
+    fitted_on = db.Column(db.Date, nullable=False)  # Last day of history used
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Relationship
+    medicine = db.relationship('Medicine', backref=db.backref('demand_forecast', uselist=False))
+    
+    def forecast(self, day):
+        """Expected units sold on a date."""
+        return max(0.0, self.level + json.loads(self.seasonal)[day.weekday()])
+    
+    def daily(self, days=28):
+        """[(date, units)] for the days after fitted_on."""
+        seasonal = json.loads(self.seasonal)
+        start = self.fitted_on + timedelta(days=1)
+        return [(d, max(0.0, self.level + seasonal[d.weekday()]))
+                for d in (start + timedelta(days=i) for i in range(days))]
+    
+    def __repr__(self):
+        return f'<DemandForecast Medicine:{self.medicine_id} {self.next_7_days:.1f}/week>'
@@ -0,0 +1,19 @@
+from datetime import datetime
+from app.main import db
+
+
+class IdempotencyKey(db.Model):
+    """Client-generated key of a sale request, so retries return the original sale."""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Relationship
+    sale = db.relationship('Sale')
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} -> Sale #{self.sale_id}>'
@@ -1,7 +1,26 @@
+import re
 from datetime import datetime
+from sqlalchemy.orm import validates
 from app.main import db
 
 
+def composition_key(generic_name):
+    """
+    Normalized composition, so brands of the same generic match: lower case,
+    ingredients sorted, strengths without spaces ('Amoxicillin 500 mg +
+    Clavulanic Acid 125mg' -> 'amoxicillin 500mg+clavulanic acid 125mg').
+    None when there is no generic name.
+    """
+    ingredients = set()
+    for part in re.split(r'\+|,|&|\band\b', (generic_name or '').lower()):
+        part = re.sub(r'[^a-z0-9.%/]+', ' ', part)
+        part = re.sub(r'(\d)\s+(?=[a-z%])', r'\1', part)  # '500 mg' -> '500mg'
+        part = ' '.join(part.split())
+        if part:
+            ingredients.add(part)
+    return '+'.join(sorted(ingredients))[:200] or None
+
+
 class Medicine(db.Model):
     """Medicine/Item sold in the store."""
     __tablename__ = 'medicines'
@@ -19,6 +38,7 @@ class Medicine(db.Model):
     # Basic Info
     manufacturer = db.Column(db.String(100))
     generic_name = db.Column(db.String(100))  # Composition
+    composition_key = db.Column(db.String(200), index=True)  # composition_key(generic_name), for substitutes
     description = db.Column(db.Text)  # Optional notes
     
     # Status
@@ -32,6 +52,11 @@ class Medicine(db.Model):
     def __repr__(self):
         return f'<Medicine {self.name}>'
     
+    @validates('generic_name')
+    def _set_composition_key(self, key, generic_name):
+        self.composition_key = composition_key(generic_name)
+        return generic_name
+    
     @property
     def total_stock(self):
         """Total stock across all active batches."""
@@ -1,10 +1,16 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app.main import db
+from app.models.batch import Batch
+from app.models.store import StoreScoped
 
 
-class Sale(db.Model):
-    """A sale transaction (bill)."""
+class Sale(StoreScoped, db.Model):
+    """A sale transaction (bill) at one store."""
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('ix_sales_store_date', 'store_id', 'sale_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sale_date = db.Column(db.DateTime, default=datetime.now, nullable=False)
@@ -24,6 +30,13 @@ class Sale(db.Model):
         """Calculate total from sale items."""
         return sum(item.quantity * item.price_at_sale for item in self.items)
     
+    @classmethod
+    def get_with_items(cls, sale_id):
+        """Load a sale with its items, batches and medicines in one query."""
+        return cls.query.options(
+            joinedload(cls.items).joinedload(SaleItem.batch).joinedload(Batch.medicine)
+        ).filter(cls.id == sale_id).first()
+    
     def to_dict(self):
         """Convert to dictionary for JSON responses."""
         return {
@@ -40,7 +53,7 @@ class SaleItem(db.Model):
     __tablename__ = 'sale_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False, index=True)
     
     # For listed items (linked to inventory)
     batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=True)
@@ -69,6 +82,18 @@ class SaleItem(db.Model):
         """Calculate subtotal for this item."""
         return self.quantity * self.price_at_sale
     
+    @property
+    def medicine_name(self):
+        """Display name (medicine for listed items, manual name otherwise)."""
+        if self.batch:
+            return self.batch.medicine.name
+        return self.item_name or 'Unlisted Item'
+    
+    @property
+    def batch_number(self):
+        """Batch number for listed items."""
+        return self.batch.batch_number if self.batch else None
+    
     def to_dict(self):
         """Convert to dictionary for JSON responses."""
         if self.batch:
@@ -76,8 +101,8 @@ class SaleItem(db.Model):
             return {
                 'id': self.id,
                 'is_listed': True,
-                'medicine_name': self.batch.medicine.name,
-                'batch_number': self.batch.batch_number,
+                'medicine_name': self.medicine_name,
+                'batch_number': self.batch_number,
                 'quantity': self.quantity,
                 'price_at_sale': self.price_at_sale,
                 'subtotal': self.subtotal
@@ -0,0 +1,70 @@
+from datetime import datetime
+from app.main import db
+from app.models.store import StoreScoped
+
+
+class StockMovement(db.Model):
+    """
+    Append-only ledger of stock changes. Every change to
+    Batch.stock_quantity writes one row in the same transaction.
+    """
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        db.Index('ix_stock_movements_created_batch', 'created_at', 'batch_id'),
+    )
+    
+    KINDS = ('receipt', 'sale', 'adjustment', 'write_off', 'transfer')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=False, index=True)
+    
+    kind = db.Column(db.String(20), nullable=False)  # One of KINDS
+    quantity = db.Column(db.Integer, nullable=False)  # Signed change, in base units
+    
+    # Sale that caused the movement (no foreign key: old sales move to the archive)
+    sale_id = db.Column(db.Integer)
+    
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Relationships
+    batch = db.relationship('Batch', backref='stock_movements')
+    sale = db.relationship('Sale', primaryjoin='foreign(StockMovement.sale_id) == Sale.id')
+    
+    def __repr__(self):
+        return f'<StockMovement Batch:{self.batch_id} {self.quantity:+d} ({self.kind})>'
+
+
+class StockCheckpoint(StoreScoped, db.Model):
+    """
+    Stock of every batch of a store at a point in time, so historical stock
+    only needs the movements made since the nearest checkpoint.
+    """
+    __tablename__ = 'stock_checkpoints'
+    __table_args__ = (
+        db.Index('ix_stock_checkpoints_store_taken', 'store_id', 'taken_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    taken_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Highest movement id included in the snapshot
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Relationship
+    snapshots = db.relationship('StockSnapshot', backref='checkpoint', lazy=True, cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<StockCheckpoint #{self.id} at {self.taken_at}>'
+
+
+class StockSnapshot(db.Model):
+    """Stock of one batch at a checkpoint (batches with no stock are omitted)."""
+    __tablename__ = 'stock_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    checkpoint_id = db.Column(db.Integer, db.ForeignKey('stock_checkpoints.id'), nullable=False, index=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<StockSnapshot Batch:{self.batch_id} x{self.quantity}>'
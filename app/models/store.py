@@ -0,0 +1,99 @@
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, declared_attr, with_loader_criteria
+from app.main import db
+
+DEFAULT_STORE_ID = 1
+
+
+class Store(db.Model):
+    """A pharmacy. Stock and sales belong to one store (see StoreScoped)."""
+    __tablename__ = 'stores'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), nullable=False, unique=True)
+    name = db.Column(db.String(100), nullable=False)
+    
+    # Highest sale id folded into StoreDailySales (see app.stores)
+    summarized_sale_id = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    @staticmethod
+    def current_id(session=None):
+        """
+        Store this code runs for: the session's info['store_id'] (async POS),
+        else the app's STORE_ID, else None (not scoped, e.g. outside the app).
+        """
+        if session is not None and 'store_id' in session.info:
+            return session.info['store_id']
+        if has_app_context():
+            return current_app.config.get('STORE_ID')
+        return None
+    
+    def __repr__(self):
+        return f'<Store {self.code}>'
+
+
+def _default_store_id():
+    """Column default: the current store (the first store outside the app)."""
+    store_id = Store.current_id()
+    return DEFAULT_STORE_ID if store_id is None else store_id
+
+
+class StoreScoped:
+    """
+    Mixin for rows that belong to one store. Queries only see the current
+    store's rows (scope_to_store); new rows get the current store.
+    """
+    
+    @declared_attr
+    def store_id(cls):
+        # No foreign key into another database (archive bind)
+        references = () if getattr(cls, '__bind_key__', None) else (db.ForeignKey('stores.id'),)
+        return db.Column(db.Integer, *references, nullable=False,
+                         default=_default_store_id, server_default=str(DEFAULT_STORE_ID))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def scope_to_store(state):
+    """
+    Limit ORM SELECTs to the current store's StoreScoped rows. Relationship
+    loads are limited too, including those of objects loaded or created
+    without the criteria. Statements executed with
+    execution_options(all_stores=True) see every store.
+    """
+    if not state.is_select or state.is_column_load or state.execution_options.get('all_stores'):
+        return
+    store_id = Store.current_id(state.session)
+    if store_id is None:
+        return
+    state.statement = state.statement.options(with_loader_criteria(
+        StoreScoped, lambda cls: cls.store_id == store_id, include_aliases=True
+    ))
+
+
+class StoreDailySales(db.Model):
+    """
+    Sales totals of one store on one day, kept up to date incrementally
+    (app.stores.refresh_store_summaries) for the head-office rollup.
+    Cost and profit only count items with a known cost, as in the reports.
+    """
+    __tablename__ = 'store_daily_sales'
+    
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    
+    sales = db.Column(db.Integer, nullable=False, default=0)  # Bills
+    items = db.Column(db.Integer, nullable=False, default=0)  # Item lines
+    quantity = db.Column(db.Integer, nullable=False, default=0)  # Units
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0)
+    profit = db.Column(db.Float, nullable=False, default=0)
+    
+    # Relationship
+    store = db.relationship('Store')
+    
+    def __repr__(self):
+        return f'<StoreDailySales Store:{self.store_id} {self.day}>'
@@ -0,0 +1,37 @@
+from sqlalchemy import exists, literal, select, update
+from app.main import db
+
+
+class DataVersion(db.Model):
+    """
+    Change counter per data scope ('inventory', 'sales', 'forecasts'), bumped
+    in the same transaction as every write to that scope. Used for ETags.
+    """
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def current(cls, session, names):
+        """Versions of the given scopes, in order (0 for scopes never written)."""
+        versions = dict(session.execute(select(cls.name, cls.version).where(cls.name.in_(names))).all())
+        return tuple(versions.get(name, 0) for name in names)
+    
+    @classmethod
+    def bump(cls, session, *names):
+        """Increment the given scopes; the caller commits."""
+        for name in names:
+            bumped = session.execute(
+                update(cls).where(cls.name == name).values(version=cls.version + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not bumped:
+                # First write to this scope
+                session.execute(db.insert(cls).from_select(
+                    ['name', 'version'],
+                    select(literal(name), literal(1)).where(~exists().where(cls.name == name))
+                ))
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
@@ -0,0 +1,22 @@
+from datetime import datetime
+from app.main import db
+
+
+class WriteOff(db.Model):
+    """Stock written off (e.g. expired batch removed from sellable stock)."""
+    __tablename__ = 'write_offs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=False, index=True)
+    
+    quantity = db.Column(db.Integer, nullable=False)  # In base units
+    value = db.Column(db.Float, nullable=False, default=0)  # At cost (MRP if cost unknown)
+    reason = db.Column(db.String(20), nullable=False)  # 'expired'
+    
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Relationship
+    batch = db.relationship('Batch', backref='write_offs')
+    
+    def __repr__(self):
+        return f'<WriteOff Batch:{self.batch_id} x{self.quantity} ({self.reason})>'
@@ -0,0 +1,135 @@
+"""
+Async point-of-sale API, deployable as its own ASGI process.
+
+Serves the endpoints used by the POS page (medicine search, batch lookup,
+substitutes, checkout and offline sync) under the same paths as the main app, so a reverse proxy can send
+counter traffic here while reports and back-office pages stay on the WSGI
+workers. Both processes share the same database.
+    hypercorn 'app.pos:create_pos_app()'
+
+Queries run on an async engine (aiosqlite / asyncpg / aiomysql); the
+business logic is shared with the Flask views through app.checkout.
+Requires Quart and an async database driver.
+"""
+import os
+from quart import Quart, jsonify, request, abort
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app import checkout
+from app.caching import CACHE_CONTROL, matching_etag, version_etag
+from app.models import DataVersion
+from app.models.store import DEFAULT_STORE_ID
+from app.serializers import FastJSONProvider
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(url):
+    """Same database URL with an asyncio driver."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver known for {backend} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_pos_app(config=None):
+    app = Quart(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
+    app.config['STORE_ID'] = int(os.environ.get('STORE_ID', DEFAULT_STORE_ID))
+    
+    # Overrides (used by scripts and benchmarks)
+    if config:
+        app.config.update(config)
+    
+    # Relative SQLite paths resolve against the instance folder, as in Flask-SQLAlchemy
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not os.path.isabs(url.database):
+        os.makedirs(app.instance_path, exist_ok=True)
+        url = url.set(database=os.path.join(app.instance_path, url.database))
+    
+    engine = create_async_engine(async_database_url(url))
+    # No Flask app here: the store travels with each session (see Store.current_id)
+    Session = async_sessionmaker(engine, expire_on_commit=False, info={'store_id': app.config['STORE_ID']})
+    
+    async def inventory_etag(session):
+        """ETag of inventory-backed responses (see caching.conditional)."""
+        versions = await session.run_sync(DataVersion.current, ('inventory',))
+        return version_etag(versions, request.full_path)
+    
+    def cacheable(response, etag):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+    
+    def not_modified(etag):
+        return cacheable(app.response_class('', status=304), etag)
+    
+    @app.route('/api/medicines/search')
+    async def search_medicines():
+        """Search medicines by name for autocomplete (see api.search_medicines)."""
+        query = request.args.get('q', '').strip()
+        limit = min(request.args.get('limit', 10, type=int), 50)  # Cap at 50
+        
+        async with Session() as session:
+            etag = await inventory_etag(session)
+            cached = matching_etag(request.if_none_match, etag)
+            if cached:
+                return not_modified(cached)
+            result = await session.run_sync(checkout.search_medicines, query, limit) if len(query) >= 2 else []
+        return cacheable(jsonify(result), etag)
+    
+    @app.route('/api/batches/<int:medicine_id>')
+    async def get_batches(medicine_id):
+        """Available batches for a medicine (see api.get_batches)."""
+        async with Session() as session:
+            etag = await inventory_etag(session)
+            cached = matching_etag(request.if_none_match, etag)
+            if cached:
+                return not_modified(cached)
+            result = await session.run_sync(checkout.medicine_batches, medicine_id)
+        if result is None:
+            abort(404)
+        return cacheable(jsonify(result), etag)
+    
+    @app.route('/api/substitutes/<int:medicine_id>')
+    async def get_substitutes(medicine_id):
+        """In-stock medicines with the same composition (see api.get_substitutes)."""
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        async with Session() as session:
+            etag = await inventory_etag(session)
+            cached = matching_etag(request.if_none_match, etag)
+            if cached:
+                return not_modified(cached)
+            result = await session.run_sync(checkout.find_substitutes, medicine_id, limit)
+        if result is None:
+            abort(404)
+        return cacheable(jsonify(result), etag)
+    
+    @app.route('/sales/create', methods=['POST'])
+    async def create_sale():
+        """Create a new sale from cart items (optionally with an Idempotency-Key header)."""
+        data = await request.get_json()
+        async with Session() as session:
+            body, status = await session.run_sync(checkout.checkout, data, request.headers.get('Idempotency-Key'))
+        return jsonify(body), status
+    
+    @app.route('/sales/sync', methods=['POST'])
+    async def sync_offline_sales():
+        """Apply sales queued by a terminal while offline (see sales.sync_offline_sales)."""
+        data = await request.get_json(silent=True) or {}
+        async with Session() as session:
+            body, status = await session.run_sync(checkout.sync_sales, data.get('sales') if isinstance(data, dict) else None)
+        return jsonify(body), status
+    
+    @app.after_serving
+    async def dispose_engine():
+        await engine.dispose()
+    
+    return app
@@ -0,0 +1,159 @@
+"""
+Reorder suggestions from sales velocity.
+
+Daily units sold per medicine over the longest window are kept in memory
+and topped up incrementally by sale item id, so a refresh only reads sales
+made since the last one. Velocity is a weighted blend of the 7/30/90-day
+daily averages; a medicine is due for reorder when its stock would not
+last the supplier lead time (plus min_stock_level as safety stock), and the
+suggestion tops it up to cover the review period, rounded up to whole packs.
+"""
+import math
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from app.main import db
+from app.models import Batch, Medicine, Sale, SaleItem, Store
+from app.stores import store_filter
+
+# (window in days, weight) for the velocity blend
+WINDOWS = ((7, 0.5), (30, 0.3), (90, 0.2))
+
+_engines = {}
+
+
+def _as_date(value):
+    """func.date() result (date or 'YYYY-MM-DD' on SQLite) as a date."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _weighted(units, age):
+    """Contribution to velocity of units sold `age` days ago."""
+    return sum(weight * units / window for window, weight in WINDOWS if 0 <= age < window)
+
+
+class ReorderEngine:
+    """Per-process cache of recent daily sales per medicine."""
+    
+    def __init__(self):
+        self.daily = defaultdict(lambda: defaultdict(int))  # day -> medicine_id -> units
+        self.first_day = None
+        self.last_item_id = 0
+        self._velocity = (None, None)  # (day computed for, velocities)
+        self._lock = threading.Lock()
+    
+    def refresh(self, today):
+        """Fold in sale items added since the last refresh; drop days out of range."""
+        start = today - timedelta(days=max(w for w, _ in WINDOWS) - 1)
+        with self._lock:
+            if self.first_day is None or start < self.first_day:
+                # Cold start (or the clock went back): load the whole window
+                self.daily.clear()
+                self.last_item_id = 0
+                self._velocity = (None, None)
+            self.first_day = start
+            for day in [d for d in self.daily if d < start]:
+                del self.daily[day]
+            
+            last_item_id = db.session.execute(select(func.max(SaleItem.id))).scalar() or 0
+            if last_item_id <= self.last_item_id:
+                return 0
+            
+            day = func.date(Sale.sale_date)
+            rows = db.session.execute(
+                select(Batch.medicine_id, day, func.sum(SaleItem.quantity))
+                .select_from(SaleItem)
+                .join(Sale, SaleItem.sale_id == Sale.id)
+                .join(Batch, SaleItem.batch_id == Batch.id)
+                .where(
+                    SaleItem.id > self.last_item_id,
+                    SaleItem.id <= last_item_id,
+                    Sale.sale_date >= datetime.combine(start, datetime.min.time())
+                )
+                .group_by(Batch.medicine_id, day)
+            ).all()
+            velocity_day, velocity = self._velocity
+            for medicine_id, sale_day, units in rows:
+                sale_day = _as_date(sale_day)
+                self.daily[sale_day][medicine_id] += units
+                if velocity_day == today:
+                    velocity[medicine_id] += _weighted(units, (today - sale_day).days)
+            self.last_item_id = last_item_id
+            return len(rows)
+    
+    def velocities(self, today):
+        """
+        Blended units sold per day, per medicine (rebuilt once a day, then kept
+        up by refresh). Returns a copy, since refresh updates the cached one.
+        """
+        with self._lock:
+            if self._velocity[0] != today:
+                velocity = defaultdict(float)
+                for day, units_by_medicine in self.daily.items():
+                    for medicine_id, units in units_by_medicine.items():
+                        velocity[medicine_id] += _weighted(units, (today - day).days)
+                self._velocity = (today, velocity)
+            return dict(self._velocity[1])
+    
+    def suggestions(self, today=None, lead_days=None, review_days=None):
+        """
+        One row per active medicine with velocity, stock, days of cover and
+        suggested order quantity (units, whole packs), most urgent first.
+        """
+        today = today or datetime.now().date()
+        lead_days = current_app.config['REORDER_LEAD_DAYS'] if lead_days is None else lead_days
+        review_days = current_app.config['REORDER_REVIEW_DAYS'] if review_days is None else review_days
+        
+        self.refresh(today)
+        velocity = self.velocities(today)
+        
+        # Sellable stock per medicine in one grouped query (Core rows, no ORM overhead)
+        connection = db.session.connection()
+        stock = dict(connection.execute(
+            select(Batch.medicine_id, func.sum(Batch.stock_quantity)).where(
+                Batch.is_active == True,
+                Batch.stock_quantity > 0,
+                Batch.expiry_date >= today,
+                store_filter(Batch)
+            ).group_by(Batch.medicine_id)
+        ).all())
+        medicines = connection.execute(
+            select(Medicine.id, Medicine.name, Medicine.packing_type, Medicine.units_per_pack, Medicine.min_stock_level)
+            .where(Medicine.is_active == True)
+        ).all()
+        
+        rows = []
+        for medicine_id, name, packing_type, units_per_pack, min_stock_level in medicines:
+            per_day = velocity.get(medicine_id, 0.0)
+            on_hand = stock.get(medicine_id, 0)
+            safety = min_stock_level or 0
+            reorder_point = per_day * lead_days + safety
+            suggested = 0
+            if on_hand <= reorder_point and (per_day > 0 or on_hand <= safety):
+                pack = units_per_pack if units_per_pack and units_per_pack > 0 else 1
+                shortfall = per_day * (lead_days + review_days) + safety - on_hand
+                suggested = max(0, math.ceil(shortfall / pack)) * pack
+            rows.append({
+                'medicine_id': medicine_id,
+                'name': name,
+                'packing_type': packing_type,
+                'units_per_pack': units_per_pack,
+                'velocity': per_day,
+                'stock': on_hand,
+                'days_of_cover': on_hand / per_day if per_day > 0 else None,
+                'reorder_point': reorder_point,
+                'suggested': suggested,
+            })
+        
+        rows.sort(key=lambda r: (r['days_of_cover'] is None, r['days_of_cover'] or 0, r['name']))
+        return rows
+
+
+def get_reorder_engine():
+    """Engine for the current database and store (one per process)."""
+    key = (str(db.engine.url), Store.current_id())
+    if key not in _engines:
+        _engines[key] = ReorderEngine()
+    return _engines[key]
@@ -0,0 +1,154 @@
+"""
+Read replica routing (the 'replica' bind, REPLICA_DATABASE_URL).
+
+Requests marked read-only (the reports blueprint, the dashboard and the
+read-only API) run their queries on the replica, so back-office reads never
+hold locks on the primary that checkout needs. Everything else, and every
+flush, stays on the primary. A request only goes to the replica while it is
+at most REPLICA_MAX_LAG seconds behind; otherwise it reads the primary.
+
+A PostgreSQL streaming replica reports its own lag. A SQLite replica is a
+consistent copy (VACUUM INTO) of the primary, which runs in WAL mode so
+sales keep committing while the copy is read, and records when it was taken:
+    flask replica sync [--every SECONDS]
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+
+REPLICA_BIND = 'replica'
+LAG_CHECK_SECONDS = 1.0  # How long a lag reading is reused within a process
+
+_lag = {}  # replica URL -> (checked at, lag in seconds or None)
+_lag_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    """Session that reads the primary database from the replica during read-only requests."""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and not self._flushing and has_app_context() and g.get('read_replica'):
+            # Other binds (the archive) are not replicated
+            if engine is self._db.engine:
+                return self._db.engines[REPLICA_BIND]
+        return engine
+
+
+def enable_wal(engine):
+    """
+    Put a file-based SQLite database in WAL mode on connect, so readers (long
+    reports, the replica copy) never block a sale's commit, nor it them.
+    """
+    if engine.url.get_backend_name() != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+
+def replica_enabled():
+    """True when a replica database is configured."""
+    return REPLICA_BIND in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def replica_bind(url):
+    """SQLALCHEMY_BINDS entry for the replica."""
+    if url.startswith('sqlite'):
+        # A new connection per checkout, so a freshly synced copy is seen at once
+        return {'url': url, 'poolclass': NullPool}
+    return url
+
+
+def replica_lag():
+    """Seconds the replica is behind the primary, or None if unknown (never synced, unreachable)."""
+    from app.main import db
+    engine = db.engines[REPLICA_BIND]
+    try:
+        with engine.connect() as conn:
+            backend = engine.url.get_backend_name()
+            if backend == 'sqlite':
+                synced_at = conn.execute(text('SELECT synced_at FROM replica_sync')).scalar()
+                return None if synced_at is None else max(0.0, time.time() - synced_at)
+            if backend == 'postgresql':
+                return float(conn.execute(text(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )).scalar())
+            return 0.0
+    except SQLAlchemyError:
+        return None
+
+
+def replica_fresh():
+    """True when reads may go to the replica (configured and within REPLICA_MAX_LAG)."""
+    if not replica_enabled():
+        return False
+    key = current_app.config['SQLALCHEMY_BINDS'][REPLICA_BIND]
+    key = key['url'] if isinstance(key, dict) else key
+    now = time.monotonic()
+    with _lag_lock:
+        checked_at, lag = _lag.get(key, (None, None))
+    if checked_at is None or now - checked_at > LAG_CHECK_SECONDS:
+        lag = replica_lag()
+        with _lag_lock:
+            _lag[key] = (now, lag)
+    return lag is not None and lag <= current_app.config['REPLICA_MAX_LAG']
+
+
+def route_to_replica():
+    """before_request hook: serve this request from the replica when it is fresh enough."""
+    g.read_replica = replica_fresh()
+
+
+def read_replica(view):
+    """Decorator for read-only views that may be served from the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        route_to_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def sync_sqlite_replica():
+    """
+    Copy the primary SQLite database over the replica with VACUUM INTO, one
+    read transaction, so the copy is consistent; with the primary in WAL mode
+    sales commit while it runs. The copy is written next to the replica and
+    swapped in, so readers never see a partial file. Returns the seconds taken.
+    """
+    from app.main import db
+    primary, replica = db.engine.url, db.engines[REPLICA_BIND].url
+    if primary.get_backend_name() != 'sqlite' or replica.get_backend_name() != 'sqlite':
+        raise ValueError('Only SQLite replicas are synced here; use database replication otherwise')
+    
+    started = time.perf_counter()
+    taken_at = time.time()  # Lag is counted from the start of the copy
+    path = replica.database.removeprefix('file:')
+    temporary = path + '.sync'
+    if os.path.exists(temporary):
+        os.remove(temporary)  # Left by an interrupted sync; VACUUM INTO needs a new file
+    source = sqlite3.connect(primary.database)
+    try:
+        source.execute('VACUUM INTO ?', (temporary,))
+    finally:
+        source.close()
+    # The copy is in rollback journal mode, so it opens read-only without WAL files
+    target = sqlite3.connect(temporary)
+    try:
+        target.execute('CREATE TABLE replica_sync (synced_at REAL NOT NULL)')
+        target.execute('INSERT INTO replica_sync VALUES (?)', (taken_at,))
+        target.commit()
+    finally:
+        target.close()
+    os.replace(temporary, path)
+    # Pooled connections would keep reading the replaced file
+    db.engines[REPLICA_BIND].dispose()
+    return time.perf_counter() - started
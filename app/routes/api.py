@@ -1,11 +1,18 @@
 """API routes for AJAX/JSON endpoints."""
-from flask import Blueprint, jsonify, request
-from app.models import Medicine, Batch
+from flask import Blueprint, jsonify, request, abort
+from app.models import db, DemandForecast
+from app import checkout
+from app.caching import conditional
+from app.replica import read_replica
+from app.stores import TransferError, stock_by_store, transfer_stock
+from app.changes import MAX_LIMIT, MAX_WAIT, read_changes
 
 api = Blueprint('api', __name__)
 
 
 @api.route('/medicines/search')
+@read_replica
+@conditional('inventory')
 def search_medicines():
     """
     Search medicines by name for autocomplete.
@@ -20,76 +27,109 @@ def search_medicines():
     if len(query) < 2:
         return jsonify([])
     
-    # Escape LIKE special characters to prevent unexpected matching
-    escaped_query = query.replace('%', r'\%').replace('_', r'\_')
-    
-    # Search medicines by name (case-insensitive)
-    medicines = Medicine.query.filter(
-        Medicine.is_active == True,
-        Medicine.name.ilike(f'%{escaped_query}%', escape='\\')
-    ).order_by(Medicine.name).limit(limit).all()
-    
-    results = []
-    for med in medicines:
-        # Get available batches (in stock, not expired, sorted by expiry)
-        available_batches = [b for b in med.batches 
-                           if b.is_active and b.stock_quantity > 0 and not b.is_expired]
-        available_batches.sort(key=lambda x: x.expiry_date)
-        
-        results.append({
-            'id': med.id,
-            'name': med.name,
-            'generic_name': med.generic_name or '',
-            'category': med.category.name if med.category else 'Uncategorized',
-            'packing_type': med.packing_type,
-            'units_per_pack': med.units_per_pack,
-            'total_stock': med.total_stock,
-            'batches': [{
-                'id': b.id,
-                'batch_number': b.batch_number,
-                'expiry_date': b.expiry_date.strftime('%Y-%m-%d'),
-                'days_until_expiry': b.days_until_expiry,
-                'stock_quantity': b.stock_quantity,
-                'mrp': b.mrp,
-                'unit_price': round(b.unit_price, 2)
-            } for b in available_batches]
-        })
-    
-    return jsonify(results)
+    return jsonify(checkout.search_medicines(db.session, query, limit))
 
 
 @api.route('/batches/<int:medicine_id>')
+@read_replica
+@conditional('inventory')
 def get_batches(medicine_id):
     """
     Get all available batches for a medicine.
     Used when user selects a medicine in sales form.
     """
-    medicine = Medicine.query.get_or_404(medicine_id)
-    
-    # Get available batches (in stock, not expired)
-    batches = Batch.query.filter(
-        Batch.medicine_id == medicine_id,
-        Batch.is_active == True,
-        Batch.stock_quantity > 0
-    ).order_by(Batch.expiry_date).all()
-    
-    # Filter out expired in Python (for accurate date comparison)
-    available_batches = [b for b in batches if not b.is_expired]
+    result = checkout.medicine_batches(db.session, medicine_id)
+    if result is None:
+        abort(404)
+    return jsonify(result)
+
+
+@api.route('/substitutes/<int:medicine_id>')
+@read_replica
+@conditional('inventory')
+def get_substitutes(medicine_id):
+    """
+    In-stock medicines with the same generic composition, best first.
+    Used when the selected medicine is out of stock in the sales form.
+    Query params:
+        limit: max results (default 10, max 50)
+    """
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    result = checkout.find_substitutes(db.session, medicine_id, limit)
+    if result is None:
+        abort(404)
+    return jsonify(result)
+
+
+@api.route('/stores/stock/<int:medicine_id>')
+@read_replica
+@conditional('inventory')
+def get_store_stock(medicine_id):
+    """
+    Sellable stock of a medicine at every store, with FEFO batches.
+    Used to find another branch when the medicine is out of stock here.
+    """
+    result = stock_by_store(db.session, medicine_id)
+    if result is None:
+        abort(404)
+    return jsonify(result)
+
+
+@api.route('/stores/transfer', methods=['POST'])
+def transfer():
+    """
+    Move units of one of this store's batches to another store.
+    JSON body: batch_id, to_store_id, quantity (base units).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Invalid request body'}), 400
+    try:
+        result = transfer_stock(db.session, data.get('batch_id'), data.get('to_store_id'), data.get('quantity'))
+    except TransferError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(result)
+
+
+@api.route('/changes')
+def get_changes():
+    """
+    Change feed for incremental sync, oldest first.
+    Query params:
+        since: id of the last event received (default 0: from the start)
+        limit: max events (default 500, max 1000)
+        wait: seconds to wait for new events when there are none (long-poll, max 30)
+        stores: 'all' for the events of every store (head office); default
+            this store's events and the shared catalogue
+    Returns events, the cursor for the next call (next) and whether more are waiting (more).
+    Always reads the primary, so a cursor never runs ahead of the replica.
+    """
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), MAX_LIMIT)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_WAIT)
+    all_stores = request.args.get('stores') == 'all'
+    return jsonify(read_changes(db.session, since, limit, wait, all_stores))
+
+
+@api.route('/forecasts/<int:medicine_id>')
+@read_replica
+@conditional('forecasts')
+def get_forecast(medicine_id):
+    """
+    Daily demand forecast for a medicine.
+    Query params:
+        days: days ahead (default 28, max 90)
+    """
+    forecast = DemandForecast.query.filter_by(medicine_id=medicine_id).first()
+    if forecast is None:
+        abort(404)
+    days = max(1, min(request.args.get('days', 28, type=int), 90))
     
     return jsonify({
-        'medicine': {
-            'id': medicine.id,
-            'name': medicine.name,
-            'units_per_pack': medicine.units_per_pack,
-            'packing_type': medicine.packing_type
-        },
-        'batches': [{
-            'id': b.id,
-            'batch_number': b.batch_number,
-            'expiry_date': b.expiry_date.strftime('%Y-%m-%d'),
-            'days_until_expiry': b.days_until_expiry,
-            'stock_quantity': b.stock_quantity,
-            'mrp': b.mrp,
-            'unit_price': round(b.unit_price, 2)
-        } for b in available_batches]
+        'medicine_id': medicine_id,
+        'fitted_on': forecast.fitted_on.strftime('%Y-%m-%d'),
+        'mae': round(forecast.mae, 2),
+        'next_7_days': round(forecast.next_7_days, 2),
+        'next_28_days': round(forecast.next_28_days, 2),
+        'daily': [{'date': d.strftime('%Y-%m-%d'), 'quantity': round(q, 2)} for d, q in forecast.daily(days)]
     })
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app.main import db
-from app.models import Category
+from app.models import Category, DataVersion
+from app.changes import record_change
 
 categories = Blueprint('categories', __name__, url_prefix='/categories')
 
@@ -8,8 +9,8 @@ categories = Blueprint('categories', __name__, url_prefix='/categories')
 @categories.route('/')
 def list_categories():
     """List all categories."""
-    all_categories = Category.query.order_by(Category.name).all()
-    return render_template('categories/list.html', categories=all_categories)
+    rows = Category.list_with_counts()
+    return render_template('categories/list.html', rows=rows)
 
 
 @categories.route('/add', methods=['GET', 'POST'])
@@ -35,6 +36,8 @@ def add_category():
         )
         
         db.session.add(category)
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'created', category)
         db.session.commit()
         
         flash(f'Category "{name}" added successfully!', 'success')
@@ -68,6 +71,8 @@ def edit_category(category_id):
         category.name = name
         category.description = description or None
         
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'updated', category)
         db.session.commit()
         
         flash(f'Category "{name}" updated successfully!', 'success')
@@ -82,11 +87,13 @@ def delete_category(category_id):
     category = Category.query.get_or_404(category_id)
     
     # Check if category has medicines
-    if category.medicines:
-        flash(f'Cannot delete "{category.name}" - it has {len(category.medicines)} medicine(s) assigned.', 'danger')
+    if category.has_medicines:
+        flash(f'Cannot delete "{category.name}" - it has {category.medicine_count} medicine(s) assigned.', 'danger')
         return redirect(url_for('categories.list_categories'))
     
     db.session.delete(category)
+    DataVersion.bump(db.session, 'inventory')
+    record_change(db.session, 'deleted', category)
     db.session.commit()
     
     flash(f'Category "{category.name}" has been deleted.', 'success')
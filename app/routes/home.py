@@ -1,48 +1,60 @@
 from datetime import datetime
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, current_app, render_template, stream_with_context
 from app.main import db
 from app.models import Category, Medicine, Batch, Sale, SaleItem
+from app.replica import read_replica
+from app.live import RETRY_MS, close_stream, dashboard_stream, open_stream, stock_levels, today_sales
 
 home = Blueprint('home', __name__)
 
 
 @home.route('/')
+@read_replica
 def dashboard():
     """Dashboard with summary stats and alerts."""
     today = datetime.now().date()
     
+    # Low stock medicines (one grouped query)
+    low_stock_medicines = stock_levels(db.session, low_only=True)
+    
     # Calculate stats
     stats = {
         'total_medicines': Medicine.query.filter_by(is_active=True).count(),
-        'today_sales': db.session.query(db.func.sum(Sale.total_amount)).filter(
-            db.func.date(Sale.sale_date) == today
-        ).scalar() or 0,
-        'low_stock_count': sum(1 for m in Medicine.query.filter_by(is_active=True).all() if m.is_low_stock),
-        'expiring_soon_count': Batch.query.filter(
-            Batch.is_active == True,
-            Batch.expiry_date > today,
-            Batch.expiry_date <= db.func.date(today, '+30 days')
-        ).count(),
+        'today_sales': today_sales(db.session, today),
+        'low_stock_count': len(low_stock_medicines),
+        'expiring_soon_count': Batch.expiry_summary(today, (30,))[1]['count'],
     }
     
     # Recent sales (last 5)
     recent_sales = Sale.query.order_by(Sale.sale_date.desc()).limit(5).all()
     
-    # Low stock medicines
-    all_medicines = Medicine.query.filter_by(is_active=True).all()
-    low_stock_medicines = [m for m in all_medicines if m.is_low_stock][:5]
-    
-    # Expiring soon batches (within 30 days)
-    expiring_batches = Batch.query.filter(
-        Batch.is_active == True,
-        Batch.expiry_date > today,
-        Batch.expiry_date <= db.func.date(today, '+30 days')
-    ).order_by(Batch.expiry_date).limit(5).all()
+    # Expiring soon batches (within 30 days, medicine eager-loaded)
+    expiring_batches = Batch.at_risk_query(today, 30).filter(
+        Batch.expiry_date >= today
+    ).limit(5).all()
     
     return render_template('home.html',
         stats=stats,
         recent_sales=recent_sales,
-        low_stock_medicines=low_stock_medicines,
+        low_stock_medicines=low_stock_medicines[:5],
         expiring_batches=expiring_batches,
         now=datetime.now()
     )
+
+
+@home.route('/live')
+def live_updates():
+    """
+    Server-sent events with dashboard updates (see app.live), or 503 when
+    LIVE_MAX_STREAMS streams already hold this process's threads.
+    """
+    if not open_stream(current_app.config['LIVE_MAX_STREAMS']):
+        return Response('Too many live dashboards open', status=503, mimetype='text/plain',
+                        headers={'Retry-After': str(RETRY_MS // 1000)})
+    response = Response(
+        stream_with_context(dashboard_stream(db.session)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(close_stream)
+    return response
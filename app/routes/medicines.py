@@ -1,11 +1,55 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from app.main import db
-from app.models import Category, Medicine, Batch
+from app.models import Category, Medicine, Batch, StockMovement, DataVersion
+from app.changes import record_change
+from app.caching import conditional
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
 
 medicines = Blueprint('medicines', __name__)
 
 
+def deactivate_batch(batch):
+    """
+    Deactivate a batch and write off its remaining stock in the movement
+    ledger, so point-in-time stock stops counting it too. The write-off is
+    read from the row in the same transaction, so a sale committed since the
+    batch was loaded is not written off twice.
+    """
+    db.session.execute(insert(StockMovement).from_select(
+        ['batch_id', 'kind', 'quantity', 'created_at'],
+        select(Batch.id, literal('write_off'), -Batch.stock_quantity, literal(datetime.now()))
+        .where(Batch.id == batch.id, Batch.stock_quantity > 0)
+    ))
+    db.session.execute(
+        update(Batch).where(Batch.id == batch.id).values(stock_quantity=0, is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire(batch, ['stock_quantity', 'is_active'])
+
+
+def adjust_stock(batch, original, quantity):
+    """
+    Correct a batch's stock from `original` (as shown in the form) to
+    `quantity`, recording the difference in the movement ledger. Only
+    applied if the stock is still `original`; returns False if it changed
+    since (a sale in between), leaving it alone.
+    """
+    delta = quantity - original
+    if delta == 0:
+        return True
+    changed = db.session.execute(
+        update(Batch).where(Batch.id == batch.id, Batch.stock_quantity == original)
+        .values(stock_quantity=Batch.stock_quantity + delta)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.expire(batch, ['stock_quantity'])
+    if changed:
+        db.session.add(StockMovement(batch_id=batch.id, kind='adjustment', quantity=delta))
+    return bool(changed)
+
+
 @medicines.route('/')
 def list_medicines():
     """List all medicines with filters."""
@@ -14,35 +58,40 @@ def list_medicines():
     search = request.args.get('search', '').strip()
     stock_filter = request.args.get('stock', '')  # 'low', 'out', 'ok'
     
-    # Base query
-    query = Medicine.query.filter_by(is_active=True)
-    
-    # Apply category filter
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    
-    # Apply search filter
-    if search:
-        # Escape LIKE special characters
-        escaped_search = search.replace('%', r'\%').replace('_', r'\_')
-        query = query.filter(Medicine.name.ilike(f'%{escaped_search}%', escape='\\'))
-    
-    # Get all medicines (we'll filter stock in Python due to computed property)
-    medicines_list = query.order_by(Medicine.name).all()
-    
-    # Apply stock filter (computed property, can't filter in SQL)
-    if stock_filter == 'low':
-        medicines_list = [m for m in medicines_list if m.is_low_stock and not m.is_out_of_stock]
-    elif stock_filter == 'out':
-        medicines_list = [m for m in medicines_list if m.is_out_of_stock]
-    elif stock_filter == 'ok':
-        medicines_list = [m for m in medicines_list if not m.is_low_stock]
+    def load_medicines():
+        """Filtered medicines (only run when the cached table is stale)."""
+        # Base query; batches and category are read for every row
+        query = Medicine.query.filter_by(is_active=True).options(
+            selectinload(Medicine.batches), joinedload(Medicine.category)
+        )
+        
+        # Apply category filter
+        if category_id:
+            query = query.filter_by(category_id=category_id)
+        
+        # Apply search filter
+        if search:
+            # Escape LIKE special characters
+            escaped_search = search.replace('%', r'\%').replace('_', r'\_')
+            query = query.filter(Medicine.name.ilike(f'%{escaped_search}%', escape='\\'))
+        
+        # Get all medicines (we'll filter stock in Python due to computed property)
+        medicines_list = query.order_by(Medicine.name).all()
+        
+        # Apply stock filter (computed property, can't filter in SQL)
+        if stock_filter == 'low':
+            medicines_list = [m for m in medicines_list if m.is_low_stock and not m.is_out_of_stock]
+        elif stock_filter == 'out':
+            medicines_list = [m for m in medicines_list if m.is_out_of_stock]
+        elif stock_filter == 'ok':
+            medicines_list = [m for m in medicines_list if not m.is_low_stock]
+        return medicines_list
     
-    # Get categories for filter dropdown
-    categories = Category.query.order_by(Category.name).all()
+    # Categories for the filter dropdown (query runs only if the cached options are stale)
+    categories = Category.query.order_by(Category.name)
     
     return render_template('medicines/list.html',
-        medicines=medicines_list,
+        load_medicines=load_medicines,
         categories=categories,
         selected_category=category_id,
         search=search,
@@ -51,6 +100,7 @@ def list_medicines():
 
 
 @medicines.route('/<int:medicine_id>')
+@conditional('inventory')
 def view_medicine(medicine_id):
     """View medicine details with batches."""
     medicine = Medicine.query.get_or_404(medicine_id)
@@ -110,6 +160,8 @@ def add_medicine():
         )
         
         db.session.add(medicine)
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'created', medicine)
         db.session.commit()
         
         flash(f'Medicine "{name}" added successfully!', 'success')
@@ -173,6 +225,10 @@ def add_batch(medicine_id):
         )
         
         db.session.add(batch)
+        if stock_quantity:
+            db.session.add(StockMovement(batch=batch, kind='receipt', quantity=stock_quantity))
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'created', batch)
         db.session.commit()
         
         flash(f'Batch "{batch_number}" added with {stock_quantity} units!', 'success')
@@ -225,6 +281,8 @@ def edit_medicine(medicine_id):
         medicine.min_stock_level = min_stock_level
         medicine.description = description or None
         
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'updated', medicine)
         db.session.commit()
         
         flash(f'Medicine "{name}" updated successfully!', 'success')
@@ -235,10 +293,20 @@ def edit_medicine(medicine_id):
 
 @medicines.route('/<int:medicine_id>/delete', methods=['POST'])
 def delete_medicine(medicine_id):
-    """Soft delete a medicine (deactivate)."""
+    """Soft delete a medicine (deactivate) and its batches."""
     medicine = Medicine.query.get_or_404(medicine_id)
     
+    # The catalogue is shared, so the medicine's stock is gone at every store
+    batches = db.session.execute(
+        select(Batch).where(Batch.medicine_id == medicine.id, Batch.is_active == True)
+        .execution_options(all_stores=True)
+    ).scalars().all()
+    for batch in batches:
+        deactivate_batch(batch)
     medicine.is_active = False
+    DataVersion.bump(db.session, 'inventory')
+    record_change(db.session, 'updated', *batches)
+    record_change(db.session, 'deleted', medicine)
     db.session.commit()
     
     flash(f'Medicine "{medicine.name}" has been deleted.', 'success')
@@ -257,6 +325,10 @@ def edit_batch(batch_id):
         mrp = request.form.get('mrp', type=float)
         purchase_price = request.form.get('purchase_price', type=float)
         stock_quantity = request.form.get('stock_quantity', type=int)
+        # Stock when the form was shown, so the correction is applied as a difference
+        original_stock = request.form.get('original_stock_quantity', type=int)
+        if original_stock is None:
+            original_stock = batch.stock_quantity
         
         # Validation
         errors = []
@@ -296,8 +368,16 @@ def edit_batch(batch_id):
         batch.expiry_date = expiry_date
         batch.mrp = mrp
         batch.purchase_price = purchase_price or None
-        batch.stock_quantity = stock_quantity
         
+        # Record stock corrections in the movement ledger
+        if not adjust_stock(batch, original_stock, stock_quantity):
+            db.session.rollback()
+            flash(f'Stock of batch "{batch.batch_number}" changed to {batch.stock_quantity} units while '
+                  f'you were editing. Check the quantity and save again.', 'warning')
+            return render_template('medicines/edit_batch.html', batch=batch, medicine=medicine)
+        
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'updated', batch)
         db.session.commit()
         
         flash(f'Batch "{batch_number}" updated successfully!', 'success')
@@ -312,7 +392,9 @@ def delete_batch(batch_id):
     batch = Batch.query.get_or_404(batch_id)
     medicine_id = batch.medicine_id
     
-    batch.is_active = False
+    deactivate_batch(batch)
+    DataVersion.bump(db.session, 'inventory')
+    record_change(db.session, 'deleted', batch)
     db.session.commit()
     
     flash(f'Batch "{batch.batch_number}" has been deleted.', 'success')
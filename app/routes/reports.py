@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, request
-from app.models import db, Medicine, Batch, Sale, SaleItem, Category
+from flask import Blueprint, render_template, request, current_app
+from app.models import db, Medicine, Batch, Sale, SaleItem, Category, ArchivedSale, ArchivedSaleItem, DemandForecast, Store
+from app.archive import archive_reaches
+from app.stock import stock_valuation
+from app.reorder import get_reorder_engine
+from app.caching import conditional
+from app.replica import route_to_replica
+from app.stores import refresh_store_summaries, store_filter, store_rollup
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func, case, select, create_engine
+from sqlalchemy.orm import contains_eager, joinedload
 from calendar import monthrange
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 reports = Blueprint('reports', __name__, url_prefix='/reports')
+reports.before_request(route_to_replica)  # Read-only pages: served from the replica when fresh
 
 
 # ============ HELPER FUNCTIONS ============
@@ -72,19 +81,247 @@ def calculate_item_profit(sale_item):
     return revenue, cost, profit
 
 
-def calculate_sale_profit(sale):
-    """Calculate total profit for a sale."""
-    total_revenue = 0
-    total_cost = 0
-    total_profit = 0
+# ============ AGGREGATION CORE ============
+#
+# Business reports aggregate sale items in SQL, grouped by day, medicine or
+# category. Long ranges can be split into date chunks that are aggregated by
+# worker processes (each with its own read-only connection) and merged back
+# in chunk order, so results do not depend on which worker finished first.
+
+AGGREGATE_FIELDS = ('revenue', 'cost', 'profit', 'quantity', 'transactions', 'sales')
+
+_pool = None
+_pool_key = None
+_worker_engine = None
+
+
+def partition_date_range(start_date, end_date, chunk_days):
+    """Split an inclusive date range into consecutive (start, end) chunks."""
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def _group_columns(group_by):
+    """Key and label columns for a grouping."""
+    if group_by == 'day':
+        return [func.date(Sale.sale_date).label('key')]
+    if group_by == 'medicine':
+        return [Medicine.id.label('key'), Medicine.name.label('name')]
+    if group_by == 'category':
+        return [
+            func.coalesce(Category.id, 0).label('key'),
+            func.coalesce(Category.name, 'Uncategorized').label('name'),
+        ]
+    raise ValueError(f'Unknown grouping: {group_by}')
+
+
+def _measure_columns(item, unit_cost):
+    """Aggregate columns shared by the live and archive queries."""
+    line_total = item.quantity * item.price_at_sale
+    line_cost = unit_cost * item.quantity
+    return [
+        func.sum(line_total).label('revenue'),
+        func.sum(func.coalesce(line_cost, 0)).label('cost'),
+        func.sum(case((unit_cost.is_not(None), line_total - line_cost), else_=0)).label('profit'),
+        func.sum(item.quantity).label('quantity'),
+        func.count(item.id).label('transactions'),
+        func.count(func.distinct(item.sale_id)).label('sales'),
+    ]
+
+
+def _date_bounds(start_date, end_date):
+    """Half-open datetime bounds for an inclusive date range.
+    Raw timestamps (not DATE()) are compared so the sale_date index is used."""
+    return (
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    )
+
+
+def build_aggregate_query(group_by, start_date, end_date, store_id=None):
+    """
+    Build the grouped sale item query for an inclusive date range.
+    Mirrors calculate_item_profit: items without a known cost count towards
+    revenue but contribute no cost or profit. Day grouping includes unlisted
+    items; medicine and category grouping only listed ones.
+    Only the store's sales are included (workers have no app to ask).
+    """
+    unit_cost = case(
+        ((Batch.purchase_price != 0) & (Medicine.units_per_pack > 0),
+         Batch.purchase_price / Medicine.units_per_pack),
+        else_=None
+    )
+    key_columns = _group_columns(group_by)
     
-    for item in sale.items:
-        revenue, cost, profit = calculate_item_profit(item)
-        total_revenue += revenue
-        total_cost += cost
-        total_profit += profit
+    query = select(*key_columns, *_measure_columns(SaleItem, unit_cost)) \
+        .select_from(SaleItem).join(Sale, SaleItem.sale_id == Sale.id)
     
-    return total_revenue, total_cost, total_profit
+    if group_by == 'day':
+        query = query.outerjoin(Batch, SaleItem.batch_id == Batch.id) \
+                     .outerjoin(Medicine, Batch.medicine_id == Medicine.id)
+    else:
+        query = query.join(Batch, SaleItem.batch_id == Batch.id) \
+                     .join(Medicine, Batch.medicine_id == Medicine.id) \
+                     .outerjoin(Category, Medicine.category_id == Category.id)
+    
+    range_start, range_end = _date_bounds(start_date, end_date)
+    return query.where(
+        store_filter(Sale, store_id),
+        Sale.sale_date >= range_start,
+        Sale.sale_date < range_end
+    ).group_by(*key_columns)
+
+
+def build_archive_aggregate_query(group_by, start_date, end_date):
+    """Same aggregation over the archive database (denormalized items)."""
+    item = ArchivedSaleItem
+    if group_by == 'day':
+        key_columns = [func.date(ArchivedSale.sale_date).label('key')]
+    elif group_by == 'medicine':
+        key_columns = [item.medicine_id.label('key')]
+        name = func.max(item.medicine_name).label('name')
+    elif group_by == 'category':
+        key_columns = [func.coalesce(item.category_id, 0).label('key')]
+        name = func.coalesce(func.max(item.category_name), 'Uncategorized').label('name')
+    else:
+        raise ValueError(f'Unknown grouping: {group_by}')
+    
+    columns = key_columns if group_by == 'day' else key_columns + [name]
+    query = select(*columns, *_measure_columns(item, item.unit_cost)) \
+        .select_from(item).join(ArchivedSale, item.sale_id == ArchivedSale.id)
+    if group_by != 'day':
+        query = query.where(item.medicine_id.is_not(None))
+    
+    range_start, range_end = _date_bounds(start_date, end_date)
+    return query.where(
+        ArchivedSale.sale_date >= range_start,
+        ArchivedSale.sale_date < range_end
+    ).group_by(*key_columns)
+
+
+def _rows_to_partial(rows):
+    """Convert result rows to plain dicts (picklable, keyed for merging)."""
+    partial = []
+    for row in rows:
+        data = row._asdict()
+        if data.get('key') is not None and not isinstance(data['key'], int):
+            data['key'] = str(data['key'])[:10]  # DATE() as 'YYYY-MM-DD'
+        for field in AGGREGATE_FIELDS:
+            data[field] = data[field] or 0
+        partial.append(data)
+    return partial
+
+
+def merge_partials(partials):
+    """Merge per-chunk aggregates in chunk order. Returns rows sorted by key."""
+    merged = {}
+    for partial in partials:
+        for row in partial:
+            current = merged.get(row['key'])
+            if current is None:
+                merged[row['key']] = dict(row)
+            else:
+                for field in AGGREGATE_FIELDS:
+                    current[field] += row[field]
+    return [merged[key] for key in sorted(merged)]
+
+
+def _read_only_url(url):
+    """Engine URL for a worker's read-only connection."""
+    if url.get_backend_name() == 'sqlite':
+        if url.database.startswith('file:'):  # Already a URI (e.g. a read-only replica)
+            return f"sqlite:///{url.database}?{'&'.join(f'{k}={v}' for k, v in url.query.items())}"
+        return f'sqlite:///file:{url.database}?mode=ro&uri=true'
+    return url.render_as_string(hide_password=False)
+
+
+def _init_worker(url):
+    """Process pool initializer: open this worker's own engine."""
+    global _worker_engine
+    options = {}
+    if url.startswith('postgresql'):
+        options['execution_options'] = {'postgresql_readonly': True}
+    _worker_engine = create_engine(url, **options)
+
+
+def _aggregate_chunk(args):
+    """Worker task: aggregate one date chunk."""
+    group_by, start_date, end_date, store_id = args
+    with _worker_engine.connect() as conn:
+        rows = conn.execute(build_aggregate_query(group_by, start_date, end_date, store_id)).all()
+    return _rows_to_partial(rows)
+
+
+def _get_pool(url, workers):
+    """Reuse one process pool per (database, worker count)."""
+    global _pool, _pool_key
+    if _pool is None or _pool_key != (url, workers):
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(url,)
+        )
+        _pool_key = (url, workers)
+    return _pool
+
+
+def aggregate_sales(start_date, end_date, group_by='day', workers=None):
+    """
+    Aggregate sale items between two dates (inclusive).
+    Returns a list of dicts sorted by key, each with revenue, cost, profit,
+    quantity, transactions (item lines) and sales (distinct bills); medicine
+    and category rows also carry a name.
+    With more than one worker (REPORT_WORKERS) the range is split into
+    REPORT_CHUNK_DAYS chunks that are aggregated in parallel. Archived sales
+    are included when the range reaches into the archive. When
+    ANALYTICS_SNAPSHOT_DIR is set, the columnar snapshot is used instead.
+    """
+    if current_app.config.get('ANALYTICS_SNAPSHOT_DIR'):
+        from app.analytics import get_snapshot
+        snapshot = get_snapshot()
+        snapshot.refresh()
+        return snapshot.aggregate(start_date, end_date, group_by)
+    
+    if workers is None:
+        workers = current_app.config.get('REPORT_WORKERS', 1)
+    chunks = partition_date_range(start_date, end_date, current_app.config.get('REPORT_CHUNK_DAYS', 90))
+    
+    url = db.session.get_bind().url  # The replica while this request reads from it
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    
+    if workers > 1 and len(chunks) > 1 and not in_memory:
+        pool = _get_pool(_read_only_url(url), workers)
+        store_id = Store.current_id()
+        partials = list(pool.map(_aggregate_chunk, [(group_by, s, e, store_id) for s, e in chunks]))
+    else:
+        rows = db.session.execute(build_aggregate_query(group_by, start_date, end_date)).all()
+        partials = [_rows_to_partial(rows)]
+    
+    # Older sales may have been moved to the archive database (merged last,
+    # so current medicine/category names win)
+    if archive_reaches(start_date):
+        rows = db.session.execute(build_archive_aggregate_query(group_by, start_date, end_date)).all()
+        partials.append(_rows_to_partial(rows))
+    
+    return merge_partials(partials)
+
+
+def summarize(rows):
+    """Total revenue, cost, profit and sale count over aggregate rows."""
+    return (
+        sum(r['revenue'] for r in rows),
+        sum(r['cost'] for r in rows),
+        sum(r['profit'] for r in rows),
+        sum(r['sales'] for r in rows)
+    )
 
 
 @reports.route('/')
@@ -94,6 +331,7 @@ def index():
 
 
 @reports.route('/sales')
+@conditional('inventory', 'sales')
 def sales_report():
     """Daily/Weekly/Monthly sales report."""
     # Get date range
@@ -129,6 +367,15 @@ def sales_report():
         func.date(Sale.sale_date) <= end_date
     ).order_by(Sale.sale_date.desc()).all()
     
+    # Include archived sales when the range reaches into the archive
+    if archive_reaches(start_date):
+        range_start, range_end = _date_bounds(start_date, end_date)
+        archived = ArchivedSale.query.filter(
+            ArchivedSale.sale_date >= range_start,
+            ArchivedSale.sale_date < range_end
+        ).all()
+        sales = sorted(sales + archived, key=lambda s: s.sale_date, reverse=True)
+    
     # Calculate summary
     total_sales = sum(s.total_amount for s in sales)
     total_items = sum(len(s.items) for s in sales)
@@ -155,125 +402,166 @@ def sales_report():
 
 
 @reports.route('/expiry')
+@conditional('inventory', 'sales')
 def expiry_report():
     """Expiring and expired batches report."""
     today = datetime.now().date()
     
-    # Get expired batches
-    expired_batches = Batch.query.filter(
-        Batch.is_active == True,
-        Batch.expiry_date < today,
-        Batch.stock_quantity > 0
-    ).order_by(Batch.expiry_date).all()
-    
-    # Get expiring within 30 days
-    expiring_soon = Batch.query.filter(
-        Batch.is_active == True,
-        Batch.expiry_date >= today,
-        Batch.expiry_date <= today + timedelta(days=30),
-        Batch.stock_quantity > 0
-    ).order_by(Batch.expiry_date).all()
-    
-    # Get expiring within 90 days (but not in 30)
-    expiring_90 = Batch.query.filter(
-        Batch.is_active == True,
-        Batch.expiry_date > today + timedelta(days=30),
-        Batch.expiry_date <= today + timedelta(days=90),
-        Batch.stock_quantity > 0
-    ).order_by(Batch.expiry_date).all()
-    
-    # Calculate total value at risk
-    expired_value = sum(b.stock_quantity * b.unit_price for b in expired_batches)
-    expiring_value = sum(b.stock_quantity * b.unit_price for b in expiring_soon)
-    expiring_90_value = sum(b.stock_quantity * b.unit_price for b in expiring_90)
+    # Bucket boundaries in days, e.g. ?buckets=7,14,180 (default 30 and 90)
+    try:
+        boundaries = sorted({int(d) for d in request.args.get('buckets', '30,90').split(',') if d.strip()})
+    except ValueError:
+        boundaries = [30, 90]
+    boundaries = [d for d in boundaries if 0 < d <= 3650][:6] or [30, 90]
+    
+    # Counts and value at risk per bucket (one grouped query)
+    buckets = Batch.expiry_summary(today, boundaries)
+    
+    # Listed rows for all buckets in one query, medicine eager-loaded
+    for bucket in buckets:
+        bucket['batches'] = []
+    for batch in Batch.at_risk_query(today, boundaries[-1]).all():
+        days_left = (batch.expiry_date - today).days
+        if days_left < 0:
+            buckets[0]['batches'].append(batch)
+        else:
+            next(b for b in buckets[1:] if days_left <= b['days'])['batches'].append(batch)
     
     return render_template('reports/expiry.html',
-        expired_batches=expired_batches,
-        expiring_soon=expiring_soon,
-        expiring_90=expiring_90,
-        expired_value=expired_value,
-        expiring_value=expiring_value,
-        expiring_90_value=expiring_90_value,
+        buckets=buckets,
+        boundaries=boundaries,
         today=today
     )
 
 
+def medicine_stock():
+    """
+    Active medicines with their stock and retail value in active batches,
+    by name, in one grouped query: rows with id, name, packing_type,
+    min_stock_level, category_name, total_stock and stock_value.
+    """
+    unit_price = case((Medicine.units_per_pack > 0, Batch.mrp / Medicine.units_per_pack),
+                      else_=func.coalesce(Batch.mrp, 0))
+    return db.session.execute(
+        select(
+            Medicine.id, Medicine.name, Medicine.packing_type, Medicine.min_stock_level,
+            Category.name.label('category_name'),
+            func.coalesce(func.sum(Batch.stock_quantity), 0).label('total_stock'),
+            func.coalesce(func.sum(Batch.stock_quantity * unit_price), 0).label('stock_value')
+        ).outerjoin(Category, Medicine.category_id == Category.id)
+        .outerjoin(Batch, (Batch.medicine_id == Medicine.id) & (Batch.is_active == True))
+        .where(Medicine.is_active == True)
+        .group_by(Medicine.id, Medicine.name, Medicine.packing_type, Medicine.min_stock_level, Category.name)
+        .order_by(Medicine.name)
+    ).all()
+
+
 @reports.route('/stock')
+@conditional('inventory', 'sales')
 def stock_report():
     """Low stock and out of stock report."""
-    # Get all active medicines
-    medicines = Medicine.query.filter_by(is_active=True).order_by(Medicine.name).all()
+    def load_stock():
+        """Medicines by stock status (only run when the cached report is stale)."""
+        out_of_stock = []
+        low_stock = []
+        healthy_stock = []
+        medicines = medicine_stock()
+        for m in medicines:
+            if m.total_stock == 0:
+                out_of_stock.append(m)
+            elif m.total_stock <= m.min_stock_level:
+                low_stock.append((m, m.total_stock))
+            else:
+                healthy_stock.append((m, m.total_stock, m.stock_value))
+        return out_of_stock, low_stock, healthy_stock, sum(m.stock_value for m in medicines)
+    
+    return render_template('reports/stock.html', load_stock=load_stock)
+
+
+@reports.route('/valuation')
+@conditional('inventory', 'sales')
+def valuation_report():
+    """Stock and its value at the end of any day, from the stock movement ledger."""
+    today = datetime.now().date()
+    try:
+        on_date = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        on_date = today
+    
+    at = datetime.now() if on_date >= today else datetime.combine(on_date, datetime.max.time())
+    rows, checkpoint = stock_valuation(at)
+    
+    return render_template('reports/valuation.html',
+        rows=rows,
+        checkpoint=checkpoint,
+        on_date=on_date,
+        total_units=sum(r['units'] for r in rows),
+        total_cost=sum(r['cost_value'] for r in rows),
+        total_retail=sum(r['retail_value'] for r in rows)
+    )
+
+
+@reports.route('/reorder')
+@conditional('inventory', 'sales')
+def reorder_report():
+    """Reorder suggestions from sales velocity and days of cover."""
+    show_all = request.args.get('show') == 'all'
+    rows = get_reorder_engine().suggestions()
+    due = [r for r in rows if r['suggested'] > 0]
+    
+    return render_template('reports/reorder.html',
+        rows=rows if show_all else due,
+        show_all=show_all,
+        due_count=len(due),
+        total_medicines=len(rows),
+        lead_days=current_app.config['REORDER_LEAD_DAYS'],
+        review_days=current_app.config['REORDER_REVIEW_DAYS']
+    )
+
+
+@reports.route('/forecast')
+@conditional('inventory', 'forecasts')
+def forecast_report():
+    """Demand forecasts from the last `flask analytics forecast` run."""
+    search = request.args.get('q', '').strip()
     
-    # Categorize by stock status
-    out_of_stock = []
-    low_stock = []
-    healthy_stock = []
-    total_stock_value = 0
+    query = DemandForecast.query.join(Medicine).options(contains_eager(DemandForecast.medicine))
+    if search:
+        escaped = search.replace('%', r'\%').replace('_', r'\_')
+        query = query.filter(Medicine.name.ilike(f'%{escaped}%', escape='\\'))
+    forecasts = query.order_by(DemandForecast.next_28_days.desc(), Medicine.name).limit(100).all()
     
-    for m in medicines:
-        total_qty = m.total_stock
-        
-        # Calculate stock value
-        stock_value = sum(b.stock_quantity * b.unit_price for b in m.batches if b.is_active)
-        total_stock_value += stock_value
-        
-        if m.is_out_of_stock:
-            out_of_stock.append(m)
-        elif m.is_low_stock:
-            low_stock.append((m, total_qty))
-        else:
-            healthy_stock.append((m, total_qty, stock_value))
-    
-    return render_template('reports/stock.html',
-        out_of_stock=out_of_stock,
-        low_stock=low_stock,
-        healthy_stock=healthy_stock,
-        total_medicines=len(medicines),
-        total_stock_value=total_stock_value
+    latest = db.session.query(func.max(DemandForecast.fitted_on)).scalar()
+    days = [latest + timedelta(days=i) for i in range(1, 8)] if latest else []
+    
+    return render_template('reports/forecast.html',
+        forecasts=forecasts,
+        days=days,
+        fitted_on=latest,
+        search=search
     )
 
 
 # ============ BUSINESS REPORTS ============
 
 @reports.route('/profit')
+@conditional('inventory', 'sales')
 def profit_report():
     """Profit & Loss report with charts."""
     period = request.args.get('period', 'this_month')
     start_date, end_date, period = get_date_range(period)
     
-    # Get all sales in range
-    sales = Sale.query.filter(
-        func.date(Sale.sale_date) >= start_date,
-        func.date(Sale.sale_date) <= end_date
-    ).order_by(Sale.sale_date).all()
-    
-    # Calculate totals
-    total_revenue = 0
-    total_cost = 0
-    total_profit = 0
-    daily_data = {}
-    
-    for sale in sales:
-        revenue, cost, profit = calculate_sale_profit(sale)
-        total_revenue += revenue
-        total_cost += cost
-        total_profit += profit
-        
-        # Daily breakdown for chart
-        date_key = sale.sale_date.strftime('%Y-%m-%d')
-        if date_key not in daily_data:
-            daily_data[date_key] = {'revenue': 0, 'cost': 0, 'profit': 0}
-        daily_data[date_key]['revenue'] += revenue
-        daily_data[date_key]['cost'] += cost
-        daily_data[date_key]['profit'] += profit
+    # Daily totals (one row per day with sales)
+    daily_rows = aggregate_sales(start_date, end_date, group_by='day')
+    total_revenue, total_cost, total_profit, sale_count = summarize(daily_rows)
     
     # Calculate margin percentage
     margin_percent = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
     
-    # Prepare chart data (sorted by date)
-    chart_labels = sorted(daily_data.keys())
-    chart_revenue = [daily_data[d]['revenue'] for d in chart_labels]
-    chart_profit = [daily_data[d]['profit'] for d in chart_labels]
+    # Prepare chart data (rows are sorted by date)
+    chart_labels = [r['key'] for r in daily_rows]
+    chart_revenue = [r['revenue'] for r in daily_rows]
+    chart_profit = [r['profit'] for r in daily_rows]
     
     return render_template('reports/profit.html',
         period=period,
@@ -283,7 +571,7 @@ def profit_report():
         total_cost=total_cost,
         total_profit=total_profit,
         margin_percent=margin_percent,
-        sale_count=len(sales),
+        sale_count=sale_count,
         chart_labels=chart_labels,
         chart_revenue=chart_revenue,
         chart_profit=chart_profit
@@ -291,43 +579,20 @@ def profit_report():
 
 
 @reports.route('/top-sellers')
+@conditional('inventory', 'sales')
 def top_sellers_report():
     """Top selling products by quantity and revenue."""
     period = request.args.get('period', 'this_month')
     start_date, end_date, period = get_date_range(period)
     
-    # Get all sale items in range (excluding unlisted) with eager loading
-    sale_items = db.session.query(SaleItem).join(Sale).options(
-        joinedload(SaleItem.batch).joinedload(Batch.medicine)
-    ).filter(
-        func.date(Sale.sale_date) >= start_date,
-        func.date(Sale.sale_date) <= end_date,
-        SaleItem.batch_id.isnot(None)
-    ).all()
-    
-    # Aggregate by medicine
-    medicine_stats = {}
-    for item in sale_items:
-        med_id = item.batch.medicine_id
-        med_name = item.batch.medicine.name
-        
-        if med_id not in medicine_stats:
-            medicine_stats[med_id] = {
-                'name': med_name,
-                'quantity': 0,
-                'revenue': 0,
-                'transactions': 0
-            }
-        
-        medicine_stats[med_id]['quantity'] += item.quantity
-        medicine_stats[med_id]['revenue'] += item.subtotal
-        medicine_stats[med_id]['transactions'] += 1
+    # Per-medicine totals (listed items only)
+    medicine_stats = aggregate_sales(start_date, end_date, group_by='medicine')
     
     # Sort by quantity (top sellers)
-    top_by_qty = sorted(medicine_stats.values(), key=lambda x: x['quantity'], reverse=True)[:20]
+    top_by_qty = sorted(medicine_stats, key=lambda x: x['quantity'], reverse=True)[:20]
     
     # Sort by revenue
-    top_by_revenue = sorted(medicine_stats.values(), key=lambda x: x['revenue'], reverse=True)[:20]
+    top_by_revenue = sorted(medicine_stats, key=lambda x: x['revenue'], reverse=True)[:20]
     
     # Chart data (top 10 by quantity)
     chart_labels = [m['name'][:20] for m in top_by_qty[:10]]
@@ -347,51 +612,24 @@ def top_sellers_report():
 
 
 @reports.route('/profitable-products')
+@conditional('inventory', 'sales')
 def profitable_products_report():
     """Products ranked by profit margin."""
     period = request.args.get('period', 'this_month')
     start_date, end_date, period = get_date_range(period)
     
-    # Get all sale items in range (excluding unlisted) with eager loading
-    sale_items = db.session.query(SaleItem).join(Sale).options(
-        joinedload(SaleItem.batch).joinedload(Batch.medicine)
-    ).filter(
-        func.date(Sale.sale_date) >= start_date,
-        func.date(Sale.sale_date) <= end_date,
-        SaleItem.batch_id.isnot(None)
-    ).all()
-    
-    # Aggregate by medicine with profit calculation
-    medicine_profits = {}
-    for item in sale_items:
-        med_id = item.batch.medicine_id
-        med_name = item.batch.medicine.name
-        
-        revenue, cost, profit = calculate_item_profit(item)
-        
-        if med_id not in medicine_profits:
-            medicine_profits[med_id] = {
-                'name': med_name,
-                'revenue': 0,
-                'cost': 0,
-                'profit': 0,
-                'quantity': 0
-            }
-        
-        medicine_profits[med_id]['revenue'] += revenue
-        medicine_profits[med_id]['cost'] += cost
-        medicine_profits[med_id]['profit'] += profit
-        medicine_profits[med_id]['quantity'] += item.quantity
+    # Per-medicine totals with profit (listed items only)
+    medicine_profits = aggregate_sales(start_date, end_date, group_by='medicine')
     
     # Calculate margin % for each
-    for med in medicine_profits.values():
+    for med in medicine_profits:
         med['margin'] = (med['profit'] / med['revenue'] * 100) if med['revenue'] > 0 else 0
     
     # Sort by profit amount
-    top_by_profit = sorted(medicine_profits.values(), key=lambda x: x['profit'], reverse=True)[:20]
+    top_by_profit = sorted(medicine_profits, key=lambda x: x['profit'], reverse=True)[:20]
     
     # Sort by margin %
-    top_by_margin = sorted(medicine_profits.values(), key=lambda x: x['margin'], reverse=True)[:20]
+    top_by_margin = sorted(medicine_profits, key=lambda x: x['margin'], reverse=True)[:20]
     
     return render_template('reports/profitable_products.html',
         period=period,
@@ -403,47 +641,19 @@ def profitable_products_report():
 
 
 @reports.route('/category-performance')
+@conditional('inventory', 'sales')
 def category_performance_report():
     """Sales and profit breakdown by category."""
     period = request.args.get('period', 'this_month')
     start_date, end_date, period = get_date_range(period)
     
-    # Get all sale items in range (excluding unlisted) with eager loading
-    sale_items = db.session.query(SaleItem).join(Sale).options(
-        joinedload(SaleItem.batch).joinedload(Batch.medicine).joinedload(Medicine.category)
-    ).filter(
-        func.date(Sale.sale_date) >= start_date,
-        func.date(Sale.sale_date) <= end_date,
-        SaleItem.batch_id.isnot(None)
-    ).all()
-    
-    # Aggregate by category
-    category_stats = {}
-    for item in sale_items:
-        cat = item.batch.medicine.category
-        cat_id = cat.id if cat else 0
-        cat_name = cat.name if cat else 'Uncategorized'
-        
-        revenue, cost, profit = calculate_item_profit(item)
-        
-        if cat_id not in category_stats:
-            category_stats[cat_id] = {
-                'name': cat_name,
-                'revenue': 0,
-                'cost': 0,
-                'profit': 0,
-                'items_sold': 0,
-                'transactions': 0
-            }
-        
-        category_stats[cat_id]['revenue'] += revenue
-        category_stats[cat_id]['cost'] += cost
-        category_stats[cat_id]['profit'] += profit
-        category_stats[cat_id]['items_sold'] += item.quantity
-        category_stats[cat_id]['transactions'] += 1
+    # Per-category totals (listed items only)
+    category_stats = aggregate_sales(start_date, end_date, group_by='category')
+    for cat in category_stats:
+        cat['items_sold'] = cat['quantity']
     
     # Sort by revenue
-    categories = sorted(category_stats.values(), key=lambda x: x['revenue'], reverse=True)
+    categories = sorted(category_stats, key=lambda x: x['revenue'], reverse=True)
     
     # Calculate percentages
     total_revenue = sum(c['revenue'] for c in categories)
@@ -467,53 +677,48 @@ def category_performance_report():
 
 
 @reports.route('/dead-stock')
+@conditional('inventory', 'sales')
 def dead_stock_report():
     """Products not sold in specified days."""
     days = request.args.get('days', 30, type=int)
-    cutoff_date = datetime.now().date() - timedelta(days=days)
-    
-    # Get all medicines with stock
-    medicines = Medicine.query.filter(
-        Medicine.is_active == True
-    ).all()
-    
-    dead_stock = []
-    
-    for med in medicines:
-        if med.total_stock == 0:
-            continue
+    today = datetime.now().date()
+    cutoff_date = today - timedelta(days=days)
+    
+    def load_dead_stock():
+        """Unsold medicines with stock, highest value first (only run when the cached report is stale)."""
+        last_sales = dict(db.session.execute(
+            select(Batch.medicine_id, func.max(Sale.sale_date))
+            .select_from(SaleItem).join(Sale, SaleItem.sale_id == Sale.id)
+            .join(Batch, SaleItem.batch_id == Batch.id)
+            .group_by(Batch.medicine_id)
+        ).all())
         
-        # Get last sale date for this medicine
-        last_sale = db.session.query(func.max(Sale.sale_date)).join(SaleItem).join(Batch).filter(
-            Batch.medicine_id == med.id
-        ).scalar()
+        dead_stock = []
+        for med in medicine_stock():
+            if med.total_stock == 0:
+                continue
+            last_sale = last_sales.get(med.id)
+            if last_sale is None or last_sale.date() < cutoff_date:
+                dead_stock.append({
+                    'medicine': med,
+                    'stock': med.total_stock,
+                    'value': med.stock_value,
+                    'last_sale': last_sale.date() if last_sale else None,
+                    'days_since': (today - last_sale.date()).days if last_sale else None
+                })
         
-        if last_sale is None or last_sale.date() < cutoff_date:
-            # Calculate stock value
-            stock_value = sum(b.stock_quantity * b.unit_price for b in med.batches if b.is_active and b.stock_quantity > 0)
-            
-            dead_stock.append({
-                'medicine': med,
-                'stock': med.total_stock,
-                'value': stock_value,
-                'last_sale': last_sale.date() if last_sale else None,
-                'days_since': (datetime.now().date() - last_sale.date()).days if last_sale else None
-            })
-    
-    # Sort by value (highest first)
-    dead_stock.sort(key=lambda x: x['value'], reverse=True)
-    
-    total_dead_value = sum(d['value'] for d in dead_stock)
+        # Sort by value (highest first)
+        dead_stock.sort(key=lambda x: x['value'], reverse=True)
+        return dead_stock, sum(d['value'] for d in dead_stock)
     
     return render_template('reports/dead_stock.html',
         days=days,
-        dead_stock=dead_stock,
-        total_dead_value=total_dead_value,
-        item_count=len(dead_stock)
+        load_dead_stock=load_dead_stock
     )
 
 
 @reports.route('/trends')
+@conditional('inventory', 'sales')
 def trends_report():
     """Sales trends comparison (this month vs last month)."""
     today = datetime.now().date()
@@ -527,26 +732,14 @@ def trends_report():
     last_month_end = this_month_start - timedelta(days=1)
     last_month_start = last_month_end.replace(day=1)
     
-    # Get sales for both periods
-    this_month_sales = Sale.query.filter(
-        func.date(Sale.sale_date) >= this_month_start,
-        func.date(Sale.sale_date) <= this_month_end
-    ).all()
-    
-    last_month_sales = Sale.query.filter(
-        func.date(Sale.sale_date) >= last_month_start,
-        func.date(Sale.sale_date) <= last_month_end
-    ).all()
-    
-    # Calculate metrics for this month
-    this_revenue = sum(s.total_amount for s in this_month_sales)
-    this_transactions = len(this_month_sales)
-    this_profit = sum(calculate_sale_profit(s)[2] for s in this_month_sales)
+    # Daily totals for both months in one pass
+    daily_rows = aggregate_sales(last_month_start, this_month_end, group_by='day')
+    this_month_rows = [r for r in daily_rows if r['key'] >= this_month_start.isoformat()]
+    last_month_rows = [r for r in daily_rows if r['key'] < this_month_start.isoformat()]
     
-    # Calculate metrics for last month
-    last_revenue = sum(s.total_amount for s in last_month_sales)
-    last_transactions = len(last_month_sales)
-    last_profit = sum(calculate_sale_profit(s)[2] for s in last_month_sales)
+    # Calculate metrics for each month
+    this_revenue, _, this_profit, this_transactions = summarize(this_month_rows)
+    last_revenue, _, last_profit, last_transactions = summarize(last_month_rows)
     
     # Calculate growth percentages
     revenue_growth = ((this_revenue - last_revenue) / last_revenue * 100) if last_revenue > 0 else 0
@@ -554,20 +747,8 @@ def trends_report():
     profit_growth = ((this_profit - last_profit) / last_profit * 100) if last_profit > 0 else 0
     
     # Daily breakdown for chart (both months aligned by day number)
-    this_month_daily = {}
-    last_month_daily = {}
-    
-    for sale in this_month_sales:
-        day = sale.sale_date.day
-        if day not in this_month_daily:
-            this_month_daily[day] = 0
-        this_month_daily[day] += sale.total_amount
-    
-    for sale in last_month_sales:
-        day = sale.sale_date.day
-        if day not in last_month_daily:
-            last_month_daily[day] = 0
-        last_month_daily[day] += sale.total_amount
+    this_month_daily = {int(r['key'][8:10]): r['revenue'] for r in this_month_rows}
+    last_month_daily = {int(r['key'][8:10]): r['revenue'] for r in last_month_rows}
     
     # Chart data
     max_day = max(this_month_last, last_month_end.day)
@@ -594,6 +775,7 @@ def trends_report():
 
 
 @reports.route('/margin-alerts')
+@conditional('inventory', 'sales')
 def margin_alerts_report():
     """Items sold below cost (negative margin)."""
     period = request.args.get('period', 'this_month')
@@ -626,6 +808,30 @@ def margin_alerts_report():
                 'loss': abs(profit)
             })
     
+    # Archived items (cost per unit was recorded when archiving)
+    if archive_reaches(start_date):
+        range_start, range_end = _date_bounds(start_date, end_date)
+        archived_items = db.session.query(ArchivedSaleItem).join(ArchivedSale).options(
+            joinedload(ArchivedSaleItem.sale)
+        ).filter(
+            ArchivedSale.sale_date >= range_start,
+            ArchivedSale.sale_date < range_end,
+            ArchivedSaleItem.unit_cost.isnot(None),
+            ArchivedSaleItem.price_at_sale < ArchivedSaleItem.unit_cost
+        ).all()
+        
+        for item in archived_items:
+            alerts.append({
+                'sale_id': item.sale_id,
+                'sale_date': item.sale.sale_date,
+                'medicine': item.medicine_name,
+                'batch': item.batch_number,
+                'quantity': item.quantity,
+                'sold_price': item.price_at_sale,
+                'cost_price': item.unit_cost,
+                'loss': item.unit_cost * item.quantity - item.subtotal
+            })
+    
     # Sort by loss amount
     alerts.sort(key=lambda x: x['loss'], reverse=True)
     
@@ -639,3 +845,28 @@ def margin_alerts_report():
         total_loss=total_loss,
         alert_count=len(alerts)
     )
+
+
+# ============ HEAD OFFICE ============
+
+@reports.route('/stores')
+@conditional('sales')
+def stores_report():
+    """Sales of every store side by side, from the daily store summaries."""
+    period = request.args.get('period', 'this_month')
+    start_date, end_date, period = get_date_range(period)
+    
+    # Fold in new sales first (incremental, on the primary database)
+    refresh_store_summaries()
+    rows, total = store_rollup(start_date, end_date)
+    for row in rows + [total]:
+        row['margin'] = (row['profit'] / row['revenue'] * 100) if row['revenue'] > 0 else 0
+    
+    return render_template('reports/stores.html',
+        period=period,
+        start_date=start_date,
+        end_date=end_date,
+        rows=rows,
+        total=total,
+        current_store=Store.current_id()
+    )
@@ -1,31 +1,109 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from app.models import db
 from app.models.sale import Sale, SaleItem
+from app.models.archive import ArchivedSale
+from app.archive import archive_ready
+from app.checkout import checkout, sync_sales
 from app.models.batch import Batch
 from app.models.medicine import Medicine
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from markupsafe import Markup
+from sqlalchemy import or_, tuple_
 
 bp = Blueprint('sales', __name__, url_prefix='/sales')
 
 
+SALES_PER_PAGE = 20
+RECEIPT_CACHE_SIZE = 256
+
+_receipt_cache = OrderedDict()
+_receipt_lock = threading.Lock()
+
+
+def parse_cursor(value):
+    """Parse a 'sale_date_id' keyset cursor; None if missing or malformed."""
+    try:
+        sale_date, sale_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(sale_date), int(sale_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def make_cursor(sale):
+    """Keyset cursor pointing at a sale."""
+    return f'{sale.sale_date.isoformat()}_{sale.id}'
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD query argument; None if missing or malformed."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
 @bp.route('/')
 def list_sales():
-    """List all sales with filters."""
-    page = request.args.get('page', 1, type=int)
-    date_filter = request.args.get('date', '')
+    """
+    List sales, newest first, with date range and customer filters.
+    Uses keyset pagination on (sale_date, id): 'after' moves to older sales,
+    'before' to newer ones, so deep pages cost the same as the first.
+    """
+    date_filter = request.args.get('date', '')  # Single day (older links)
+    start_date = parse_date(request.args.get('start_date') or date_filter)
+    end_date = parse_date(request.args.get('end_date') or date_filter)
+    customer = request.args.get('customer', '').strip()
+    after = parse_cursor(request.args.get('after'))
+    before = parse_cursor(request.args.get('before')) if not after else None
     
-    query = Sale.query.order_by(Sale.sale_date.desc())
+    query = Sale.query
+    # Range on the raw column so the sale_date index is used
+    if start_date:
+        query = query.filter(Sale.sale_date >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(Sale.sale_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    if customer:
+        escaped_customer = customer.replace('%', r'\%').replace('_', r'\_')
+        pattern = f'%{escaped_customer}%'
+        query = query.filter(or_(Sale.customer_name.ilike(pattern, escape='\\'),
+                                 Sale.customer_phone.ilike(pattern, escape='\\')))
     
-    if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Sale.sale_date) == filter_date)
-        except ValueError:
-            pass
+    key = tuple_(Sale.sale_date, Sale.id)
+    if before:
+        # Walk forwards from the cursor, then flip back to newest-first
+        sales = query.filter(key > before).order_by(Sale.sale_date, Sale.id).limit(SALES_PER_PAGE + 1).all()
+        has_newer = len(sales) > SALES_PER_PAGE
+        sales = sales[:SALES_PER_PAGE][::-1]
+        has_older = True
+    else:
+        if after:
+            query = query.filter(key < after)
+        sales = query.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(SALES_PER_PAGE + 1).all()
+        has_older = len(sales) > SALES_PER_PAGE
+        sales = sales[:SALES_PER_PAGE]
+        has_newer = after is not None
     
-    sales = query.paginate(page=page, per_page=20, error_out=False)
+    # Item counts for the page only, in one grouped query
+    item_counts = {}
+    if sales:
+        item_counts = dict(db.session.query(SaleItem.sale_id, db.func.count(SaleItem.id)).filter(
+            SaleItem.sale_id.in_([s.id for s in sales])
+        ).group_by(SaleItem.sale_id).all())
     
-    return render_template('sales/list.html', sales=sales, date_filter=date_filter)
+    filters = {
+        'start_date': start_date.isoformat() if start_date else '',
+        'end_date': end_date.isoformat() if end_date else '',
+        'customer': customer
+    }
+    return render_template('sales/list.html',
+                         sales=sales,
+                         item_counts=item_counts,
+                         filters=filters,
+                         filter_args={k: v for k, v in filters.items() if v},
+                         newer_cursor=make_cursor(sales[0]) if sales and has_newer else None,
+                         older_cursor=make_cursor(sales[-1]) if sales and has_older else None)
 
 
 @bp.route('/new')
@@ -36,91 +114,67 @@ def new_sale():
 
 @bp.route('/create', methods=['POST'])
 def create_sale():
-    """Create a new sale from cart items."""
-    data = request.get_json()
-    
-    if not data or 'items' not in data or not data['items']:
-        return jsonify({'success': False, 'error': 'No items in cart'}), 400
+    """Create a new sale from cart items (optionally with an Idempotency-Key header)."""
+    body, status = checkout(db.session, request.get_json(), request.headers.get('Idempotency-Key'))
+    return jsonify(body), status
+
+
+@bp.route('/sync', methods=['POST'])
+def sync_offline_sales():
+    """
+    Apply sales queued by a terminal while offline, in one transaction.
+    Body: {"sales": [{"idempotency_key", "sale_date", "items", ...}, ...]}
+    """
+    data = request.get_json(silent=True)
+    body, status = sync_sales(db.session, data.get('sales') if isinstance(data, dict) else None)
+    return jsonify(body), status
+
+
+def load_sale(sale_id):
+    """Sale with items eager-loaded (falls back to the archive for old sales)."""
+    sale = Sale.get_with_items(sale_id)
+    if sale is None and archive_ready():
+        sale = ArchivedSale.get_with_items(sale_id)
+    if sale is None:
+        abort(404)
+    return sale
+
+
+def render_receipt(sale):
+    """
+    Receipt HTML for a sale. Sales are never edited once created, so the
+    rendered receipt is kept in a small in-process LRU cache for reprints.
+    """
+    with _receipt_lock:
+        if sale.id in _receipt_cache:
+            _receipt_cache.move_to_end(sale.id)
+            return _receipt_cache[sale.id]
     
-    try:
-        # Create the sale
-        sale = Sale(
-            customer_name=data.get('customer_name', ''),
-            customer_phone=data.get('customer_phone', '')
-        )
-        db.session.add(sale)
-        db.session.flush()  # Get the sale ID
-        
-        total_amount = 0
-        
-        for item in data['items']:
-            # Validate quantity and price
-            quantity = item.get('quantity', 0)
-            unit_price = item.get('unit_price', 0)
-            
-            if not isinstance(quantity, (int, float)) or quantity <= 0:
-                db.session.rollback()
-                return jsonify({'success': False, 'error': 'Invalid quantity. Must be a positive number.'}), 400
-            
-            if not isinstance(unit_price, (int, float)) or unit_price < 0:
-                db.session.rollback()
-                return jsonify({'success': False, 'error': 'Invalid price. Must be a non-negative number.'}), 400
-            
-            quantity = int(quantity)
-            unit_price = float(unit_price)
-            
-            if item.get('is_unlisted'):
-                # Unlisted item
-                sale_item = SaleItem(
-                    sale_id=sale.id,
-                    batch_id=None,
-                    item_name=item.get('name', 'Unlisted Item')[:100],
-                    quantity=quantity,
-                    price_at_sale=unit_price
-                )
-            else:
-                # Listed item with batch
-                batch = Batch.query.get(item['batch_id'])
-                if not batch:
-                    db.session.rollback()
-                    return jsonify({'success': False, 'error': f'Batch not found: {item["batch_id"]}'}), 400
-                
-                if batch.stock_quantity < quantity:
-                    db.session.rollback()
-                    return jsonify({
-                        'success': False, 
-                        'error': f'Insufficient stock for {batch.medicine.name}. Available: {batch.stock_quantity}'
-                    }), 400
-                
-                # Deduct stock
-                batch.stock_quantity -= quantity
-                
-                sale_item = SaleItem(
-                    sale_id=sale.id,
-                    batch_id=batch.id,
-                    quantity=quantity,
-                    price_at_sale=unit_price
-                )
-            
-            total_amount += sale_item.subtotal
-            db.session.add(sale_item)
-        
-        sale.total_amount = total_amount
-        db.session.commit()
-        
-        return jsonify({
-            'success': True, 
-            'sale_id': sale.id,
-            'message': f'Sale #{sale.id} created successfully!'
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'error': str(e)}), 500
+    receipt = Markup(render_template('sales/_receipt.html', sale=sale))
+    with _receipt_lock:
+        _receipt_cache[sale.id] = receipt
+        if len(_receipt_cache) > RECEIPT_CACHE_SIZE:
+            _receipt_cache.popitem(last=False)
+    return receipt
+
+
+def cached_receipt(sale_id):
+    """Previously rendered receipt, or None."""
+    with _receipt_lock:
+        return _receipt_cache.get(sale_id)
 
 
 @bp.route('/<int:sale_id>')
 def view_sale(sale_id):
     """View sale details."""
-    sale = Sale.query.get_or_404(sale_id)
-    return render_template('sales/view.html', sale=sale)
+    sale = load_sale(sale_id)
+    return render_template('sales/view.html', sale=sale, receipt=render_receipt(sale))
+
+
+@bp.route('/<int:sale_id>/receipt')
+def print_receipt(sale_id):
+    """Printable receipt for reprints (served from cache when possible)."""
+    receipt = cached_receipt(sale_id)
+    if receipt is None:
+        receipt = render_receipt(load_sale(sale_id))
+    return render_template('sales/receipt.html', sale_id=sale_id, receipt=receipt)
@@ -0,0 +1,60 @@
+"""
+JSON serialization for API responses.
+
+FastJSONProvider encodes with orjson when it is installed (standard library
+otherwise) and is used by both the Flask app and the async POS app. The row
+helpers build payloads from column-query tuples rather than ORM objects, so
+serializing touches no lazy relationships; date-dependent fields use one
+`today` taken by the caller per request.
+"""
+from flask.json.provider import DefaultJSONProvider
+from app.models import Batch
+
+try:
+    import orjson
+except ImportError:  # Standard library json
+    orjson = None
+
+# Dates and datetimes go through the provider's default(), formatted as Flask does
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+# Columns read by batch_row, in order
+BATCH_COLUMNS = (Batch.id, Batch.batch_number, Batch.expiry_date, Batch.stock_quantity, Batch.mrp)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using orjson for jsonify() and app.json.dumps()."""
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+    
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)  # Pretty-printed in debug mode
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS), mimetype=self.mimetype
+        )
+
+
+def unit_price(mrp, units_per_pack):
+    """Price of a single unit (tablet/ml), as Batch.unit_price."""
+    if mrp is not None and units_per_pack and units_per_pack > 0:
+        return mrp / units_per_pack
+    return mrp if mrp else 0
+
+
+def batch_row(row, units_per_pack, today):
+    """API dict of a batch from BATCH_COLUMNS values."""
+    batch_id, batch_number, expiry_date, stock_quantity, mrp = row
+    return {
+        'id': batch_id,
+        'batch_number': batch_number,
+        'expiry_date': expiry_date.strftime('%Y-%m-%d'),
+        'days_until_expiry': (expiry_date - today).days,
+        'stock_quantity': stock_quantity,
+        'mrp': mrp,
+        'unit_price': round(unit_price(mrp, units_per_pack), 2)
+    }
@@ -0,0 +1,126 @@
+"""
+Point-in-time stock from the stock movement ledger.
+
+Stock at any moment is the nearest checkpoint taken at or before it plus
+the movements recorded after that checkpoint, so the work is bounded by the
+checkpoint interval rather than by the age of the shop. Take checkpoints
+regularly from cron:
+    flask stock checkpoint
+
+The first checkpoint records current stock as opening balances; stock
+before it is only as complete as the ledger.
+"""
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select, union_all
+from app.main import db
+from app.models import Batch, Category, Medicine, StockCheckpoint, StockMovement, StockSnapshot
+from app.stores import store_filter
+
+
+def nearest_checkpoint(at):
+    """Latest checkpoint taken at or before `at`, or None."""
+    return StockCheckpoint.query.filter(
+        StockCheckpoint.taken_at <= at
+    ).order_by(StockCheckpoint.taken_at.desc(), StockCheckpoint.id.desc()).first()
+
+
+def stock_levels_query(checkpoint, at=None, last_movement_id=None):
+    """
+    SELECT of (batch_id, quantity) for the store's batches with stock: the
+    checkpoint's snapshot plus later movements (up to `at` / `last_movement_id`).
+    """
+    movements = select(StockMovement.batch_id, StockMovement.quantity).where(
+        StockMovement.id > (checkpoint.last_movement_id if checkpoint else 0)
+    )
+    if at is not None:
+        movements = movements.where(StockMovement.created_at <= at)
+    if last_movement_id is not None:
+        movements = movements.where(StockMovement.id <= last_movement_id)
+    
+    parts = [movements]
+    if checkpoint:
+        parts.append(select(StockSnapshot.batch_id, StockSnapshot.quantity)
+                     .where(StockSnapshot.checkpoint_id == checkpoint.id))
+    
+    rows = union_all(*parts).subquery()
+    total = func.sum(rows.c.quantity)
+    # Movements are not store-scoped; their batches are
+    return select(rows.c.batch_id, total.label('quantity')).join(Batch, rows.c.batch_id == Batch.id) \
+        .where(store_filter(Batch)).group_by(rows.c.batch_id).having(total != 0)
+
+
+def stock_as_of(at):
+    """Stock per batch at a moment in time: {batch_id: quantity}."""
+    levels = stock_levels_query(nearest_checkpoint(at), at=at)
+    return dict(db.session.execute(levels).all())
+
+
+def stock_valuation(at):
+    """
+    Stock per medicine at a moment in time, valued at cost (purchase price,
+    MRP when unknown) and at MRP, in one grouped query.
+    Returns (rows sorted by medicine name, checkpoint used).
+    """
+    checkpoint = nearest_checkpoint(at)
+    levels = stock_levels_query(checkpoint, at=at).subquery()
+    mrp_per_unit = Batch.mrp / func.nullif(Medicine.units_per_pack, 0)
+    
+    rows = db.session.query(
+        Medicine.id,
+        Medicine.name,
+        Category.name,
+        func.count(Batch.id),
+        func.sum(levels.c.quantity),
+        func.sum(levels.c.quantity * Batch.unit_cost_expr()),
+        func.sum(levels.c.quantity * func.coalesce(mrp_per_unit, Batch.mrp))
+    ).select_from(levels).join(
+        Batch, levels.c.batch_id == Batch.id
+    ).join(
+        Medicine, Batch.medicine_id == Medicine.id
+    ).outerjoin(
+        Category, Medicine.category_id == Category.id
+    ).group_by(Medicine.id, Medicine.name, Category.name).order_by(Medicine.name).all()
+    
+    return [{
+        'medicine_id': medicine_id,
+        'name': name,
+        'category': category or 'Uncategorized',
+        'batches': batches,
+        'units': units,
+        'cost_value': cost_value or 0,
+        'retail_value': retail_value or 0,
+    } for medicine_id, name, category, batches, units, cost_value, retail_value in rows], checkpoint
+
+
+def take_checkpoint(now=None):
+    """
+    Snapshot stock of every batch of the store. The first checkpoint copies current
+    Batch.stock_quantity; later ones roll the previous checkpoint forward
+    with the ledger. Returns the new checkpoint.
+    """
+    now = now or datetime.now()
+    try:
+        last_movement_id = db.session.execute(select(func.max(StockMovement.id))).scalar() or 0
+        previous = StockCheckpoint.query.order_by(StockCheckpoint.id.desc()).first()
+        
+        checkpoint = StockCheckpoint(taken_at=now, last_movement_id=last_movement_id)
+        db.session.add(checkpoint)
+        db.session.flush()
+        
+        if previous is None:
+            # Opening balances (stock held before the ledger existed)
+            levels = select(Batch.id, Batch.stock_quantity).where(Batch.stock_quantity != 0, store_filter(Batch))
+        else:
+            levels = stock_levels_query(previous, last_movement_id=last_movement_id)
+        
+        snapshot = levels.subquery()
+        db.session.execute(insert(StockSnapshot).from_select(
+            ['checkpoint_id', 'batch_id', 'quantity'],
+            select(literal(checkpoint.id), *snapshot.c)
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return checkpoint
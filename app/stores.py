@@ -0,0 +1,274 @@
+"""
+Multi-store deployments.
+
+Every deployment serves one store (STORE_ID) from a shared database. Stock,
+sales, checkpoints and forecasts carry a store_id (models.StoreScoped) and
+each ORM SELECT is limited to the current store (models.store.scope_to_store),
+so pages and the API only see their own store's rows, and single-store
+queries stay on the (store_id, ...) composite indexes however many stores
+are added. Medicines and categories are one catalogue shared by all stores.
+
+Core statements run on a connection and bulk UPDATE/DELETE are not filtered
+automatically; they add store_filter() themselves.
+
+Staff can look up which stores hold sellable stock of a medicine (one
+indexed query across all stores) and transfer units of a batch to another
+store, with a stock movement on each side in one transaction.
+
+Head office reports from StoreDailySales, one row per store and day, which
+is topped up incrementally by sale id (like the reorder cache) instead of
+re-reading raw sales:
+    flask stores summarize
+"""
+from datetime import date, datetime
+from sqlalchemy import case, func, select, true, update
+from sqlalchemy.orm import Session
+from app.main import db
+from app.models import (ArchivedSale, ArchivedSaleItem, Batch, DataVersion, Medicine, Sale, SaleItem,
+                        StockMovement, Store, StoreDailySales)
+from app.archive import archive_ready
+from app.serializers import BATCH_COLUMNS, batch_row
+from app.changes import record_change
+
+
+def store_filter(model, store_id=None):
+    """WHERE clause for the current store's rows, for statements not scoped automatically."""
+    if store_id is None:
+        store_id = Store.current_id()
+    return true() if store_id is None else model.store_id == store_id
+
+
+SUMMARY_FIELDS = ('sales', 'items', 'quantity', 'revenue', 'cost', 'profit')
+
+
+def _as_date(value):
+    """func.date() result (date or 'YYYY-MM-DD' on SQLite) as a date."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _daily_totals(sale, item, unit_cost, watermarks, until_id):
+    """
+    Grouped query of sales per store and day, for sales after each store's
+    watermark ({store_id: summarized_sale_id}) up to until_id. Cost and
+    profit only count items with a known unit cost, as in the reports.
+    """
+    line_total = item.quantity * item.price_at_sale
+    day = func.date(sale.sale_date)
+    return select(
+        sale.store_id, day,
+        func.count(func.distinct(sale.id)),
+        func.count(item.id),
+        func.sum(item.quantity),
+        func.sum(line_total),
+        func.sum(func.coalesce(unit_cost * item.quantity, 0)),
+        func.sum(case((unit_cost.is_not(None), line_total - unit_cost * item.quantity), else_=0)),
+    ).select_from(item).join(sale, item.sale_id == sale.id).where(
+        sale.id > min(watermarks.values()),
+        sale.id <= until_id,
+        sale.id > case(watermarks, value=sale.store_id, else_=until_id)
+    ).group_by(sale.store_id, day)
+
+
+def _new_sales(session, watermarks, until_id):
+    """Rows of _daily_totals for live and archived sales."""
+    unit_cost = case(
+        ((Batch.purchase_price != 0) & (Medicine.units_per_pack > 0),
+         Batch.purchase_price / Medicine.units_per_pack),
+        else_=None
+    )
+    live = _daily_totals(Sale, SaleItem, unit_cost, watermarks, until_id) \
+        .outerjoin(Batch, SaleItem.batch_id == Batch.id) \
+        .outerjoin(Medicine, Batch.medicine_id == Medicine.id)
+    rows = session.execute(live).all()
+    
+    if archive_ready():
+        # Archived sales keep their ids, so sales archived before they were summarized still count
+        with db.engines['archive'].connect() as conn:
+            rows += conn.execute(_daily_totals(
+                ArchivedSale, ArchivedSaleItem, ArchivedSaleItem.unit_cost, watermarks, until_id
+            )).all()
+    return rows
+
+
+def refresh_store_summaries():
+    """
+    Fold sales made since the last refresh into StoreDailySales.
+    Runs on the primary database in its own transaction; each store's
+    summarized_sale_id is moved on with a compare-and-set, so concurrent
+    refreshes never count a sale twice. Returns the number of sales added.
+    """
+    with Session(db.engine, info={'store_id': None}) as session:
+        until_id = session.execute(select(func.max(Sale.id))).scalar() or 0
+        if archive_ready():
+            with db.engines['archive'].connect() as conn:
+                until_id = max(until_id, conn.execute(select(func.max(ArchivedSale.id))).scalar() or 0)
+        
+        # Claim the range first: this also locks the store rows against concurrent refreshes
+        watermarks = {}
+        for store_id, summarized in session.execute(
+            select(Store.id, Store.summarized_sale_id).where(Store.summarized_sale_id < until_id)
+        ).all():
+            if session.execute(
+                update(Store).where(Store.id == store_id, Store.summarized_sale_id == summarized)
+                .values(summarized_sale_id=until_id)
+            ).rowcount:
+                watermarks[store_id] = summarized
+        if not watermarks:
+            return 0
+        
+        added = 0
+        for store_id, day, *totals in _new_sales(session, watermarks, until_id):
+            summary = session.get(StoreDailySales, (store_id, _as_date(day)))
+            if summary is None:
+                summary = StoreDailySales(store_id=store_id, day=_as_date(day),
+                                          **dict.fromkeys(SUMMARY_FIELDS, 0))
+                session.add(summary)
+            for field, value in zip(SUMMARY_FIELDS, totals):
+                setattr(summary, field, getattr(summary, field) + (value or 0))
+            added += totals[0]
+        session.commit()
+    return added
+
+
+def store_rollup(start_date, end_date):
+    """
+    Totals per store between two dates (inclusive) from StoreDailySales:
+    (rows sorted by store code, grand total). Refresh the summaries first.
+    """
+    columns = [func.coalesce(func.sum(getattr(StoreDailySales, field)), 0).label(field)
+               for field in SUMMARY_FIELDS]
+    rows = db.session.execute(
+        select(Store.id, Store.code, Store.name, *columns)
+        .outerjoin(StoreDailySales, (StoreDailySales.store_id == Store.id)
+                   & (StoreDailySales.day >= start_date) & (StoreDailySales.day <= end_date))
+        .group_by(Store.id, Store.code, Store.name).order_by(Store.code)
+    ).all()
+    rows = [row._asdict() for row in rows]
+    total = {field: sum(row[field] for row in rows) for field in SUMMARY_FIELDS}
+    return rows, total
+
+
+def add_store(code, name):
+    """Create a store. It has no sales yet, so its summaries start after the newest sale."""
+    newest = db.session.execute(select(func.max(Sale.id)).execution_options(all_stores=True)).scalar() or 0
+    store = Store(code=code, name=name, summarized_sale_id=newest)
+    db.session.add(store)
+    db.session.commit()
+    return store
+
+
+def stock_by_store(session, medicine_id, today=None):
+    """
+    Sellable stock of a medicine at every store, most stock first, each with
+    its batches soonest expiry first (FEFO). One query on the
+    (medicine_id, is_active, expiry_date) index.
+    """
+    today = today or datetime.now().date()
+    medicine = session.get(Medicine, medicine_id)
+    if medicine is None:
+        return None
+    
+    rows = session.execute(
+        select(Store.id, Store.code, Store.name, *BATCH_COLUMNS)
+        .select_from(Batch).join(Store, Batch.store_id == Store.id)
+        .where(
+            Batch.medicine_id == medicine_id,
+            Batch.is_active == True,
+            Batch.expiry_date >= today,
+            Batch.stock_quantity > 0
+        ).order_by(Batch.expiry_date, Batch.id)
+        .execution_options(all_stores=True)
+    ).all()
+    
+    stores = {}
+    for store_id, code, name, *batch in rows:
+        store = stores.setdefault(store_id, {'id': store_id, 'code': code, 'name': name,
+                                             'total_stock': 0, 'batches': []})
+        store['batches'].append(batch_row(batch, medicine.units_per_pack, today))
+        store['total_stock'] += store['batches'][-1]['stock_quantity']
+    
+    current = Store.current_id(session)
+    for store in stores.values():
+        store['current'] = store['id'] == current
+    return {
+        'medicine': {'id': medicine.id, 'name': medicine.name, 'units_per_pack': medicine.units_per_pack},
+        'stores': sorted(stores.values(), key=lambda s: (-s['total_stock'], s['code']))
+    }
+
+
+class TransferError(Exception):
+    """Transfer rejected (invalid quantity, unknown batch or store, not enough stock)."""
+
+
+def transfer_stock(session, batch_id, to_store_id, quantity):
+    """
+    Move units of one of the current store's batches to the same batch
+    (medicine and batch number) at another store, creating it there if
+    needed. The source is only decremented if it still holds the units, so
+    a concurrent sale cannot oversell it. Commits; returns a result dict.
+    """
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+        raise TransferError('Invalid quantity. Must be a positive whole number of units.')
+    
+    # Ids must be integers: session.get() takes a list as a composite key
+    if isinstance(batch_id, bool) or not isinstance(batch_id, int):
+        raise TransferError(f'Batch not found: {batch_id}')
+    if isinstance(to_store_id, bool) or not isinstance(to_store_id, int):
+        raise TransferError(f'Invalid destination store: {to_store_id}')
+    
+    store_id = Store.current_id(session)
+    source = session.get(Batch, batch_id)
+    if source is None or (store_id is not None and source.store_id != store_id):
+        raise TransferError(f'Batch not found: {batch_id}')
+    if session.get(Store, to_store_id) is None or to_store_id == source.store_id:
+        raise TransferError(f'Invalid destination store: {to_store_id}')
+    if not source.is_active or source.expiry_date < datetime.now().date():
+        raise TransferError('Expired or inactive batches cannot be transferred')
+    
+    try:
+        taken = session.execute(
+            update(Batch).where(Batch.id == source.id, Batch.stock_quantity >= quantity)
+            .values(stock_quantity=Batch.stock_quantity - quantity)
+        ).rowcount
+        if not taken:
+            raise TransferError(f'Insufficient stock. Available: {source.stock_quantity}')
+        
+        target = session.execute(
+            select(Batch).where(
+                Batch.store_id == to_store_id,
+                Batch.medicine_id == source.medicine_id,
+                Batch.batch_number == source.batch_number
+            ).execution_options(all_stores=True)
+        ).scalar_one_or_none()
+        created = target is None
+        if created:
+            target = Batch(store_id=to_store_id, medicine_id=source.medicine_id, batch_number=source.batch_number,
+                           expiry_date=source.expiry_date, purchase_price=source.purchase_price, mrp=source.mrp,
+                           stock_quantity=quantity, is_active=True)
+            session.add(target)
+            session.flush()
+        else:
+            session.execute(
+                update(Batch).where(Batch.id == target.id)
+                .values(stock_quantity=Batch.stock_quantity + quantity, is_active=True)
+            )
+        
+        session.add_all([
+            StockMovement(batch_id=source.id, kind='transfer', quantity=-quantity),
+            StockMovement(batch_id=target.id, kind='transfer', quantity=quantity),
+        ])
+        DataVersion.bump(session, 'inventory')
+        # Reload both batches: the updates above bypassed the loaded objects
+        session.execute(
+            select(Batch).where(Batch.id.in_([source.id, target.id]))
+            .execution_options(all_stores=True, populate_existing=True)
+        ).scalars().all()
+        record_change(session, 'updated', source)
+        record_change(session, 'created' if created else 'updated', target)
+        result = {'success': True, 'from_batch_id': source.id, 'to_batch_id': target.id,
+                  'to_store_id': to_store_id, 'quantity': quantity}
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return result
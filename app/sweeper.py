@@ -0,0 +1,82 @@
+"""
+Batch lifecycle sweeper.
+
+Deactivates expired and empty batches with set-based updates so queries on
+is_active only see sellable stock. Expired stock is written off to the
+WriteOff and stock movement ledgers, and each swept batch to the change
+feed, in the same transaction. On SQLite it also refreshes the query
+planner statistics, without which lookups of a medicine's batches fall back
+to scanning the store's batches by expiry. Meant to run nightly from cron:
+    flask batches sweep
+"""
+from datetime import datetime
+from sqlalchemy import func, insert, literal, select, text, update
+from app.main import db
+from app.models import Batch, DataVersion, Medicine, StockMovement, WriteOff
+from app.stores import store_filter
+from app.changes import record_change
+
+
+def sweep_batches(today=None, dry_run=False):
+    """
+    Deactivate expired and empty batches.
+    Returns a dict with counts of expired/empty batches, units and value written off.
+    """
+    now = datetime.now()
+    today = today or now.date()
+    
+    # Bulk statements are not scoped automatically
+    store = store_filter(Batch)
+    expired = store & (Batch.is_active == True) & (Batch.expiry_date < today) & (Batch.stock_quantity > 0)
+    empty = store & (Batch.is_active == True) & (Batch.stock_quantity <= 0)
+    value = Batch.stock_quantity * Batch.unit_cost_expr()
+    
+    expired_count, units, value_lost = db.session.execute(
+        select(func.count(Batch.id), func.sum(Batch.stock_quantity), func.sum(value))
+        .join(Medicine, Batch.medicine_id == Medicine.id).where(expired)
+    ).one()
+    empty_count = db.session.execute(select(func.count(Batch.id)).where(empty)).scalar()
+    
+    result = {
+        'expired': expired_count,
+        'empty': empty_count,
+        'units': units or 0,
+        'value': value_lost or 0,
+    }
+    if dry_run:
+        return result
+    
+    try:
+        # Loaded up front (by the same predicate, not a list of ids) so the
+        # updates below bring them up to date for the change feed
+        batches = db.session.execute(select(Batch).where(expired | empty)).scalars().all()
+        
+        # Ledgers first (need current stock), then clear and deactivate
+        db.session.execute(insert(WriteOff).from_select(
+            ['batch_id', 'quantity', 'value', 'reason', 'created_at'],
+            select(Batch.id, Batch.stock_quantity, value, literal('expired'), literal(now))
+            .join(Medicine, Batch.medicine_id == Medicine.id).where(expired)
+        ))
+        db.session.execute(insert(StockMovement).from_select(
+            ['batch_id', 'kind', 'quantity', 'created_at'],
+            select(Batch.id, literal('write_off'), -Batch.stock_quantity, literal(now)).where(expired)
+        ))
+        db.session.execute(
+            update(Batch).where(expired).values(is_active=False, stock_quantity=0)
+            .execution_options(synchronize_session='fetch')
+        )
+        db.session.execute(
+            update(Batch).where(empty).values(is_active=False)
+            .execution_options(synchronize_session='fetch')
+        )
+        DataVersion.bump(db.session, 'inventory')
+        record_change(db.session, 'updated', *batches)
+        if db.engine.url.get_backend_name() == 'sqlite':
+            # ANALYZE the tables this connection queried, if their statistics are missing or stale
+            db.session.execute(text('PRAGMA optimize'))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return result
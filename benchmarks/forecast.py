@@ -0,0 +1,54 @@
+"""
+Benchmark: nightly demand forecast over a large catalogue.
+Generates a year of sales in a scratch SQLite file, then times building the
+medicine x day matrix, fitting every series and storing the forecasts.
+Run with: python -m benchmarks.forecast --medicines 20000 --sales-per-day 300
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app.main import create_app, db
+from benchmarks.report_aggregation import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--medicines', type=int, default=20000)
+    parser.add_argument('--sales-per-day', type=int, default=300)
+    parser.add_argument('--history-days', type=int, default=364)
+    parser.add_argument('--snapshot', action='store_true', help='Read history from the columnar snapshot')
+    args = parser.parse_args()
+
+    from app.forecast import demand_matrix, fit, run_forecast
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'ANALYTICS_SNAPSHOT_DIR': os.path.join(tmp, 'snapshot') if args.snapshot else None,
+        })
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            _, _, sales, items = generate(1, args.sales_per_day, args.medicines)
+            print(f'Generated {sales:,} sales / {items:,} items for {args.medicines:,} medicines '
+                  f'in {time.perf_counter() - started:.1f}s\n')
+
+            end = datetime.now().date() - timedelta(days=1)
+            start = end - timedelta(days=args.history_days - 1)
+            started = time.perf_counter()
+            _, history = demand_matrix(start, end)
+            print(f'{"matrix":>8} {time.perf_counter() - started:>8.2f}s  {history.shape[0]:,} x {history.shape[1]} days')
+
+            started = time.perf_counter()
+            fit(history, start.weekday())
+            print(f'{"fit":>8} {time.perf_counter() - started:>8.2f}s')
+
+            started = time.perf_counter()
+            run_forecast(history_days=args.history_days)
+            print(f'{"total":>8} {time.perf_counter() - started:>8.2f}s  (matrix, fit and store)')
+
+
+if __name__ == '__main__':
+    main()
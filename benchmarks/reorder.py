@@ -0,0 +1,67 @@
+"""
+Benchmark: reorder suggestions over a large catalogue.
+Generates recent sales for many medicines in a scratch SQLite file, then
+times the first (cold) suggestions pass and later passes that only fold in
+newly added sales.
+Run with: python -m benchmarks.reorder --medicines 20000 --sales-per-day 300
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from app.main import create_app, db
+from app.models import Sale, SaleItem
+from benchmarks.report_aggregation import best_of, generate
+
+
+def add_sales(count, medicine_count, seed=7):
+    """Append a few of today's sales, as the counter would between page loads."""
+    rnd = random.Random(seed)
+    sale_id = db.session.execute(db.select(db.func.max(Sale.id))).scalar()
+    item_id = db.session.execute(db.select(db.func.max(SaleItem.id))).scalar()
+    sales, items = [], []
+    for _ in range(count):
+        sale_id += 1
+        item_id += 1
+        sales.append({'id': sale_id, 'total_amount': 10, 'sale_date': datetime.now()})
+        items.append({'id': item_id, 'sale_id': sale_id, 'batch_id': rnd.randint(1, medicine_count),
+                      'quantity': 1, 'price_at_sale': 10})
+    db.session.execute(Sale.__table__.insert(), sales)
+    db.session.execute(SaleItem.__table__.insert(), items)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--medicines', type=int, default=20000)
+    parser.add_argument('--sales-per-day', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app.reorder import ReorderEngine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            _, _, sales, items = generate(1, args.sales_per_day, args.medicines)
+            print(f'Generated {sales:,} sales / {items:,} items for {args.medicines:,} medicines '
+                  f'in {time.perf_counter() - started:.1f}s\n')
+
+            engine = ReorderEngine()
+            started = time.perf_counter()
+            rows = engine.suggestions()
+            print(f'{"cold":>12} {time.perf_counter() - started:>8.3f}s  '
+                  f'({sum(1 for r in rows if r["suggested"])} due of {len(rows):,})')
+
+            def incremental():
+                add_sales(20, args.medicines)
+                engine.suggestions()
+            print(f'{"incremental":>12} {best_of(incremental, args.repeat):>8.3f}s  (20 new sales, incl. inserting them)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: report aggregation speedup vs. worker count.
+Generates a multi-year sales history in a scratch SQLite file, then times
+aggregate_sales() over the whole range for each worker count (and, with
+--snapshot, the columnar analytics snapshot).
+Run with: python -m benchmarks.report_aggregation --years 4 --sales-per-day 300
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app.main import create_app, db
+from app.models import Category, Medicine, Batch, Sale, SaleItem
+
+
+def generate(years, sales_per_day, medicine_count, seed=42):
+    """Bulk-insert a synthetic history ending today."""
+    rnd = random.Random(seed)
+    today = datetime.now().date()
+    start = today - timedelta(days=365 * years)
+
+    db.session.execute(Category.__table__.insert(), [
+        {'id': i, 'name': f'Category {i}'} for i in range(1, 9)
+    ])
+    db.session.execute(Medicine.__table__.insert(), [
+        {'id': i, 'name': f'Medicine {i}', 'category_id': i % 8 + 1,
+         'units_per_pack': rnd.choice([1, 10, 15]), 'min_stock_level': 10, 'is_active': True}
+        for i in range(1, medicine_count + 1)
+    ])
+    db.session.execute(Batch.__table__.insert(), [
+        {'id': i, 'medicine_id': i, 'batch_number': f'B{i}', 'expiry_date': today + timedelta(days=365),
+         'purchase_price': 40 + i % 60, 'mrp': 60 + i % 80, 'stock_quantity': 1000, 'is_active': True}
+        for i in range(1, medicine_count + 1)
+    ])
+
+    sale_id = 0
+    item_id = 0
+    day = start
+    while day <= today:
+        sales, items = [], []
+        for _ in range(sales_per_day):
+            sale_id += 1
+            total = 0
+            for _ in range(rnd.randint(1, 4)):
+                item_id += 1
+                quantity = rnd.randint(1, 20)
+                price = round(rnd.uniform(1, 15), 2)
+                total += quantity * price
+                items.append({'id': item_id, 'sale_id': sale_id, 'batch_id': rnd.randint(1, medicine_count),
+                              'quantity': quantity, 'price_at_sale': price})
+            sales.append({'id': sale_id, 'total_amount': total,
+                          'sale_date': datetime.combine(day, datetime.min.time()) + timedelta(minutes=rnd.randint(480, 1320))})
+        db.session.execute(Sale.__table__.insert(), sales)
+        db.session.execute(SaleItem.__table__.insert(), items)
+        day += timedelta(days=1)
+    db.session.commit()
+    return start, today, sale_id, item_id
+
+
+def best_of(fn, repeat):
+    """Best wall time of several runs."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--sales-per-day', type=int, default=300)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--chunk-days', type=int, default=90)
+    parser.add_argument('--group-by', default='category', choices=['day', 'medicine', 'category'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--snapshot', action='store_true', help='Also time the NumPy columnar snapshot')
+    args = parser.parse_args()
+
+    from app.routes.reports import aggregate_sales
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'REPORT_CHUNK_DAYS': args.chunk_days,
+        })
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            start, end, sales, items = generate(args.years, args.sales_per_day, args.medicines)
+            print(f'Generated {sales:,} sales / {items:,} items over {args.years} years '
+                  f'in {time.perf_counter() - started:.1f}s')
+            print(f'Grouping by {args.group_by}, {args.chunk_days}-day chunks, best of {args.repeat}\n')
+            print(f'{"workers":>8} {"seconds":>10} {"speedup":>9}')
+
+            baseline = None
+            reference = None
+            for workers in [int(w) for w in args.workers.split(',')]:
+                aggregate_sales(start, end, args.group_by, workers=workers)  # warm up pool
+                elapsed = best_of(lambda: aggregate_sales(start, end, args.group_by, workers=workers), args.repeat)
+                result = aggregate_sales(start, end, args.group_by, workers=workers)
+                if reference is None:
+                    reference = result
+                assert [r['key'] for r in result] == [r['key'] for r in reference]
+                baseline = baseline or elapsed
+                print(f'{workers:>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x')
+
+            if args.snapshot:
+                from app.analytics import SalesSnapshot
+                snapshot = SalesSnapshot(os.path.join(tmp, 'snapshot'))
+                started = time.perf_counter()
+                snapshot.refresh()
+                print(f'\nSnapshot built in {time.perf_counter() - started:.1f}s ({snapshot.rows:,} rows)')
+                elapsed = best_of(lambda: snapshot.aggregate(start, end, args.group_by), args.repeat)
+                print(f'{"snapshot":>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: worker cold start.
+Starts fresh interpreters and times importing the app, create_app() and the
+first request, with every blueprint loaded at startup (eager) and with
+LAZY_BLUEPRINTS (reports and categories imported on the first request).
+Run with: python -m benchmarks.startup --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs in a fresh interpreter; prints its timings as JSON
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app.main import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+modules = len(sys.modules)
+response = app.test_client().get(sys.argv[1])
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'modules': modules}))
+'''
+
+
+def cold_start(env, path):
+    """Timings of one fresh worker."""
+    output = subprocess.run([sys.executable, '-c', CHILD, path], env=env, check=True,
+                            capture_output=True, text=True, cwd=os.getcwd()).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--path', default='/medicines/', help='URL of the first request')
+    args = parser.parse_args()
+
+    from app.main import create_app, db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        archive_url = 'sqlite:///' + os.path.join(tmp, 'archive.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'SQLALCHEMY_BINDS': {'archive': archive_url},
+                          'TEMPLATE_CACHE_DIR': ''})
+        with app.app_context():
+            db.create_all()
+
+        modes = {'eager': '', 'lazy': '1'}
+        envs = {mode: dict(os.environ, DATABASE_URL=database_url, ARCHIVE_DATABASE_URL=archive_url,
+                           TEMPLATE_CACHE_DIR=os.path.join(tmp, 'jinja_cache'), LAZY_BLUEPRINTS=lazy)
+                for mode, lazy in modes.items()}
+        cold_start(envs['eager'], args.path)  # Fill the template bytecode cache
+
+        # Alternate the modes so machine noise affects both alike
+        runs = {mode: [] for mode in modes}
+        for _ in range(args.repeat):
+            for mode in modes:
+                runs[mode].append(cold_start(envs[mode], args.path))
+
+        print(f'{"mode":>8} {"import":>9} {"create_app":>11} {"1st request":>12} {"total":>9} {"modules":>8}')
+        for mode in modes:
+            median = {key: statistics.median(run[key] for run in runs[mode]) for key in runs[mode][0]}
+            total = median['import'] + median['create_app'] + median['first_request']
+            print(f'{mode:>8} {median["import"] * 1000:>7.1f}ms {median["create_app"] * 1000:>9.1f}ms '
+                  f'{median["first_request"] * 1000:>10.1f}ms {total * 1000:>7.1f}ms {median["modules"]:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
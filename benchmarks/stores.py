@@ -0,0 +1,107 @@
+"""
+Benchmark: single-store queries as stores are added.
+Generates one store's history in a scratch SQLite file and times the
+queries a store runs all day, then copies that history to more stores
+(same size each) and times the same queries for the first store again.
+Also times the head-office rollup: summarizing all stores from scratch and
+reading a year of per-store totals.
+Run with: python -m benchmarks.stores --stores 12 --years 1 --sales-per-day 300
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, literal, select, text
+from app.main import create_app, db
+from app.models import Batch, Sale, SaleItem, Store
+from benchmarks.report_aggregation import best_of, generate
+
+
+def copy_store(store_id, offsets):
+    """Copy store 1's batches, sales and sale items to another store (new ids)."""
+    batch_offset, sale_offset, item_offset = (offset * (store_id - 1) for offset in offsets)
+    db.session.add(Store(id=store_id, code=f'S{store_id}', name=f'Store {store_id}'))
+    columns = ['medicine_id', 'batch_number', 'expiry_date', 'purchase_price', 'mrp', 'stock_quantity', 'is_active']
+    db.session.execute(insert(Batch).from_select(
+        ['id', 'store_id', *columns],
+        select(Batch.id + batch_offset, literal(store_id), *(getattr(Batch, c) for c in columns))
+        .where(Batch.store_id == 1)
+    ))
+    db.session.execute(insert(Sale).from_select(
+        ['id', 'store_id', 'sale_date', 'total_amount'],
+        select(Sale.id + sale_offset, literal(store_id), Sale.sale_date, Sale.total_amount).where(Sale.store_id == 1)
+    ))
+    db.session.execute(insert(SaleItem).from_select(
+        ['id', 'sale_id', 'batch_id', 'quantity', 'price_at_sale'],
+        select(SaleItem.id + item_offset, SaleItem.sale_id + sale_offset, SaleItem.batch_id + batch_offset,
+               SaleItem.quantity, SaleItem.price_at_sale)
+        .join(Sale, SaleItem.sale_id == Sale.id).where(Sale.store_id == 1)
+    ))
+    db.session.commit()
+
+
+def time_store_queries(app, repeat):
+    """Best times of store 1's everyday queries."""
+    from app.checkout import search_medicines
+    from app.reorder import ReorderEngine
+    from app.routes.reports import aggregate_sales
+    from app.sweeper import sweep_batches
+
+    today = datetime.now().date()
+    with app.test_request_context():
+        return {
+            'search': best_of(lambda: search_medicines(db.session, 'Medicine 12'), repeat),
+            'month report': best_of(lambda: aggregate_sales(today.replace(day=1), today, workers=1), repeat),
+            'reorder (cold)': best_of(lambda: ReorderEngine().suggestions(), repeat),
+            'sweep (dry run)': best_of(lambda: sweep_batches(dry_run=True), repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', type=int, default=12)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--sales-per-day', type=int, default=300)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app.stores import refresh_store_summaries, store_rollup
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+                          'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(tmp, 'archive.db')},
+                          'TEMPLATE_CACHE_DIR': '', 'STORE_ID': 1})
+        with app.app_context():
+            db.create_all()
+            db.session.add(Store(id=1, code='S1', name='Store 1'))
+            started = time.perf_counter()
+            _, _, sales, items = generate(args.years, args.sales_per_day, args.medicines)
+            print(f'Generated {sales:,} sales / {items:,} items per store in {time.perf_counter() - started:.1f}s\n')
+            db.session.execute(text('ANALYZE'))  # Same planner statistics as after copying
+
+            single = time_store_queries(app, args.repeat)
+
+            started = time.perf_counter()
+            for store_id in range(2, args.stores + 1):
+                copy_store(store_id, (args.medicines, sales, items))
+            db.session.execute(text('ANALYZE'))
+            print(f'Copied to {args.stores - 1} more stores in {time.perf_counter() - started:.1f}s\n')
+
+            many = time_store_queries(app, args.repeat)
+
+            print(f'{"store 1 query":>16} {"1 store":>9} {f"{args.stores} stores":>10}')
+            for name in single:
+                print(f'{name:>16} {single[name]:>8.3f}s {many[name]:>9.3f}s')
+
+            started = time.perf_counter()
+            summarized = refresh_store_summaries()
+            print(f'\nSummarized {summarized:,} sales of {args.stores} stores in {time.perf_counter() - started:.2f}s')
+            today = datetime.now().date()
+            rollup = best_of(lambda: store_rollup(today - timedelta(days=365), today), args.repeat)
+            print(f'Rollup of a year across {args.stores} stores: {rollup * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
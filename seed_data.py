@@ -4,10 +4,23 @@ Run with: FLASK_APP=run.py uv run python seed_data.py
 """
 from datetime import datetime, timedelta
 from app.main import create_app, db
-from app.models import Category, Medicine, Batch, Sale, SaleItem
+from app.models import Category, Medicine, Batch, Sale, SaleItem, StockMovement, Store
+from app.models import (ChangeEvent, DataVersion, DemandForecast, IdempotencyKey, StockCheckpoint,
+                        StockSnapshot, StoreDailySales, WriteOff)
+from app.models.store import DEFAULT_STORE_ID
 
 app = create_app()
 
+def seed_store():
+    """Add the store this deployment serves (STORE_ID) if missing."""
+    store_id = app.config.get('STORE_ID') or DEFAULT_STORE_ID
+    if db.session.get(Store, store_id) is None:
+        if store_id == DEFAULT_STORE_ID:
+            db.session.add(Store(id=store_id, code='MAIN', name='Main Store'))
+        else:
+            db.session.add(Store(id=store_id, code=f'STORE{store_id}', name=f'Store {store_id}'))
+        db.session.commit()
+
 def seed_categories():
     """Add medicine categories."""
     categories = [
@@ -126,6 +139,11 @@ def seed_batches(medicines):
     batches.append(expired_batch)
     
     db.session.add_all(batches)
+    
+    # Opening stock in the movement ledger
+    db.session.add_all([
+        StockMovement(batch=b, kind='receipt', quantity=b.stock_quantity) for b in batches
+    ])
     db.session.commit()
     print(f"✅ Added {len(batches)} batches")
     return batches
@@ -186,6 +204,10 @@ def seed_all():
     with app.app_context():
         # Clear existing data
         print("\n🗑️  Clearing existing data...")
+        # Rows that point at batches and sales first
+        for model in (StockSnapshot, StockCheckpoint, StockMovement, WriteOff, IdempotencyKey,
+                      ChangeEvent, StoreDailySales, DemandForecast, DataVersion):
+            model.query.delete()
         SaleItem.query.delete()
         Sale.query.delete()
         Batch.query.delete()
@@ -196,6 +218,7 @@ def seed_all():
         print("\n📦 Seeding database with dummy data...")
         print("─" * 50)
         
+        seed_store()
         categories = seed_categories()
         medicines = seed_medicines(categories)
         batches = seed_batches(medicines)
@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import event
+from app.checkout import checkout
+from app.main import create_app, db as _db
+from app.models import Batch, Category, Medicine, Store
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'SQLALCHEMY_BINDS': {'archive': f'sqlite:///{tmp_path / "archive.db"}'},
+        'TEMPLATE_CACHE_DIR': '',
+        'STORE_ID': 1,
+    })
+    with app.app_context():
+        _db.create_all(bind_key=[None, 'archive'])  # db keeps the replica bind key of earlier test apps
+        _db.session.add_all([
+            Store(id=1, code='MAIN', name='Main Store'),
+            Store(id=2, code='CITY', name='City Centre'),
+            Category(id=1, name='Tablets'),
+        ])
+        _db.session.commit()
+        yield app
+        _db.session.remove()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def medicine(db):
+    """Create an active medicine."""
+    def make(name='Crocin 500', generic_name='Paracetamol', units_per_pack=10, category_id=1, **fields):
+        medicine = Medicine(name=name, generic_name=generic_name, category_id=category_id,
+                            units_per_pack=units_per_pack, **fields)
+        db.session.add(medicine)
+        db.session.commit()
+        return medicine
+    return make
+
+
+@pytest.fixture
+def batch(db):
+    """Create an active batch of a medicine (store 1 unless given)."""
+    def make(medicine, stock=100, batch_number='B1', expires_in=365, mrp=50.0, store_id=1, **fields):
+        batch = Batch(medicine_id=medicine.id, batch_number=batch_number, stock_quantity=stock,
+                      expiry_date=date.today() + timedelta(days=expires_in), mrp=mrp,
+                      purchase_price=mrp * 0.7, store_id=store_id, **fields)
+        db.session.add(batch)
+        db.session.commit()
+        return batch
+    return make
+
+
+@pytest.fixture
+def cart():
+    """Checkout payload from (batch id, quantity) pairs at one unit price."""
+    def make(*items, unit_price=5.0, **fields):
+        return {**fields, 'items': [{'batch_id': batch_id, 'quantity': quantity, 'unit_price': unit_price}
+                                    for batch_id, quantity in items]}
+    return make
+
+
+@pytest.fixture
+def sell(db, cart):
+    """Check out a cart (this store's session unless given) that must go through."""
+    def make(*items, session=None, **fields):
+        body, status = checkout(session or db.session, cart(*items, **fields))
+        assert status == 200, body
+        return body
+    return make
+
+
+@pytest.fixture
+def statements(db):
+    """Context manager collecting the SQL statements run inside its block."""
+    @contextmanager
+    def record():
+        seen = []
+        
+        def collect(conn, cursor, statement, parameters, context, executemany):
+            seen.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', collect)
+        try:
+            yield seen
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', collect)
+    return record
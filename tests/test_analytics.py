@@ -0,0 +1,25 @@
+from datetime import date
+import pytest
+from app.analytics import SalesSnapshot
+
+
+def test_snapshot_refresh_appends_and_swaps_columns(db, tmp_path, medicine, batch, sell):
+    stock = batch(medicine(), stock=100, mrp=50.0)
+    snapshot = SalesSnapshot(str(tmp_path / 'snapshot'))
+    sell((stock.id, 10))
+    assert snapshot.refresh() == 1
+    
+    before = snapshot.columns
+    sell((stock.id, 4))
+    assert snapshot.refresh() == 1
+    
+    assert len(before['item_id']) == 1  # Readers holding the old columns are unaffected
+    [row] = snapshot.aggregate(date.today(), date.today(), group_by='medicine')
+    assert row['key'] == stock.medicine_id and row['name'] == 'Crocin 500'
+    assert (row['quantity'], row['transactions'], row['sales']) == (14, 2, 2)
+    assert row['revenue'] == pytest.approx(70.0)
+    assert row['cost'] == pytest.approx(14 * 35.0 / 10)
+    
+    # A second process opening the same directory maps what was written
+    assert SalesSnapshot(str(tmp_path / 'snapshot')).aggregate(date.today(), date.today()) == \
+        snapshot.aggregate(date.today(), date.today())
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select, update
+from app.archive import archive_sales
+from app.checkout import checkout
+from app.models import ArchivedSale, ArchivedSaleItem, IdempotencyKey, Sale
+
+
+def test_old_sales_move_to_the_archive_intact(db, client, medicine, batch):
+    stock = batch(medicine(units_per_pack=10), mrp=50.0)
+    sale_ids = []
+    for quantity in (1, 2, 3):
+        body, status = checkout(db.session, {'items': [
+            {'batch_id': stock.id, 'quantity': quantity, 'unit_price': 5.0},
+            {'is_unlisted': True, 'name': 'Cotton', 'quantity': 1, 'unit_price': 20.0},
+        ]}, idempotency_key=f'key-{quantity}')
+        sale_ids.append(body['sale_id'])
+    db.session.execute(update(Sale).values(sale_date=datetime.now() - timedelta(days=200)))
+    db.session.commit()
+    
+    assert archive_sales(older_than_days=90, chunk_size=1) == 2
+    assert archive_sales(older_than_days=90) == 0  # Safe to re-run
+    
+    # The newest sale stays, so its id is never handed out again
+    assert db.session.execute(select(Sale.id)).scalars().all() == sale_ids[2:]
+    assert db.session.execute(select(IdempotencyKey.key)).scalars().all() == ['key-3']
+    archived = db.session.get(ArchivedSale, sale_ids[1])
+    assert archived.total_amount == 30.0
+    assert [(i.medicine_name, i.batch_number, i.quantity, i.unit_cost) for i in archived.items] == [
+        ('Crocin 500', 'B1', 2, pytest.approx(3.5)), ('Cotton', None, 1, None)]
+    assert db.session.execute(select(func.count(ArchivedSaleItem.id))).scalar() == 4
+    
+    response = client.get(f'/sales/{sale_ids[0]}')
+    assert response.status_code == 200 and b'Crocin 500' in response.data
@@ -0,0 +1,67 @@
+import gzip
+import logging
+import os
+import pytest
+from app import assets
+from app.assets import asset_url, missing_assets
+from app.main import create_app
+
+CSS = b'.bi::before { content: ""; } @font-face { src: url("fonts/bootstrap-icons.woff2"); }'
+
+
+@pytest.fixture
+def vendor_dir(tmp_path, monkeypatch):
+    """An empty VENDOR_DIR; write() vendors a file into it."""
+    monkeypatch.setattr('app.assets.VENDOR_DIR', str(tmp_path / 'vendor'))
+    monkeypatch.setattr('app.assets._digests', {})
+    
+    def write(path, data):
+        target = tmp_path / 'vendor' / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    return write
+
+
+def test_unvendored_assets_come_from_the_cdn(app, vendor_dir, caplog):
+    with app.test_request_context():
+        assert asset_url('bootstrap-icons.css') == assets.CDN + 'bootstrap-icons@1.10.0/font/bootstrap-icons.css'
+    assert missing_assets() == list(assets.ASSETS)
+    
+    with caplog.at_level(logging.WARNING):
+        create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TEMPLATE_CACHE_DIR': ''})
+    assert 'Frontend assets not vendored' in caplog.text
+    assert 'flask assets vendor' in caplog.text
+
+
+def test_vendored_asset_is_served_under_its_digest(app, client, vendor_dir):
+    vendor_dir('bootstrap-icons/bootstrap-icons.css', CSS)
+    vendor_dir('bootstrap-icons/bootstrap-icons.css.gz', gzip.compress(CSS))
+    vendor_dir('bootstrap-icons/fonts/bootstrap-icons.woff2', b'wOF2')
+    with app.test_request_context():
+        url = asset_url('bootstrap-icons.css')
+    assert 'bootstrap-icons.css' not in missing_assets()
+    
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == CSS
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == assets.MAX_AGE
+    
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'text/css'
+    assert gzip.decompress(compressed.data) == CSS
+    
+    # The font is loaded relative to the stylesheet, under its digest
+    font = client.get(os.path.dirname(url) + '/fonts/bootstrap-icons.woff2')
+    assert font.status_code == 200
+    assert font.data == b'wOF2'
+
+
+def test_outdated_digest_is_not_served(client, vendor_dir):
+    vendor_dir('bootstrap-icons/bootstrap-icons.css', CSS)
+    vendor_dir('bootstrap-icons/fonts/bootstrap-icons.woff2', b'wOF2')
+    
+    assert client.get('/assets/0123456789ab/bootstrap-icons/bootstrap-icons.css').status_code == 404
+    assert client.get('/assets/0123456789ab/bootstrap-icons/fonts/bootstrap-icons.woff2').status_code == 404
+    assert client.get('/assets/0123456789ab/../app.db').status_code == 404
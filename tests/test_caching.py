@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from flask import g
+from app.models import DataVersion
+
+
+def bump(db, *scopes):
+    """A write made outside a request (requests here share one app context)."""
+    DataVersion.bump(db.session, *scopes)
+    db.session.commit()
+    g.pop('data_versions', None)
+
+
+def test_unchanged_data_is_answered_304(db, client, medicine, batch):
+    batch(medicine())
+    url = '/api/medicines/search?q=Cro'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    
+    again = client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.data == b''
+    
+    # Another URL has its own tag
+    assert client.get('/api/medicines/search?q=Crocin', headers={'If-None-Match': etag}).status_code == 200
+    
+    bump(db, 'inventory')
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()[0]['name'] == 'Crocin 500'
+
+
+def test_only_the_views_scopes_change_its_tag(db, client):
+    etag = client.get('/reports/stock').headers['ETag']
+    
+    bump(db, 'forecasts')
+    assert client.get('/reports/stock', headers={'If-None-Match': etag}).status_code == 304
+    
+    bump(db, 'sales')
+    assert client.get('/reports/stock', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_pending_flash_messages_are_rendered(client):
+    etag = client.get('/reports/stock').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Batch saved')]
+    
+    response = client.get('/reports/stock', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert 'Batch saved' in response.get_data(as_text=True)
+    assert client.get('/reports/stock', headers={'If-None-Match': etag}).status_code == 304
+
+
+def fragment(app, source):
+    """Template rendering {% cache %} blocks, with a counter of real renders."""
+    renders = []
+    
+    def render(**context):
+        with app.test_request_context():
+            return template.render(count=lambda: renders.append(1) or len(renders), **context)
+    template = app.jinja_env.from_string(source)
+    return render, renders
+
+
+def test_fragments_are_rendered_once_per_key(app):
+    render, renders = fragment(app, "{% cache 'list', page %}{{ page }}:{{ count() }}{% endcache %}")
+    
+    assert [render(page=1), render(page=1), render(page=2), render(page=1)] == ['1:1', '1:1', '2:2', '1:1']
+    assert len(renders) == 2
+
+
+def test_least_recently_used_fragments_are_dropped(app):
+    app.config['FRAGMENT_CACHE_SIZE'] = 2
+    render, renders = fragment(app, "{% cache 'list', page %}{{ count() }}{% endcache %}")
+    
+    render(page=1), render(page=2), render(page=1), render(page=3)  # Drops page 2
+    
+    assert render(page=1) == '1'
+    assert render(page=2) == '4'
+
+
+def test_fragments_follow_data_versions_and_the_date(app, db, monkeypatch):
+    render, renders = fragment(app, "{% cache 'stock', data_versions('inventory') %}{{ count() }}{% endcache %}")
+    assert render() == render() == '1'
+    
+    bump(db, 'sales')
+    assert render() == '1'
+    bump(db, 'inventory')
+    assert render() == '2'
+    
+    class Tomorrow(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=1)
+    monkeypatch.setattr('app.caching.datetime', Tomorrow)
+    assert render() == '3'
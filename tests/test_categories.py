@@ -0,0 +1,35 @@
+import pytest
+from app.models import Category
+
+
+@pytest.fixture
+def catalogue(db, medicine, batch):
+    db.session.add(Category(id=2, name='Syrups'))
+    db.session.commit()
+    batch(medicine('Crocin 500', min_stock_level=10), stock=100)  # 100 units at 3.5
+    batch(medicine('Dolo 650', min_stock_level=10), stock=5, mrp=30.0)  # Low: 5 units at 2.1
+    batch(medicine('Calpol 250', is_active=False), stock=40)
+
+
+def test_categories_are_counted_in_one_query(client, catalogue, statements):
+    rows = Category.list_with_counts()
+    
+    assert [(r['category'].name, r['medicines'], r['active'], r['low_stock']) for r in rows] == [
+        ('Syrups', 0, 0, 0), ('Tablets', 3, 2, 1)]
+    assert rows[0]['stock_value'] == 0
+    assert rows[1]['stock_value'] == pytest.approx(100 * 3.5 + 5 * 2.1 + 40 * 3.5)
+    
+    with statements() as seen:
+        page = client.get('/categories/').get_data(as_text=True)
+    assert '₹500.50' in page
+    assert len([s for s in seen if 'medicines' in s]) == 1, seen
+
+
+def test_only_unused_categories_are_deleted(db, client, catalogue):
+    response = client.post('/categories/1/delete', follow_redirects=True)
+    assert 'Cannot delete &#34;Tablets&#34; - it has 3 medicine(s) assigned.' in response.get_data(as_text=True)
+    assert db.session.get(Category, 1) is not None
+    
+    response = client.post('/categories/2/delete', follow_redirects=True)
+    assert 'Category &#34;Syrups&#34; has been deleted.' in response.get_data(as_text=True)
+    assert db.session.get(Category, 2) is None
@@ -0,0 +1,70 @@
+import time
+from datetime import date
+from app.changes import read_changes, record_change
+from app.models import Batch
+from app.sweeper import sweep_batches
+
+
+def feed(client, **params):
+    response = client.get('/api/changes', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_feed_pages_through_events_in_order(db, client, medicine, batch, sell):
+    paracetamol = medicine()
+    record_change(db.session, 'created', paracetamol)
+    stock = batch(paracetamol, stock=10)
+    record_change(db.session, 'created', stock)
+    db.session.commit()
+    sell((stock.id, 4))
+    
+    first = feed(client, since=0, limit=2)
+    assert [(e['entity'], e['action']) for e in first['events']] == [('medicine', 'created'), ('batch', 'created')]
+    assert first['more']
+    
+    rest = feed(client, since=first['next'])
+    assert [(e['entity'], e['action']) for e in rest['events']] == [('sale', 'created'), ('batch', 'updated')]
+    assert rest['events'][1]['data']['stock_quantity'] == 6
+    assert not rest['more']
+    assert feed(client, since=rest['next'])['events'] == []
+
+
+def test_store_sees_its_own_events_and_the_catalogue(db, client, medicine, batch):
+    paracetamol = medicine()
+    here, there = batch(paracetamol, batch_number='B1'), batch(paracetamol, batch_number='C1', store_id=2)
+    record_change(db.session, 'created', paracetamol, here, there)
+    db.session.commit()
+    
+    events = feed(client)['events']
+    assert [(e['entity'], e['store_id']) for e in events] == [('medicine', None), ('batch', 1)]
+    
+    events = feed(client, stores='all')['events']
+    assert [(e['entity'], e['store_id']) for e in events] == [('medicine', None), ('batch', 1), ('batch', 2)]
+
+
+def test_long_poll_returns_the_cursor_after_waiting(db, monkeypatch):
+    monkeypatch.setattr('app.changes.POLL_SECONDS', 0.01)
+    started = time.monotonic()
+    
+    result = read_changes(db.session, since=7, wait=0.05)
+    
+    assert result == {'events': [], 'next': 7, 'more': False}
+    assert time.monotonic() - started >= 0.05
+
+
+def test_sweep_records_the_swept_batches(db, medicine, batch):
+    paracetamol = medicine()
+    expired = batch(paracetamol, stock=5, batch_number='OLD', expires_in=-1)
+    empty = batch(paracetamol, stock=0, batch_number='EMPTY')
+    batch(paracetamol, stock=5, batch_number='OK')
+    
+    result = sweep_batches(today=date.today())
+    
+    assert (result['expired'], result['empty'], result['units']) == (1, 1, 5)
+    events = {e['entity_id']: e['data'] for e in read_changes(db.session)['events']}
+    assert events == {
+        expired.id: {**events[expired.id], 'stock_quantity': 0, 'is_active': False},
+        empty.id: {**events[empty.id], 'stock_quantity': 0, 'is_active': False},
+    }
+    assert db.session.get(Batch, expired.id).stock_quantity == 0
@@ -0,0 +1,90 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.checkout import checkout, find_idempotent_sale
+from app.models import Batch, Sale, StockMovement
+
+
+def test_checkout_deducts_stock_and_records_movements(db, medicine, batch, cart):
+    stock = batch(medicine(), stock=10)
+    
+    body, status = checkout(db.session, cart((stock.id, 3), (stock.id, 2)))
+    
+    assert status == 200 and body['success']
+    assert db.session.get(Batch, stock.id).stock_quantity == 5
+    movements = db.session.execute(select(StockMovement.kind, StockMovement.quantity)).all()
+    assert movements == [('sale', -5)]
+
+
+def test_checkout_rejects_more_than_available(db, medicine, batch, cart):
+    stock = batch(medicine(), stock=2)
+    
+    body, status = checkout(db.session, cart((stock.id, 3)))
+    
+    assert status == 400 and 'Insufficient stock' in body['error']
+    assert db.session.get(Batch, stock.id).stock_quantity == 2
+    assert db.session.execute(select(func.count(Sale.id))).scalar() == 0
+
+
+def test_concurrent_checkout_cannot_oversell(db, medicine, batch, cart):
+    stock = batch(medicine(), stock=5)
+    db.session.get(Batch, stock.id).stock_quantity  # Loaded before the other terminal sells
+    
+    # Another terminal (process) sells 4 units in the meantime
+    with Session(db.engine) as other:
+        other.execute(update(Batch).where(Batch.id == stock.id).values(stock_quantity=Batch.stock_quantity - 4))
+        other.commit()
+    
+    body, status = checkout(db.session, cart((stock.id, 3)))
+    
+    assert status == 400 and 'Available: 1' in body['error']
+    assert db.session.get(Batch, stock.id).stock_quantity == 1
+
+
+def test_rejected_cart_gives_back_units_already_taken(db, medicine, batch, cart):
+    first = batch(medicine(), stock=5, batch_number='A')
+    second = batch(medicine('Dolo 650'), stock=5, batch_number='B')
+    db.session.get(Batch, second.id).stock_quantity
+    with Session(db.engine) as other:
+        other.execute(update(Batch).where(Batch.id == second.id).values(stock_quantity=0))
+        other.commit()
+    
+    body, status = checkout(db.session, cart((first.id, 2), (second.id, 2)))
+    
+    assert status == 400
+    assert db.session.get(Batch, first.id).stock_quantity == 5
+    assert db.session.execute(select(func.count(StockMovement.id))).scalar() == 0
+
+
+def test_retry_with_idempotency_key_returns_the_original_sale(db, client, medicine, batch, cart):
+    stock = batch(medicine(), stock=10)
+    headers = {'Idempotency-Key': 'till-1-0001'}
+    
+    first = client.post('/sales/create', json=cart((stock.id, 3)), headers=headers).get_json()
+    retry = client.post('/sales/create', json=cart((stock.id, 3)), headers=headers).get_json()
+    
+    assert first['success'] and 'replayed' not in first
+    assert retry['replayed'] and retry['sale_id'] == first['sale_id']
+    assert db.session.get(Batch, stock.id).stock_quantity == 7
+    assert db.session.execute(select(func.count(Sale.id))).scalar() == 1
+    
+    response = client.post('/sales/create', json=cart((stock.id, 1)), headers={'Idempotency-Key': 'x' * 65})
+    assert response.status_code == 400 and response.get_json()['error'] == 'Invalid Idempotency-Key'
+
+
+def test_concurrent_retry_that_loses_the_race_is_replayed(db, medicine, batch, monkeypatch, cart):
+    stock = batch(medicine(), stock=10)
+    body, _ = checkout(db.session, cart((stock.id, 3)), idempotency_key='till-1-0002')
+    checked = []
+    
+    def find_after_first_check(session, key):
+        # The retry checked for the key just before the first request committed
+        checked.append(key)
+        return None if len(checked) == 1 else find_idempotent_sale(session, key)
+    monkeypatch.setattr('app.checkout.find_idempotent_sale', find_after_first_check)
+    
+    retry, status = checkout(db.session, cart((stock.id, 3)), idempotency_key='till-1-0002')
+    
+    assert status == 200 and retry['replayed'] and retry['sale_id'] == body['sale_id']
+    assert db.session.get(Batch, stock.id).stock_quantity == 7
+    assert db.session.execute(select(func.count(StockMovement.id))).scalar() == 1
+    assert checked == ['till-1-0002'] * 2
@@ -0,0 +1,44 @@
+import gzip
+
+
+def search(client, **headers):
+    return client.get('/api/medicines/search', query_string={'q': 'Cro'}, headers=headers)
+
+
+def test_responses_over_the_threshold_are_gzipped(app, client, medicine, batch):
+    batch(medicine())
+    plain = search(client)
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.vary.find('Accept-Encoding') >= 0
+    
+    app.config['COMPRESS_MIN_SIZE'] = len(plain.data)
+    response = search(client, **{'Accept-Encoding': 'gzip'})
+    
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+    assert response.get_etag() == (f'{plain.get_etag()[0]}-gzip', False)
+
+
+def test_responses_under_the_threshold_are_sent_as_is(app, client, medicine, batch):
+    batch(medicine())
+    plain = search(client)
+    
+    app.config['COMPRESS_MIN_SIZE'] = len(plain.data) + 1
+    response = search(client, **{'Accept-Encoding': 'gzip'})
+    
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == plain.data
+    assert response.get_etag() == plain.get_etag()
+
+
+def test_compressed_etag_is_revalidated(app, client, medicine, batch):
+    batch(medicine())
+    app.config['COMPRESS_MIN_SIZE'] = 1
+    response = search(client, **{'Accept-Encoding': 'gzip'})
+    etag = response.headers['ETag']
+    
+    revalidated = search(client, **{'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert revalidated.data == b''
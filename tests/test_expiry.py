@@ -0,0 +1,36 @@
+from datetime import date
+from app.models import Batch
+
+
+def stock_at_risk(medicine, batch):
+    paracetamol = medicine()
+    batch(paracetamol, stock=10, batch_number='GONE', expires_in=-5)  # 10 units at 5.0
+    batch(paracetamol, stock=20, batch_number='SOON', expires_in=10)
+    batch(paracetamol, stock=4, batch_number='LATER', expires_in=60, mrp=20.0)
+    batch(paracetamol, stock=50, batch_number='FAR', expires_in=200)
+    batch(paracetamol, stock=0, batch_number='EMPTY', expires_in=10)
+    batch(paracetamol, stock=7, batch_number='WRITTEN-OFF', expires_in=10, is_active=False)
+
+
+def test_batches_are_bucketed_by_expiry(db, medicine, batch):
+    stock_at_risk(medicine, batch)
+    
+    assert Batch.expiry_summary(date.today()) == [
+        {'days': None, 'count': 1, 'value': 50.0},
+        {'days': 30, 'count': 1, 'value': 100.0},
+        {'days': 90, 'count': 1, 'value': 8.0},
+    ]
+    assert [b['count'] for b in Batch.expiry_summary(date.today(), (180, 7, 14))] == [1, 0, 1, 1]
+
+
+def test_expiry_report_lists_each_bucket(client, medicine, batch):
+    stock_at_risk(medicine, batch)
+    
+    page = client.get('/reports/expiry', query_string={'buckets': '14,365'}).get_data(as_text=True)
+    
+    assert page.index('GONE') < page.index('SOON') < page.index('LATER') < page.index('FAR')
+    assert 'Expiring Within 14 Days' in page and 'Expiring Within 365 Days' in page
+    assert 'EMPTY' not in page and 'WRITTEN-OFF' not in page
+    
+    default = client.get('/reports/expiry').get_data(as_text=True)
+    assert 'LATER' in default and 'FAR' not in default
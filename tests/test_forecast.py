@@ -0,0 +1,52 @@
+import json
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytest
+from app.checkout import add_sale
+from app.forecast import fit, run_forecast
+from app.models import DemandForecast
+
+WEEK = [2, 2, 2, 2, 2, 9, 2]  # Units sold by weekday, Monday first: 3 a day on average
+
+
+def test_fit_recovers_a_weekly_pattern():
+    history = np.array([[WEEK[day % 7] for day in range(28)], [5] * 28], dtype=np.float64)
+    
+    level, seasonal, alpha, gamma, mae = fit(history, first_weekday=0)
+    
+    assert level == pytest.approx([3, 5])
+    assert seasonal[0] == pytest.approx([units - 3 for units in WEEK])
+    assert seasonal[1] == pytest.approx([0] * 7)
+    assert mae == pytest.approx([0, 0])
+    assert alpha.shape == gamma.shape == (2,)
+
+
+def test_fit_needs_two_weeks():
+    with pytest.raises(ValueError):
+        fit(np.ones((1, 13)), first_weekday=0)
+
+
+def test_forecast_is_stored_and_served(db, client, medicine, batch):
+    stock = batch(medicine('Crocin 500'), stock=1000)
+    idle = medicine('Dolo 650')
+    today = date.today()
+    for days_ago in range(1, 29):
+        day = today - timedelta(days=days_ago)
+        add_sale(db.session, {'items': [{'batch_id': stock.id, 'quantity': WEEK[day.weekday()], 'unit_price': 5.0}]},
+                 sale_date=datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+    db.session.commit()
+    
+    assert run_forecast(today, history_days=28) == 2
+    
+    forecasts = {f.medicine_id: f for f in DemandForecast.query.all()}
+    sold = forecasts[stock.medicine_id]
+    assert sold.fitted_on == today - timedelta(days=1)
+    assert (sold.next_7_days, sold.next_28_days) == (pytest.approx(21), pytest.approx(84))
+    assert json.loads(sold.seasonal) == pytest.approx([units - 3 for units in WEEK], abs=1e-4)
+    assert forecasts[idle.id].next_28_days == 0
+    
+    body = client.get(f'/api/forecasts/{stock.medicine_id}', query_string={'days': 7}).get_json()
+    assert body['next_7_days'] == 21 and body['mae'] == 0
+    assert [d['quantity'] for d in body['daily']] == [WEEK[(today + timedelta(days=i)).weekday()] for i in range(7)]
+    assert client.get(f'/api/forecasts/{idle.id + 1}').status_code == 404
+    assert 'Crocin 500' in client.get('/reports/forecast').get_data(as_text=True)
@@ -0,0 +1,140 @@
+import threading
+import time
+from sqlalchemy import func, select
+from app.changes import read_changes, record_change
+from app.live import LiveDashboard, sse_message
+from app.models import ChangeEvent
+
+
+def changes_since(db, cursor):
+    return read_changes(db.session, cursor)['events']
+
+
+def cursor(db):
+    return db.session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+
+def test_sale_updates_todays_revenue(db, medicine, batch, sell):
+    stock = batch(medicine(), stock=50)
+    sell((stock.id, 2))
+    live = LiveDashboard(db.session)
+    start = cursor(db)
+    assert live.stats()['today_sales'] == 10.0
+    
+    sell((stock.id, 3))
+    updates = live.apply(changes_since(db, start))
+    
+    assert [event for event, _ in updates] == ['sale']
+    assert updates[0][1]['total_amount'] == 15.0
+    assert updates[0][1]['today_sales'] == 25.0
+    assert live.stats()['today_sales'] == 25.0
+
+
+def test_medicine_goes_low_and_back(db, medicine, batch, sell):
+    paracetamol = medicine(min_stock_level=10)
+    stock = batch(paracetamol, stock=12)
+    live = LiveDashboard(db.session)
+    start = cursor(db)
+    assert live.stats()['low_stock_count'] == 0
+    
+    sell((stock.id, 3))
+    updates = dict(live.apply(changes_since(db, start)))
+    assert updates['low_stock'] == {
+        'medicine_id': paracetamol.id, 'name': 'Crocin 500', 'category': 'Tablets',
+        'total_stock': 9, 'low': True, 'low_stock_count': 1,
+    }
+    
+    start = cursor(db)
+    record_change(db.session, 'created', batch(paracetamol, stock=40, batch_number='B2'))
+    db.session.commit()
+    updates = dict(live.apply(changes_since(db, start)))
+    assert updates['low_stock']['low'] is False
+    assert updates['low_stock']['total_stock'] == 49
+    assert live.stats()['low_stock_count'] == 0
+
+
+def test_batches_enter_and_leave_the_expiry_window(db, medicine, batch, sell):
+    paracetamol = medicine(min_stock_level=0)
+    soon = batch(paracetamol, stock=5, batch_number='SOON', expires_in=10)
+    live = LiveDashboard(db.session)
+    start = cursor(db)
+    assert live.stats()['expiring_soon_count'] == 1
+    
+    sell((soon.id, 5))
+    updates = dict(live.apply(changes_since(db, start)))
+    assert updates['expiry']['batch_id'] == soon.id
+    assert updates['expiry']['expiring'] is False
+    assert updates['expiry']['expiring_soon_count'] == 0
+    
+    start = cursor(db)
+    sooner = batch(paracetamol, stock=8, batch_number='SOONER', expires_in=5)
+    record_change(db.session, 'created', sooner)
+    db.session.commit()
+    updates = dict(live.apply(changes_since(db, start)))
+    assert updates['expiry'] == {
+        'batch_id': sooner.id, 'medicine_name': 'Crocin 500', 'batch_number': 'SOONER',
+        'expiry_date': sooner.expiry_date.isoformat(), 'days_left': 5, 'stock_quantity': 8,
+        'expiring': True, 'expiring_soon_count': 1,
+    }
+    
+    # Far-off batches change nothing
+    start = cursor(db)
+    record_change(db.session, 'created', batch(paracetamol, stock=100, batch_number='LATER'))
+    db.session.commit()
+    assert live.apply(changes_since(db, start)) == []
+
+
+def test_sse_message_framing():
+    assert sse_message('stats', {'today_sales': 12.5, 'low_stock_count': 0}) == (
+        'event: stats\ndata: {"today_sales":12.5,"low_stock_count":0}\n\n'
+    )
+
+
+def test_stream_sends_figures_then_keepalives(client, monkeypatch):
+    monkeypatch.setattr('app.live.STREAM_SECONDS', 0.3)
+    monkeypatch.setattr('app.live.KEEPALIVE_SECONDS', 0.1)
+    
+    with client.get('/live') as response:
+        assert response.mimetype == 'text/event-stream'
+        body = response.get_data(as_text=True)
+    assert body.startswith('retry: 3000\nevent: stats\n'
+                           'data: {"today_sales":0,"low_stock_count":0,"expiring_soon_count":0}\n\n')
+    assert ': keepalive\n\n' in body
+
+
+def test_streams_beyond_the_limit_are_refused(app, client):
+    app.config['LIVE_MAX_STREAMS'] = 1
+    
+    first = client.get('/live', buffered=False)
+    assert next(first.response).startswith(b'retry:')
+    refused = client.get('/live')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '3'
+    
+    first.close()
+    again = client.get('/live', buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+def test_commit_wakes_a_waiting_reader(app, db, medicine, monkeypatch):
+    monkeypatch.setattr('app.changes.POLL_SECONDS', 30)
+    start = cursor(db)
+    result = {}
+    
+    def wait_for_changes():
+        with app.app_context():
+            result['feed'] = read_changes(db.session, start, wait=30)
+            db.session.remove()
+    
+    reader = threading.Thread(target=wait_for_changes)
+    started = time.monotonic()
+    reader.start()
+    time.sleep(0.2)
+    record_change(db.session, 'created', medicine())
+    db.session.commit()
+    reader.join(timeout=5)
+    
+    assert not reader.is_alive()
+    assert time.monotonic() - started < 5
+    assert [e['entity'] for e in result['feed']['events']] == ['medicine']
@@ -0,0 +1,22 @@
+from datetime import datetime
+import pytest
+from app.reorder import ReorderEngine
+
+PER_UNIT = 0.5 / 7 + 0.3 / 30 + 0.2 / 90  # Velocity of one unit sold today
+
+
+def test_velocity_is_kept_up_by_refresh(db, medicine, batch, sell):
+    stock = batch(medicine(), stock=100)
+    engine = ReorderEngine()
+    today = datetime.now().date()
+    sell((stock.id, 14))
+    
+    [row] = engine.suggestions(today, lead_days=7, review_days=14)
+    assert row['velocity'] == pytest.approx(14 * PER_UNIT)
+    
+    before = engine.velocities(today)
+    sell((stock.id, 7))
+    engine.refresh(today)
+    
+    assert engine.velocities(today)[stock.medicine_id] == pytest.approx(21 * PER_UNIT)
+    assert before[stock.medicine_id] == row['velocity']  # Callers hold a copy
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+from sqlite3 import connect as sqlite_connect
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from app.checkout import checkout
+from app.main import create_app, db as _db
+from app.models import Batch, Category, Medicine, Sale, Store
+from app.replica import REPLICA_BIND, replica_fresh, replica_lag, sync_sqlite_replica
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'SQLALCHEMY_BINDS': {'archive': f'sqlite:///{tmp_path / "archive.db"}'},
+        'REPLICA_DATABASE_URL': f'sqlite:///{tmp_path / "replica.db"}',
+        'TEMPLATE_CACHE_DIR': '',
+    })
+    with app.app_context():
+        _db.create_all(bind_key=[None, 'archive'])
+        yield app
+        _db.session.remove()
+
+
+def replica_categories():
+    with _db.engines[REPLICA_BIND].connect() as conn:
+        return conn.execute(text('SELECT name FROM categories ORDER BY id')).scalars().all()
+
+
+def test_sync_copies_the_primary_and_records_when(app):
+    assert replica_lag() is None  # Never synced
+    _db.session.add(Category(name='Tablets'))
+    _db.session.commit()
+    
+    sync_sqlite_replica()
+    assert replica_categories() == ['Tablets']
+    assert replica_lag() < 5 and replica_fresh()
+    
+    _db.session.add(Category(name='Syrups'))
+    _db.session.commit()
+    sync_sqlite_replica()
+    assert replica_categories() == ['Tablets', 'Syrups']
+    assert _db.session.execute(select(func.count(Category.id))).scalar() == 2
+
+
+def test_sale_commits_while_the_replica_is_copied(app, monkeypatch):
+    _db.session.add_all([Store(id=1, code='MAIN', name='Main Store'), Category(id=1, name='Tablets'),
+                         Medicine(id=1, name='Crocin 500', category_id=1, units_per_pack=10)])
+    _db.session.add(Batch(id=1, medicine_id=1, batch_number='B1', stock_quantity=10,
+                          expiry_date=date.today() + timedelta(days=365), mrp=50.0))
+    _db.session.commit()
+    steps, sell_at, results = [], None, []
+    
+    def progress():
+        # Called every few VM steps of VACUUM INTO on the primary
+        steps.append(1)
+        if len(steps) == sell_at:
+            with Session(_db.engine) as till:
+                results.append(checkout(till, {'items': [{'batch_id': 1, 'quantity': 2, 'unit_price': 5.0}]}))
+        return 0
+    
+    def connect(database, *args, **kwargs):
+        connection = sqlite_connect(database, *args, **kwargs)
+        if not database.endswith('.sync'):
+            connection.set_progress_handler(progress, 10)
+        return connection
+    monkeypatch.setattr('app.replica.sqlite3.connect', connect)
+    
+    # Count the steps of a copy, then sell halfway through the next one,
+    # while it holds its read transaction
+    sync_sqlite_replica()
+    steps, sell_at = [], len(steps) // 2
+    sync_sqlite_replica()
+    
+    [(body, status)] = results
+    assert status == 200, body
+    assert _db.session.execute(select(func.count(Sale.id))).scalar() == 1
+    with _db.engines[REPLICA_BIND].connect() as conn:
+        # The copy is the snapshot from before the sale
+        assert conn.execute(text('SELECT stock_quantity FROM batches')).scalar() == 10
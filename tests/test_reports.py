@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy.orm import Session
+from app.checkout import add_sale
+from app.models import Category
+from app.routes import reports
+
+
+def test_stock_report_groups_medicines_by_status(db, client, medicine, batch):
+    batch(medicine('Crocin 500', min_stock_level=10), stock=100, mrp=50.0)
+    batch(medicine('Dolo 650', min_stock_level=10), stock=5, mrp=30.0)
+    medicine('Calpol 500', min_stock_level=10)
+    
+    page = client.get('/reports/stock').get_data(as_text=True)
+    
+    out_of_stock, low_stock, healthy = (page.split('<!-- Low Stock -->')[0], *page.split('<!-- Low Stock -->')[1]
+                                        .split('<!-- Healthy Stock -->'))
+    assert 'Calpol 500' in out_of_stock and 'Dolo 650' in low_stock and 'Crocin 500' in healthy
+    assert '₹500.00' in healthy  # 100 units at 50.0 per pack of 10
+    assert '₹515' in page  # Total stock value
+
+
+def test_cached_reports_run_no_medicine_queries(client, medicine, batch, statements):
+    batch(medicine('Crocin 500'), stock=100)
+    for url in ('/reports/stock', '/reports/dead-stock?days=30'):
+        client.get(url)
+        
+        with statements() as seen:
+            page = client.get(url).get_data(as_text=True)
+        
+        assert 'Crocin 500' in page
+        assert not [s for s in seen if 'medicines' in s or 'batches' in s], seen
+
+
+def test_dead_stock_lists_medicines_not_sold_recently(db, client, medicine, batch):
+    sold = batch(medicine('Crocin 500'), stock=100)
+    batch(medicine('Dolo 650'), stock=20, mrp=30.0)
+    client.post('/sales/create', json={'items': [{'batch_id': sold.id, 'quantity': 1, 'unit_price': 5.0}]})
+    
+    page = client.get('/reports/dead-stock?days=30').get_data(as_text=True)
+    
+    assert 'Dolo 650' in page and 'Crocin 500' not in page
+    assert '₹60.00' in page
+
+
+def rounded(rows):
+    return [{field: round(value, 6) if isinstance(value, float) else value for field, value in row.items()}
+            for row in rows]
+
+
+@pytest.fixture
+def report_pool():
+    """Shut down the aggregation workers started by a test."""
+    yield
+    if reports._pool is not None:
+        reports._pool.shutdown()
+        reports._pool = reports._pool_key = None
+
+
+def test_parallel_aggregation_matches_serial(app, db, medicine, batch, report_pool):
+    app.config['REPORT_CHUNK_DAYS'] = 7
+    db.session.add(Category(id=2, name='Vitamins'))
+    db.session.commit()
+    crocin = batch(medicine('Crocin 500'), stock=500)
+    zincovit = batch(medicine('Zincovit', category_id=2), stock=500, mrp=20.0)
+    city = batch(medicine('Dolo 650'), stock=500, batch_number='C1', store_id=2)
+    
+    today = date.today()
+    for days_ago in (0, 3, 6, 7, 15, 29, 44):
+        sold_at = datetime.combine(today - timedelta(days=days_ago), datetime.min.time()) + timedelta(hours=10)
+        add_sale(db.session, {'items': [
+            {'batch_id': crocin.id, 'quantity': 1 + days_ago % 4, 'unit_price': 5.0},
+            {'batch_id': zincovit.id, 'quantity': 2, 'unit_price': 2.5},
+            {'is_unlisted': True, 'name': 'Cotton', 'quantity': 1, 'unit_price': 12.0},
+        ]}, sale_date=sold_at)
+        db.session.commit()
+        # The other store's sales are left out either way
+        with Session(db.engine, info={'store_id': 2}) as other:
+            add_sale(other, {'items': [{'batch_id': city.id, 'quantity': 3, 'unit_price': 4.0}]}, sale_date=sold_at)
+            other.commit()
+    
+    start = today - timedelta(days=50)
+    for group_by in ('day', 'medicine', 'category'):
+        serial = reports.aggregate_sales(start, today, group_by, workers=1)
+        parallel = reports.aggregate_sales(start, today, group_by, workers=2)
+        assert rounded(parallel) == rounded(serial)  # Chunks sum floats in another order
+    assert reports._pool_key[1] == 2
+    
+    assert [(row['name'], row['quantity']) for row in serial] == [('Tablets', 19), ('Vitamins', 14)]
+    by_medicine = reports.aggregate_sales(start, today, 'medicine', workers=2)
+    assert [row['name'] for row in by_medicine] == ['Crocin 500', 'Zincovit']
+    by_day = reports.aggregate_sales(start, today, 'day', workers=2)
+    assert len(by_day) == 7 and sum(row['sales'] for row in by_day) == 7
+    assert sum(row['revenue'] for row in by_day) == 19 * 5.0 + 14 * 2.5 + 7 * 12.0
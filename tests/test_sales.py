@@ -0,0 +1,32 @@
+from collections import OrderedDict
+
+
+def test_customer_filter_matches_wildcards_literally(db, client, medicine, batch, sell):
+    stock = batch(medicine())
+    for customer in ('100% Pharma', '1000 Pharma', 'Ravi_K', 'RaviXK'):
+        sell((stock.id, 1), customer_name=customer)
+    
+    def listed(customer):
+        page = client.get('/sales/', query_string={'customer': customer}).get_data(as_text=True)
+        return [name for name in ('100% Pharma', '1000 Pharma', 'Ravi_K', 'RaviXK') if name in page]
+    
+    assert listed('100%') == ['100% Pharma']
+    assert listed('ravi_') == ['Ravi_K']
+    assert listed('pharma') == ['100% Pharma', '1000 Pharma']
+
+
+def test_sale_detail_and_reprint_query_once(db, client, medicine, batch, sell, statements, monkeypatch):
+    monkeypatch.setattr('app.routes.sales._receipt_cache', OrderedDict())
+    crocin, dolo = batch(medicine('Crocin 500')), batch(medicine('Dolo 650'), batch_number='D1')
+    sale_id = sell((crocin.id, 2), (dolo.id, 1), customer_name='Ravi K')['sale_id']
+    db.session.expunge_all()
+    
+    with statements() as seen:
+        page = client.get(f'/sales/{sale_id}').get_data(as_text=True)
+    assert 'Crocin 500' in page and 'Dolo 650' in page and 'Ravi K' in page
+    assert len([s for s in seen if 'sale_items' in s or 'batches' in s or 'medicines' in s]) == 1, seen
+    
+    with statements() as seen:
+        receipt = client.get(f'/sales/{sale_id}/receipt').get_data(as_text=True)
+    assert 'Crocin 500' in receipt and f'Receipt #:</strong> {sale_id}' in receipt
+    assert not [s for s in seen if 'FROM sales' in s or 'sale_items' in s], seen
@@ -0,0 +1,46 @@
+from datetime import date, datetime, timedelta
+from flask.json.provider import DefaultJSONProvider
+from app.serializers import batch_row, unit_price
+
+
+def test_unit_price_per_tablet():
+    assert unit_price(50.0, 10) == 5.0
+    assert unit_price(50.0, 0) == 50.0
+    assert unit_price(None, 10) == 0
+
+
+def test_batch_row_uses_the_given_day():
+    row = (7, 'B7', date(2026, 3, 31), 40, 32.5)
+    
+    assert batch_row(row, 10, date(2026, 3, 1)) == {
+        'id': 7, 'batch_number': 'B7', 'expiry_date': '2026-03-31', 'days_until_expiry': 30,
+        'stock_quantity': 40, 'mrp': 32.5, 'unit_price': 3.25,
+    }
+
+
+def test_provider_encodes_like_flask(app):
+    payload = {'day': date(2026, 3, 1), 'at': datetime(2026, 3, 1, 9, 30), 'total': 12.5, 'items': ['x', None]}
+    
+    assert app.json.loads(app.json.dumps(payload)) == \
+        DefaultJSONProvider(app).loads(DefaultJSONProvider(app).dumps(payload))
+    with app.test_request_context():
+        response = app.json.response(payload)
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['day'] == 'Sun, 01 Mar 2026 00:00:00 GMT'
+
+
+def test_batches_api_serializes_sellable_batches(db, client, medicine, batch, statements):
+    paracetamol = medicine(units_per_pack=10)
+    later = batch(paracetamol, batch_number='LATER', expires_in=90, mrp=45.0)
+    sooner = batch(paracetamol, batch_number='SOONER', expires_in=30)
+    batch(paracetamol, batch_number='EXPIRED', expires_in=-1)
+    batch(paracetamol, batch_number='EMPTY', stock=0)
+    
+    with statements() as seen:
+        body = client.get(f'/api/batches/{paracetamol.id}').get_json()
+    
+    assert body['medicine'] == {'id': paracetamol.id, 'name': 'Crocin 500', 'units_per_pack': 10, 'packing_type': 'Strip'}
+    assert [(b['id'], b['days_until_expiry'], b['unit_price']) for b in body['batches']] == [
+        (sooner.id, 30, 5.0), (later.id, 90, 4.5)]
+    assert body['batches'][0]['expiry_date'] == (date.today() + timedelta(days=30)).isoformat()
+    assert len([s for s in seen if 'FROM batches' in s]) == 1
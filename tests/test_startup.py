@@ -0,0 +1,43 @@
+from datetime import date
+import pytest
+from werkzeug.local import LocalProxy
+from app.main import LazyBlueprints, create_app, db as _db
+
+
+@pytest.fixture
+def lazy_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'SQLALCHEMY_BINDS': {'archive': f'sqlite:///{tmp_path / "archive.db"}'},
+        'TEMPLATE_CACHE_DIR': '',
+        'LAZY_BLUEPRINTS': True,
+    })
+    with app.app_context():
+        _db.create_all(bind_key=[None, 'archive'])
+    return app
+
+
+def test_rare_blueprints_are_registered_on_the_first_request(lazy_app):
+    assert isinstance(lazy_app.wsgi_app, LazyBlueprints)
+    assert 'reports' not in lazy_app.blueprints and 'categories' not in lazy_app.blueprints
+    assert 'home' in lazy_app.blueprints
+    
+    response = lazy_app.test_client().get('/reports/')
+    
+    assert response.status_code == 200
+    assert {'reports', 'categories'} <= set(lazy_app.blueprints)
+    assert not isinstance(lazy_app.wsgi_app, LazyBlueprints)  # The middleware steps aside
+    assert lazy_app.test_client().get('/categories/').status_code == 200
+
+
+def test_blueprints_are_registered_up_front_by_default(app):
+    assert {'reports', 'categories'} <= set(app.blueprints)
+    assert not isinstance(app.wsgi_app, LazyBlueprints)
+    assert 'migrate' not in app.extensions  # Only wired up under the CLI
+
+
+def test_now_is_evaluated_when_a_template_uses_it(app):
+    assert isinstance(app.jinja_env.globals['now'], LocalProxy)
+    with app.test_request_context():
+        assert app.jinja_env.from_string("{{ now.strftime('%Y-%m-%d') }}").render() == date.today().isoformat()
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app.models import Batch, StockMovement
+from app.stock import stock_as_of, stock_valuation, take_checkpoint
+
+
+def receive(client, medicine, batch_number='B1', stock=100):
+    response = client.post(f'/medicines/{medicine.id}/add-batch', data={
+        'batch_number': batch_number, 'expiry_date': '2099-01-01', 'mrp': 50, 'stock_quantity': stock
+    })
+    assert response.status_code == 302
+
+
+def ledger_total(db, batch_id):
+    return db.session.execute(
+        select(func.coalesce(func.sum(StockMovement.quantity), 0)).where(StockMovement.batch_id == batch_id)
+    ).scalar()
+
+
+def test_receipt_and_sale_are_in_the_ledger(db, client, medicine):
+    receive(client, medicine())
+    batch_id = db.session.execute(select(Batch.id)).scalar()
+    client.post('/sales/create', json={'items': [{'batch_id': batch_id, 'quantity': 30, 'unit_price': 5}]})
+    
+    assert ledger_total(db, batch_id) == db.session.get(Batch, batch_id).stock_quantity == 70
+    assert stock_as_of(datetime.now() + timedelta(seconds=1)) == {batch_id: 70}
+
+
+def test_point_in_time_stock_from_checkpoint(db, client, medicine):
+    receive(client, medicine())
+    batch_id = db.session.execute(select(Batch.id)).scalar()
+    take_checkpoint(datetime.now() + timedelta(seconds=1))
+    client.post('/sales/create', json={'items': [{'batch_id': batch_id, 'quantity': 10, 'unit_price': 5}]})
+    
+    assert stock_as_of(datetime.now() + timedelta(seconds=2)) == {batch_id: 90}
+
+
+def test_deleting_a_batch_writes_off_its_stock(db, client, medicine):
+    receive(client, medicine())
+    batch_id = db.session.execute(select(Batch.id)).scalar()
+    
+    client.post(f'/medicines/batch/{batch_id}/delete')
+    
+    batch = db.session.get(Batch, batch_id)
+    assert not batch.is_active and batch.stock_quantity == 0
+    assert ledger_total(db, batch_id) == 0
+    assert stock_as_of(datetime.now() + timedelta(seconds=1)) == {}
+    assert stock_valuation(datetime.now() + timedelta(seconds=1))[0] == []
+
+
+def test_deleting_a_medicine_writes_off_its_batches_at_every_store(db, client, medicine, batch):
+    paracetamol = medicine()
+    receive(client, paracetamol)
+    other_store = batch(paracetamol, stock=40, batch_number='C1', store_id=2)
+    db.session.add(StockMovement(batch_id=other_store.id, kind='receipt', quantity=40))
+    db.session.commit()
+    
+    client.post(f'/medicines/{paracetamol.id}/delete')
+    
+    batches = db.session.execute(select(Batch).execution_options(all_stores=True)).scalars().all()
+    assert [(b.is_active, b.stock_quantity) for b in batches] == [(False, 0), (False, 0)]
+    assert all(ledger_total(db, b.id) == 0 for b in batches)
+
+
+def edit_stock(client, batch_id, quantity, original):
+    return client.post(f'/medicines/batch/{batch_id}/edit', data={
+        'batch_number': 'B1', 'expiry_date': '2099-01-01', 'mrp': 50, 'stock_quantity': quantity,
+        'original_stock_quantity': original
+    })
+
+
+def test_stock_correction_is_recorded_as_a_difference(db, client, medicine):
+    receive(client, medicine())
+    batch_id = db.session.execute(select(Batch.id)).scalar()
+    
+    assert edit_stock(client, batch_id, 95, original=100).status_code == 302
+    
+    assert db.session.get(Batch, batch_id).stock_quantity == ledger_total(db, batch_id) == 95
+    assert db.session.execute(select(StockMovement.kind, StockMovement.quantity).order_by(StockMovement.id)).all() == [
+        ('receipt', 100), ('adjustment', -5)]
+
+
+def test_stock_correction_does_not_undo_a_sale_made_meanwhile(db, client, medicine):
+    receive(client, medicine())
+    batch_id = db.session.execute(select(Batch.id)).scalar()
+    # The form showed 100 units; then the till sold 30
+    client.post('/sales/create', json={'items': [{'batch_id': batch_id, 'quantity': 30, 'unit_price': 5}]})
+    
+    response = edit_stock(client, batch_id, 95, original=100)
+    
+    assert response.status_code == 200
+    assert 'changed to 70 units while you were editing' in response.get_data(as_text=True)
+    assert db.session.get(Batch, batch_id).stock_quantity == ledger_total(db, batch_id) == 70
+    
+    assert edit_stock(client, batch_id, 65, original=70).status_code == 302
+    assert db.session.get(Batch, batch_id).stock_quantity == ledger_total(db, batch_id) == 65
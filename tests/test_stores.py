@@ -0,0 +1,50 @@
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.checkout import checkout
+from app.models import Batch, Medicine, Sale
+from app.stores import refresh_store_summaries, store_rollup
+
+
+def test_queries_only_see_the_current_store(db, medicine, batch):
+    paracetamol = medicine()
+    batch(paracetamol, batch_number='B1')
+    there_id = batch(paracetamol, batch_number='C1', store_id=2).id
+    db.session.expunge_all()
+    
+    assert db.session.execute(select(Batch.batch_number)).scalars().all() == ['B1']
+    assert [b.batch_number for b in db.session.execute(select(Medicine)).scalar_one().batches] == ['B1']
+    assert db.session.execute(
+        select(Batch.batch_number).order_by(Batch.id).execution_options(all_stores=True)
+    ).scalars().all() == ['B1', 'C1']
+    
+    with Session(db.engine, info={'store_id': 2}) as other:
+        assert other.execute(select(Batch.id)).scalars().all() == [there_id]
+
+
+def test_checkout_cannot_sell_another_stores_batch(db, medicine, batch, cart):
+    there = batch(medicine(), store_id=2)
+    
+    body, status = checkout(db.session, cart((there.id, 1)))
+    
+    assert status == 400 and body['error'] == f'Batch not found: {there.id}'
+    assert db.session.get(Batch, there.id).stock_quantity == 100
+
+
+def test_rollup_totals_each_store_once(db, medicine, batch, sell):
+    paracetamol = medicine()
+    here, there = batch(paracetamol, batch_number='B1'), batch(paracetamol, batch_number='C1', store_id=2)
+    sell((here.id, 2))
+    sell((here.id, 1))
+    with Session(db.engine, info={'store_id': 2}) as other:
+        sell((there.id, 5), session=other)
+        assert other.execute(select(Sale.store_id)).scalars().all() == [2]
+    
+    assert refresh_store_summaries() == 3
+    assert refresh_store_summaries() == 0  # Already summarized
+    rows, total = store_rollup(date.today(), date.today())
+    
+    assert [(r['code'], r['sales'], r['quantity'], r['revenue']) for r in rows] == [
+        ('CITY', 1, 5, 25.0), ('MAIN', 2, 3, 15.0)]
+    assert total['revenue'] == 40.0 and total['sales'] == 3
+    assert total['cost'] == 8 * 35.0 / 10
@@ -0,0 +1,50 @@
+from flask import g
+from sqlalchemy import update
+from app.models import Medicine
+from app.models.medicine import composition_key
+
+
+def test_composition_key_ignores_case_spacing_and_order():
+    assert composition_key('Amoxicillin 500 mg + Clavulanic Acid 125mg') == \
+        composition_key('clavulanic acid 125 MG, amoxicillin 500mg') == 'amoxicillin 500mg+clavulanic acid 125mg'
+    assert composition_key('Paracetamol 500mg') != composition_key('Paracetamol 650mg')
+    assert composition_key('') is None and composition_key(None) is None
+
+
+def test_substitutes_in_stock_cheapest_first(db, client, medicine, batch):
+    crocin = medicine('Crocin 500', 'Paracetamol 500 mg')
+    dolo = medicine('Dolo 500', 'paracetamol 500mg')
+    calpol = medicine('Calpol 500', 'Paracetamol 500mg')
+    medicine('Dolo 650', 'Paracetamol 650mg')
+    empty = medicine('Pacimol 500', 'Paracetamol 500mg')
+    batch(dolo, mrp=30.0)
+    batch(calpol, mrp=20.0, batch_number='C2', expires_in=200)
+    batch(calpol, mrp=40.0, batch_number='C1', expires_in=100)  # Sold first (FEFO)
+    batch(empty, stock=0)
+    
+    response = client.get(f'/api/substitutes/{crocin.id}')
+    
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['medicine']['name'] == 'Crocin 500'
+    assert [s['name'] for s in result['substitutes']] == ['Dolo 500', 'Calpol 500']
+    assert [s['available'] for s in result['substitutes']] == [100, 200]
+    assert client.get('/api/substitutes/999').status_code == 404
+
+
+def test_substitutes_etag_changes_when_keys_are_reindexed(app, db, client, medicine, batch):
+    crocin = medicine('Crocin 500', 'Paracetamol 500mg')
+    batch(medicine('Dolo 500', 'Paracetamol 500mg'))
+    first = client.get(f'/api/substitutes/{crocin.id}')
+    assert client.get(f'/api/substitutes/{crocin.id}', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    # A database from before composition keys: the upgrade leaves them empty
+    db.session.execute(update(Medicine).values(composition_key=None))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['medicines', 'index-compositions'])
+    assert 'Updated 2 medicines' in result.output
+    g.pop('data_versions')  # Requests share the test's app context, where versions are cached
+    
+    response = client.get(f'/api/substitutes/{crocin.id}', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert [s['name'] for s in response.get_json()['substitutes']] == ['Dolo 500']
@@ -0,0 +1,65 @@
+from sqlalchemy import func, select
+from app.models import Batch, Sale, StockMovement
+
+
+def offline_sale(key, *items, sale_date='2026-01-05T10:30:00'):
+    return {'idempotency_key': key, 'sale_date': sale_date,
+            'items': [{'batch_id': batch_id, 'quantity': quantity, 'unit_price': 5.0} for batch_id, quantity in items]}
+
+
+def sync(client, sales):
+    response = client.post('/sales/sync', json={'sales': sales})
+    return response.status_code, response.get_json()
+
+
+def test_resent_queue_is_applied_once(db, client, medicine, batch):
+    stock = batch(medicine(), stock=10)
+    queue = [offline_sale('t1-1', (stock.id, 2)), offline_sale('t1-2', (stock.id, 3)), offline_sale('t1-1', (stock.id, 2))]
+    
+    status, body = sync(client, queue)
+    assert status == 200
+    first, second, again = body['results']
+    assert [r['status'] for r in body['results']] == ['created', 'created', 'duplicate']
+    assert again['sale_id'] == first['sale_id']
+    
+    # The terminal did not get the response and sends its whole queue again
+    status, body = sync(client, queue[:2])
+    assert [(r['status'], r['sale_id']) for r in body['results']] == [
+        ('duplicate', first['sale_id']), ('duplicate', second['sale_id'])]
+    
+    assert db.session.get(Batch, stock.id).stock_quantity == 5
+    assert db.session.execute(select(func.count(Sale.id))).scalar() == 2
+    assert db.session.execute(select(func.sum(StockMovement.quantity))).scalar() == -5
+    assert str(db.session.get(Sale, first['sale_id']).sale_date) == '2026-01-05 10:30:00'
+
+
+def test_malformed_sales_are_rejected_one_by_one(db, client, medicine, batch):
+    stock = batch(medicine(), stock=10)
+    malformed = [
+        'not a sale',
+        {'sale_date': '2026-01-05'},
+        {**offline_sale('bad-date', (stock.id, 1)), 'sale_date': 'yesterday'},
+        {'idempotency_key': 'items-not-list', 'items': 'crocin'},
+        {'idempotency_key': 'item-not-object', 'items': ['crocin']},
+        offline_sale('unhashable-batch', ([stock.id], 1)),
+        offline_sale('boolean-batch', (True, 1)),
+        offline_sale('unknown-batch', (999, 1)),
+        offline_sale('too-many', (stock.id, 11)),
+    ]
+    
+    status, body = sync(client, malformed + [offline_sale('good', (stock.id, 4))])
+    
+    assert status == 200
+    results = body['results']
+    assert [r['status'] for r in results] == ['error'] * len(malformed) + ['created']
+    assert [r['error'] for r in results[3:7]] == [
+        'Invalid cart items. Must be a list.', 'Invalid cart item. Must be an object.',
+        f'Batch not found: {[stock.id]}', 'Batch not found: True']
+    assert db.session.get(Batch, stock.id).stock_quantity == 6
+
+
+def test_sync_requires_a_list_of_sales(client):
+    for payload in ({}, {'sales': []}, {'sales': 'x'}, ['not', 'an', 'object']):
+        response = client.post('/sales/sync', json=payload)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'No sales to sync'
@@ -0,0 +1,57 @@
+from sqlalchemy import select
+from app.models import Batch, StockMovement
+
+
+def transfer(client, **body):
+    response = client.post('/api/stores/transfer', json=body)
+    return response.status_code, response.get_json()
+
+
+def all_batches(db):
+    return db.session.execute(
+        select(Batch.store_id, Batch.batch_number, Batch.stock_quantity).order_by(Batch.id)
+        .execution_options(all_stores=True)
+    ).all()
+
+
+def test_transfer_moves_units_to_the_same_batch_at_another_store(db, client, medicine, batch):
+    source = batch(medicine(), stock=10)
+    
+    status, body = transfer(client, batch_id=source.id, to_store_id=2, quantity=4)
+    assert status == 200 and body['success'] and body['quantity'] == 4
+    status, again = transfer(client, batch_id=source.id, to_store_id=2, quantity=1)
+    assert again['to_batch_id'] == body['to_batch_id']  # Topped up, not duplicated
+    
+    assert all_batches(db) == [(1, 'B1', 5), (2, 'B1', 5)]
+    movements = db.session.execute(select(StockMovement.batch_id, StockMovement.quantity)).all()
+    assert sorted(movements) == sorted([(source.id, -4), (body['to_batch_id'], 4),
+                                        (source.id, -1), (body['to_batch_id'], 1)])
+    
+    response = client.get(f'/api/stores/stock/{source.medicine_id}')
+    assert [(s['code'], s['total_stock'], s['current']) for s in response.get_json()['stores']] == [
+        ('CITY', 5, False), ('MAIN', 5, True)]
+
+
+def test_transfer_rejects_bad_requests(db, client, medicine, batch):
+    paracetamol = medicine()
+    source = batch(paracetamol, stock=3)
+    expired = batch(paracetamol, batch_number='OLD', expires_in=-1)
+    elsewhere = batch(paracetamol, batch_number='C1', store_id=2)
+    
+    for body, error in [
+        ({'batch_id': source.id, 'to_store_id': 2, 'quantity': 4}, 'Insufficient stock. Available: 3'),
+        ({'batch_id': source.id, 'to_store_id': 2, 'quantity': 1.5}, 'Invalid quantity'),
+        ({'batch_id': source.id, 'to_store_id': 2, 'quantity': True}, 'Invalid quantity'),
+        ({'batch_id': source.id, 'to_store_id': 1, 'quantity': 1}, 'Invalid destination store: 1'),
+        ({'batch_id': source.id, 'to_store_id': 9, 'quantity': 1}, 'Invalid destination store: 9'),
+        ({'batch_id': source.id, 'to_store_id': [2], 'quantity': 1}, 'Invalid destination store: [2]'),
+        ({'batch_id': elsewhere.id, 'to_store_id': 1, 'quantity': 1}, f'Batch not found: {elsewhere.id}'),
+        ({'batch_id': [source.id], 'to_store_id': 2, 'quantity': 1}, f'Batch not found: [{source.id}]'),
+        ({'batch_id': expired.id, 'to_store_id': 2, 'quantity': 1}, 'Expired or inactive'),
+    ]:
+        status, result = transfer(client, **body)
+        assert status == 400 and result['error'].startswith(error), (body, result)
+    
+    response = client.post('/api/stores/transfer', json=[source.id, 2, 1])
+    assert response.status_code == 400
+    assert all_batches(db) == [(1, 'B1', 3), (1, 'OLD', 100), (2, 'C1', 100)]